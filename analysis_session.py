@@ -0,0 +1,178 @@
+"""
+Analysis Session
+Per-athlete frame analysis state: pose history, exercise detection, form
+analysis and rep counting. Only the detected exercise's form and rep logic
+run on each frame. Feedback is debounced through FeedbackEngine; changes,
+reps and exercise switches are published as numbered events.
+"""
+import time
+import numpy as np
+
+from ml_pipeline import ExerciseMLPipeline, select_model_features
+from exercise_detector import ExerciseDetector, NONE_LABEL
+from feedback_events import FeedbackEngine
+from rep_segmenter import RepSegmenter
+from exercises import AUTO_MODE
+
+# Frames between landmark windows sent to the optional transformer worker
+TRANSFORMER_STRIDE = 15
+
+# Rep signals per exercise: (signal, high threshold, low threshold, direction).
+# "down" reps go from above ``high`` to below ``low`` and back (curls,
+# squats), "up" reps the other way round (presses, raises); rep_segmenter
+# turns each cycle into a record. Signals are FEATURE_COLUMNS names from
+# ml_pipeline.
+REP_RULES = {
+    "BICEP_CURL": ("left_elbow_angle", 160, 30, "down"),
+    "SQUAT": ("left_knee_angle", 160, 90, "down"),
+    "PUSH_UP": ("left_elbow_angle", 160, 90, "down"),
+    "LUNGE": ("left_knee_angle", 160, 100, "down"),
+    "SHOULDER_PRESS": ("left_elbow_angle", 160, 90, "up"),
+    "LATERAL_RAISE": ("Shoulder Abduction Angle", 80, 30, "up"),
+}
+
+
+class AnalysisSession:
+    """Frame-by-frame analysis for one tracked person
+
+    ``exercise`` is either an exercise key (manual selection) or "auto", in
+    which case ExerciseDetector picks it from the pose.
+    """
+
+    def __init__(self, exercises, model_registry=None, pipeline=None, detector=None, exercise=AUTO_MODE):
+        self.exercises = list(exercises)
+        self.model_registry = model_registry
+        self.pipeline = pipeline or ExerciseMLPipeline(verbose=False)
+        self.detector = detector or ExerciseDetector(model_registry=model_registry)
+        self.mode = exercise
+        self.counters = {k: 0 for k in self.exercises}
+        # exercise -> RepSegmenter; a rep counts when it is completed
+        self.segmenters = {}
+        self.last_rep = None
+        self.current_exercise = NONE_LABEL if exercise == AUTO_MODE else exercise
+        self.events = FeedbackEngine()
+        # Called with (timestamp, exercise, 5 joint angles) for every analysed
+        # pose (e.g. SessionStore.frame_listener)
+        self.frame_listeners = []
+        self.form_confidence = 0.0
+        self.accuracy = 0.0
+        self.last_update = None
+        self.transformer = None
+        self._frame_index = 0
+
+    # ------------------------------------------------------------------
+    # CONTROL
+    # ------------------------------------------------------------------
+    def set_exercise(self, exercise):
+        """Select an exercise key, "auto" for detection or "None" to pause"""
+        if exercise != AUTO_MODE and exercise != NONE_LABEL and exercise not in self.counters:
+            raise ValueError(f"Unknown exercise: {exercise}")
+        self.mode = exercise
+        self.detector.reset()
+        self._set_exercise(NONE_LABEL if exercise == AUTO_MODE else exercise)
+        self.events.force("Ready")
+
+    def reset_counters(self):
+        for k in self.counters:
+            self.counters[k] = 0
+        self.segmenters.clear()
+        self.last_rep = None
+        self.events.emit("reset")
+
+    # ------------------------------------------------------------------
+    # FRAME ANALYSIS
+    # ------------------------------------------------------------------
+    def analyze(self, landmarks, timestamp=None):
+        """Analyse one frame of MediaPipe landmarks (or None when no pose)"""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        self.last_update = timestamp
+
+        if landmarks is None:
+            self._feedback("No pose detected", timestamp)
+            self.accuracy = 0.0
+            return self.stats()
+
+        self.accuracy = float(np.mean([lm.visibility for lm in landmarks]) * 100)
+        pose_features = self.pipeline.extract_pose_features(landmarks)
+        if pose_features is None:
+            self._feedback("No pose detected", timestamp)
+            return self.stats()
+        self.pipeline.update_history(pose_features, timestamp)
+        self._frame_index += 1
+        if self.pipeline.hf_worker is not None:
+            if self._frame_index % TRANSFORMER_STRIDE == 0:
+                self.pipeline.submit_landmark_window()
+            self.transformer = self.pipeline.hf_worker.poll()
+
+        if self.mode == AUTO_MODE:
+            self._set_exercise(self.detector.update(pose_features, self.pipeline.window_engine), timestamp)
+
+        if self.frame_listeners:
+            angles = pose_features[-5:]
+            for listener in self.frame_listeners:
+                listener(timestamp, self.current_exercise, angles)
+
+        if self.current_exercise == NONE_LABEL:
+            self._feedback("Detecting exercise..." if self.mode == AUTO_MODE else "Ready", timestamp)
+            return self.stats()
+
+        bundle = self.model_registry.current if self.model_registry is not None else None
+        if bundle is not None:
+            result = self.pipeline.analyze_exercise_form(
+                pose_features, self.current_exercise, bundle.model, bundle.scaler,
+                bundle.features, bundle.positive_class, bundle.lookup_table)
+        else:
+            result = self.pipeline.analyze_exercise_form(pose_features, self.current_exercise)
+        self._feedback(result['feedback'], timestamp, bool(result['form_correct']))
+        self.form_confidence = float(result['confidence'])
+
+        self._count_rep(self.current_exercise, pose_features, timestamp, bool(result['form_correct']))
+        return self.stats()
+
+    @property
+    def feedback(self):
+        return self.events.message
+
+    @property
+    def form_correct(self):
+        return self.events.form_correct
+
+    def _feedback(self, message, timestamp, form_correct=None):
+        """Per-frame verdict; the displayed one changes once it has persisted"""
+        if form_correct is None:
+            form_correct = self.events.form_correct
+        self.events.update(message, form_correct, timestamp, exercise=self.current_exercise)
+
+    def _set_exercise(self, exercise, timestamp=None):
+        if exercise != self.current_exercise:
+            self.current_exercise = exercise
+            self.events.emit("exercise", timestamp, exercise=exercise)
+
+    def _count_rep(self, exercise, pose_features, timestamp, form_correct):
+        rule = REP_RULES.get(exercise)
+        if rule is None:
+            return
+        segmenter = self.segmenters.get(exercise)
+        if segmenter is None:
+            segmenter = self.segmenters[exercise] = RepSegmenter(exercise, rule)
+        value = select_model_features(pose_features, [rule[0]])[0]
+        record = segmenter.update(timestamp, value, form_correct)
+        if record is not None:
+            self.counters[exercise] += 1
+            self.last_rep = record
+            self.events.emit("rep", timestamp, reps=self.counters[exercise], form_correct=self.form_correct,
+                             **record)
+
+    def stats(self):
+        return {
+            "accuracy": round(self.accuracy, 2),
+            "feedback": self.feedback,
+            "form_correct": self.form_correct,
+            "form_confidence": round(self.form_confidence, 2),
+            "current_exercise": self.current_exercise,
+            "exercise_mode": self.mode,
+            "counters": dict(self.counters),
+            "transformer": self.transformer,
+            "event_seq": self.events.seq,
+            "last_rep": self.last_rep,
+        }
@@ -5,16 +5,21 @@ MediaPipe (required) + Local ML + Optional HuggingFace
 
 import os
 import sys
+# BLAS/OpenMP pools are sized from the environment when NumPy loads
+from resource_manager import ResourceManager, limit_native_threads
+limit_native_threads()
 import cv2
 import time
 import json
+import uuid
+import hmac
 import atexit
-import joblib
 import threading
 import numpy as np
 import warnings
-from flask import Flask, Response, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
+from werkzeug.datastructures import MultiDict
 
 warnings.filterwarnings("ignore")
 
@@ -28,12 +33,19 @@ sys.path.insert(0, BASE_DIR)
 # OPTIONAL ML PIPELINE
 # -------------------------------------------------------------------
 try:
-    from ml_pipeline import ExerciseMLPipeline
+    from ml_pipeline import ExerciseMLPipeline, batch_pose_features
     ML_PIPELINE_AVAILABLE = True
 except Exception as e:
     ML_PIPELINE_AVAILABLE = False
+    batch_pose_features = None
     print("⚠ ML Pipeline not available:", e)
 
+from pose_stream import PoseStreamHub, DeltaJsonEncoder, BinaryEncoder
+from session_store import SessionStore, SAMPLE_ANGLES, REP_RESOLUTIONS
+from motion_gate import MotionGate, MOTION_THRESHOLD, REFRESH_INTERVAL
+from perf_profile import select_profile, pose_options, fit_width
+from overload import OverloadController, SLO_MS, RETRY_AFTER_S
+
 # -------------------------------------------------------------------
 # MEDIAPIPE (REQUIRED)
 # -------------------------------------------------------------------
@@ -47,6 +59,24 @@ except Exception as e:
     MEDIAPIPE_AVAILABLE = False
     print("❌ MediaPipe NOT available:", e)
 
+# -------------------------------------------------------------------
+# PERFORMANCE PROFILE (see perf_profile.py)
+# -------------------------------------------------------------------
+# Capture width, Pose settings, inference stride, JPEG quality and frame
+# pacing. REPBOT_PROFILE, a cached calibration or the default; a pending
+# calibration runs when the camera first starts (see calibrate_profile)
+performance_profile = select_profile(calibrate_if_auto=False)
+print(f"✓ Performance profile: {performance_profile['name']}",
+      "(calibration pending)" if performance_profile["calibration_pending"] else "")
+
+def calibrate_profile():
+    """Benchmark the profiles on REPBOT_CALIBRATION_CLIP once; the result is
+    cached on disk, so later starts reuse it"""
+    global performance_profile
+    if performance_profile["calibration_pending"] and MEDIAPIPE_AVAILABLE:
+        performance_profile = select_profile(calibrate_if_auto=True)
+        print(f"✓ Performance profile: {performance_profile['name']}", performance_profile["calibration"])
+
 # -------------------------------------------------------------------
 # OPTIONAL HUGGING FACE
 # -------------------------------------------------------------------
@@ -67,22 +97,26 @@ CORS(app)
 # -------------------------------------------------------------------
 # LOAD LOCAL MODELS (OPTIONAL)
 # -------------------------------------------------------------------
-model_path = os.path.join(BASE_DIR, "exercise_form_model.pkl")
-scaler_path = os.path.join(BASE_DIR, "scaler.pkl")
-
-local_model = None
-scaler = None
-local_model_loaded = False
+# Versioned artifacts live in models/<version>/ (see model_registry.py);
+# the flat exercise_form_model.pkl / scaler.pkl pair is the "legacy" version.
+# Frames read model_registry.current once, so reloads never interrupt them.
+MODELS_DIR = os.environ.get("REPBOT_MODELS_DIR", os.path.join(BASE_DIR, "models"))
+ADMIN_TOKEN = os.environ.get("REPBOT_ADMIN_TOKEN")
 
-if os.path.exists(model_path) and os.path.exists(scaler_path):
+model_registry = None
+if ML_PIPELINE_AVAILABLE:
     try:
-        local_model = joblib.load(model_path)
-        scaler = joblib.load(scaler_path)
-        local_model_loaded = True
-        print("✓ Local ML model loaded")
+        from model_registry import ModelRegistry
+        lookup_resolution = float(os.environ.get("REPBOT_LOOKUP_RESOLUTION", 0)) or None
+        model_registry = ModelRegistry(MODELS_DIR, legacy_dir=BASE_DIR, lookup_resolution=lookup_resolution)
+        model_registry.load()
+        model_registry.start_watching()
     except Exception as e:
         print("⚠ Failed to load local ML model:", e)
 
+def local_model_loaded():
+    return model_registry is not None and model_registry.current is not None
+
 # -------------------------------------------------------------------
 # INIT ML PIPELINE
 # -------------------------------------------------------------------
@@ -94,36 +128,143 @@ if ML_PIPELINE_AVAILABLE:
     except Exception as e:
         print("⚠ ML Pipeline init failed:", e)
 
+# Optional transformer analysis in a separate process (local model dir only)
+HF_MODEL_DIR = os.environ.get("REPBOT_HF_MODEL_DIR")
+HF_INPUT = os.environ.get("REPBOT_HF_INPUT", "landmarks")
+HF_FRAME_STRIDE = 15
+if ml_pipeline is not None and HF_MODEL_DIR:
+    try:
+        ml_pipeline.start_transformer_worker(
+            HF_MODEL_DIR, input_kind=HF_INPUT,
+            num_threads=int(os.environ.get("REPBOT_HF_THREADS", 2)),
+            quantize=os.environ.get("REPBOT_HF_QUANTIZE", "0") == "1")
+        print("✓ Transformer worker started:", HF_MODEL_DIR)
+    except Exception as e:
+        print("⚠ Transformer worker not started:", e)
+
 # -------------------------------------------------------------------
 # EXERCISES
 # -------------------------------------------------------------------
-EXERCISES = {
-    "BICEP_CURL": {"name": "Bicep Curl"},
-    "SQUAT": {"name": "Squat"},
-    "PUSH_UP": {"name": "Push Up"},
-    "LUNGE": {"name": "Lunge"},
-    "PLANK": {"name": "Plank"},
-    "DEADLIFT": {"name": "Deadlift"},
-    "SHOULDER_PRESS": {"name": "Shoulder Press"},
-    "LATERAL_RAISE": {"name": "Lateral Raise"},
-    "CRUNCH": {"name": "Crunch"},
-    "BURPEE": {"name": "Burpee"}
-}
-
-exercise_counters = {k: 0 for k in EXERCISES}
+# The catalogue lives in exercises.py, shared with the serve.py HTTP workers
+from exercises import EXERCISES, AUTO_MODE, normalize_exercise
+
+# Per-frame analysis state for the server camera; the exercise is detected
+# automatically unless one is selected via /api/set_exercise
+analysis_session = None
+if ml_pipeline is not None:
+    from analysis_session import AnalysisSession
+    analysis_session = AnalysisSession(EXERCISES, model_registry, pipeline=ml_pipeline)
+
+exercise_counters = analysis_session.counters if analysis_session else {k: 0 for k in EXERCISES}
+
+# Workout history (see session_store.py); REPBOT_DB_PATH="" disables it.
+# A camera session runs from start_camera to stop_camera (or a counter reset)
+DB_PATH = os.environ.get("REPBOT_DB_PATH", os.path.join(BASE_DIR, "repbot.db"))
+DEFAULT_USER = os.environ.get("REPBOT_USER", "default")
+MAX_CHART_POINTS = 5000
+session_store = None
+camera_session_id = None
+camera_user = DEFAULT_USER
+if DB_PATH:
+    try:
+        session_store = SessionStore(DB_PATH)
+    except Exception as e:
+        print("⚠ Session store not available:", e)
+
+def record_camera_event(event):
+    if session_store is not None and camera_session_id is not None:
+        session_store.record_event(camera_session_id, camera_user, event)
+
+def record_camera_angles(timestamp, exercise, angles):
+    if session_store is not None and camera_session_id is not None:
+        session_store.record_angles(camera_session_id, camera_user, angles, exercise)
+
+if session_store is not None and analysis_session is not None:
+    analysis_session.events.listeners.append(record_camera_event)
+    analysis_session.frame_listeners.append(record_camera_angles)
+    # A camera session left open by a restart is resumed with its counters
+    resumed = session_store.open_session(DEFAULT_USER, "camera")
+    if resumed is not None:
+        camera_session_id = resumed["id"]
+        exercise_counters.update(session_store.session_counters(camera_session_id))
+        print(f"✓ Resumed camera session {camera_session_id}")
 current_exercise = "None"
 feedback = "Ready"
 form_correct = True
 form_confidence = 0.0
 accuracy = 0.0
 
+# -------------------------------------------------------------------
+# CORE BUDGET (see resource_manager.py)
+# -------------------------------------------------------------------
+# HTTP threads get the reserved cores; every camera, ingest and upload
+# session gets its own core set and thread counts to match
+resources = ResourceManager()
+resources.configure()
+
+# -------------------------------------------------------------------
+# OVERLOAD CONTROL (see overload.py)
+# -------------------------------------------------------------------
+# Frame latency SLO per session; breaching it lowers the stream quality,
+# then the inference rate, then refuses new sessions and viewers
+overload = OverloadController(slo_ms=float(os.environ.get("REPBOT_LATENCY_SLO_MS", SLO_MS)),
+                              retry_after=int(os.environ.get("REPBOT_RETRY_AFTER_S", RETRY_AFTER_S)))
+
 # -------------------------------------------------------------------
 # CAMERA STATE
 # -------------------------------------------------------------------
 camera_running = False
 capture_thread = None
 last_frame = None
+# Latest 33x4 (x, y, z, visibility) landmark array, None when no pose
+last_landmarks = None
+# MediaPipe results of the last frame that went through inference
+last_pose_results = None
 pose_detector = None
+frame_index = 0
+# Called with (jpeg buffer, stats dict, landmarks) after every frame; serve.py
+# uses it to hand frames to the HTTP worker processes. The buffer is empty
+# when no one watches the annotated stream
+frame_publisher = None
+# Returns the {"frames": /video_feed, "pose": /api/pose_stream} viewer counts
+# of serve.py's HTTP workers
+remote_viewers = None
+# Angles and stats of the last pose_hub frame; serve.py publishes them with
+# the landmarks for its /api/pose_stream
+pose_summary = None
+
+# Viewer counts decide what the capture loop renders: annotated frames only
+# with /video_feed viewers, raw JPEGs only with /video_feed?raw=1 viewers
+last_raw_frame = None
+annotated_viewers = 0
+raw_viewers = 0
+viewers_lock = threading.Lock()
+captured_frames = 0
+pose_hub = PoseStreamHub()
+
+# Client-pushed frames (see ingest.py); created on the first ingest request
+INGEST_DECODE_WORKERS = int(os.environ.get("REPBOT_DECODE_WORKERS", len(resources.worker_cores)))
+INGEST_MAX_PENDING = int(os.environ.get("REPBOT_INGEST_MAX_PENDING", 2))
+frame_ingestor = None
+ingestor_lock = threading.Lock()
+
+# Multi-person mode: detect people every N frames, track boxes in between and
+# run a separate analysis session per tracked id (see multi_person.py)
+MULTI_PERSON = os.environ.get("REPBOT_MULTI_PERSON", "0") == "1"
+MULTI_PERSON_DETECT_EVERY = int(os.environ.get("REPBOT_DETECT_EVERY", 15))
+person_tracker = None
+
+# Motion gate: frames that barely differ from the last processed one reuse
+# its landmarks and results instead of running pose inference; a refresh is
+# forced every REPBOT_MOTION_REFRESH frames (see motion_gate.py)
+MOTION_GATE = os.environ.get("REPBOT_MOTION_GATE", "1") == "1"
+MOTION_THRESHOLD = float(os.environ.get("REPBOT_MOTION_THRESHOLD", MOTION_THRESHOLD))
+MOTION_REFRESH = int(os.environ.get("REPBOT_MOTION_REFRESH", REFRESH_INTERVAL))
+motion_gate = None
+
+# Camera index, or a video file replayed in a loop at its own frame rate so
+# load tests (loadtest.py) run without a webcam
+CAMERA_SOURCE = os.environ.get("REPBOT_CAMERA_SOURCE", "0")
 
 # -------------------------------------------------------------------
 # UTILS
@@ -138,27 +279,64 @@ def calculate_angle(a, b, c):
     cos = np.clip(np.dot(ba, bc) / denom, -1, 1)
     return np.degrees(np.arccos(cos))
 
+def encode_stream_frame(image):
+    """JPEG for viewers at the profile's quality, lowered (and the frame
+    shrunk) by the overload controller's stream tier"""
+    scale, quality = overload.stream_tier
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.imencode(".jpg", np.ascontiguousarray(image),
+                        [cv2.IMWRITE_JPEG_QUALITY, min(quality, performance_profile["jpeg_quality"])])
+
 # -------------------------------------------------------------------
 # FRAME PROCESSING (SAFE)
 # -------------------------------------------------------------------
-def process_frame(frame, pose):
-    global accuracy, feedback, form_correct, form_confidence
-
-    frame = np.ascontiguousarray(frame.copy())
+def process_frame(frame, pose, annotate=True, infer=True):
+    """Run pose inference and analysis on a camera frame; with ``infer``
+    False (motion gate closed) the previous results are reused"""
+    global accuracy, feedback, form_correct, form_confidence, current_exercise, frame_index, last_landmarks
+    global last_pose_results
 
-    try:
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        rgb.flags.writeable = False
-        results = pose.process(rgb)
-        rgb.flags.writeable = True
-    except Exception as e:
-        print("Pose error:", e)
-        return frame
-
-    if results.pose_landmarks:
-        landmarks = results.pose_landmarks.landmark
-        accuracy = np.mean([lm.visibility for lm in landmarks]) * 100
+    # Drawing works on a copy so the raw frame stays available unannotated
+    frame = np.ascontiguousarray(frame.copy()) if annotate else frame
 
+    if infer or last_pose_results is None:
+        try:
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            rgb.flags.writeable = False
+            results = pose.process(rgb)
+            rgb.flags.writeable = True
+        except Exception as e:
+            print("Pose error:", e)
+            return frame
+        last_pose_results = results
+
+        hf_worker = ml_pipeline.hf_worker if ml_pipeline is not None else None
+        if hf_worker is not None and hf_worker.input_kind == "frames":
+            frame_index += 1
+            if frame_index % HF_FRAME_STRIDE == 0:
+                hf_worker.submit(cv2.resize(rgb, hf_worker.slot_shape[1::-1], interpolation=cv2.INTER_AREA))
+
+        last_landmarks = None
+        if results.pose_landmarks:
+            landmarks = results.pose_landmarks.landmark
+            last_landmarks = np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float32)
+            accuracy = np.mean([lm.visibility for lm in landmarks]) * 100
+
+            if analysis_session is not None:
+                analysis_session.analyze(landmarks)
+                feedback = analysis_session.feedback
+                form_correct = analysis_session.form_correct
+                form_confidence = analysis_session.form_confidence
+                current_exercise = analysis_session.current_exercise
+            else:
+                feedback = "Processing"
+                form_correct = True
+                form_confidence = 75.0
+
+    # Gated frames redraw the landmarks of the last processed frame
+    results = last_pose_results
+    if annotate and results.pose_landmarks:
         mp_drawing.draw_landmarks(
             frame,
             results.pose_landmarks,
@@ -167,52 +345,133 @@ def process_frame(frame, pose):
             mp_drawing.DrawingSpec(color=(255,255,0), thickness=2)
         )
 
-        feedback = "Processing"
-        form_correct = True
-        form_confidence = 75.0
+    if not annotate:
+        return frame
 
     # UI overlay
+    title = EXERCISES[current_exercise]["name"] if current_exercise in EXERCISES else "RepBot - Stable Backend"
     cv2.rectangle(frame, (0,0), (frame.shape[1],60), (20,20,20), -1)
-    cv2.putText(frame, "RepBot - Stable Backend", (20,40),
+    cv2.putText(frame, title, (20,40),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255,255,255), 2)
 
     return np.ascontiguousarray(frame)
 
+def process_frame_multi(frame, tracker, annotate=True, infer=True):
+    global accuracy, feedback, form_correct, form_confidence, current_exercise, last_landmarks
+
+    frame = np.ascontiguousarray(frame.copy()) if annotate else frame
+    if infer:
+        try:
+            tracker.process(frame)
+        except Exception as e:
+            print("Pose error:", e)
+            return frame
+    if annotate:
+        tracker.draw(frame)
+
+    # Top-level stats follow the largest (closest) person
+    primary = tracker.primary()
+    last_landmarks = None
+    if primary is not None:
+        if primary.landmarks is not None:
+            last_landmarks = np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in primary.landmarks],
+                                      dtype=np.float32)
+        session = primary.session
+        accuracy = session.accuracy
+        feedback = session.feedback
+        form_correct = session.form_correct
+        form_confidence = session.form_confidence
+        current_exercise = session.current_exercise
+
+    if not annotate:
+        return frame
+    cv2.rectangle(frame, (0,0), (frame.shape[1],60), (20,20,20), -1)
+    cv2.putText(frame, f"RepBot - {len(tracker.snapshot())} people", (20,40),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255,255,255), 2)
+    return np.ascontiguousarray(frame)
+
 # -------------------------------------------------------------------
 # CAMERA THREAD (NEVER BREAKS)
 # -------------------------------------------------------------------
 def capture_camera():
-    global camera_running, last_frame, pose_detector
+    global camera_running, last_frame, last_raw_frame, pose_detector, person_tracker, captured_frames
+    global motion_gate, last_pose_results
 
-    cap = cv2.VideoCapture(0)
+    replay = not CAMERA_SOURCE.isdigit()
+    cap = cv2.VideoCapture(CAMERA_SOURCE if replay else int(CAMERA_SOURCE))
     if not cap.isOpened():
         print("❌ Camera not accessible")
         camera_running = False
         return
-
-    pose_detector = mp_pose.Pose(
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    )
-
+    # This thread and the Pose graph it builds run on the camera's cores
+    resources.pin(resources.acquire("camera"))
+    calibrate_profile()
+    # Replayed files are paced to their frame rate; cameras block on read
+    frame_interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0) if replay else 0.0
+    next_frame_at = time.monotonic()
+
+    if MULTI_PERSON:
+        from multi_person import MultiPersonTracker
+        person_tracker = MultiPersonTracker(EXERCISES, model_registry,
+                                            detect_every=MULTI_PERSON_DETECT_EVERY,
+                                            pose_options=pose_options(performance_profile))
+    else:
+        pose_detector = mp_pose.Pose(**pose_options(performance_profile))
+
+    last_pose_results = None
+    motion_gate = MotionGate(MOTION_THRESHOLD, MOTION_REFRESH) if MOTION_GATE else None
     print("✓ Camera started")
 
     while camera_running:
         try:
+            if replay:
+                time.sleep(max(0.0, next_frame_at - time.monotonic()))
+                next_frame_at = max(next_frame_at, time.monotonic()) + frame_interval
             ret, frame = cap.read()
+            if not ret and replay:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = cap.read()
             if not ret or frame is None or frame.size == 0:
                 time.sleep(0.05)
                 continue
-
-            processed = process_frame(frame, pose_detector)
-            processed = np.ascontiguousarray(processed)
-
-            ok, buffer = cv2.imencode(".jpg", processed)
-            if not ok:
-                continue
-
-            last_frame = buffer.tobytes()
-            time.sleep(0.03)
+            frame = fit_width(frame, performance_profile["width"])
+            started = time.perf_counter()
+
+            # Overlays and the annotated JPEG are only produced for someone
+            # watching them; pose stream clients draw their own
+            annotate = annotated_viewers > 0 or (remote_viewers is not None and remote_viewers()["frames"] > 0)
+            stride = performance_profile["inference_stride"] * overload.stride_factor
+            infer = (captured_frames % stride == 0
+                     and (motion_gate is None or motion_gate.check(frame)))
+            if person_tracker is not None:
+                processed = process_frame_multi(frame, person_tracker, annotate, infer)
+            else:
+                processed = process_frame(frame, pose_detector, annotate, infer)
+            captured_frames += 1
+            publish_pose(captured_frames)
+
+            if raw_viewers > 0:
+                ok, raw = encode_stream_frame(frame)
+                if ok:
+                    last_raw_frame = raw.tobytes()
+
+            buffer = b""
+            if annotate:
+                ok, encoded = encode_stream_frame(processed)
+                if ok:
+                    buffer = encoded
+                    if frame_publisher is None:
+                        last_frame = buffer.tobytes()
+            # Stats, events and landmarks are published with or without viewers
+            if frame_publisher is not None:
+                stats = stats_payload()
+                log = event_log()
+                stats["events"] = log.events_since(log.seq - EVENT_TAIL) if log is not None else []
+                stats["pose"] = pose_summary
+                frame_publisher(buffer, stats, last_landmarks)
+            # Frame latency: capture to the last encoded JPEG
+            overload.observe("camera", (time.perf_counter() - started) * 1000)
+            time.sleep(performance_profile["frame_interval"])
 
         except Exception as e:
             print("Frame error:", e)
@@ -220,68 +479,517 @@ def capture_camera():
 
     cap.release()
     pose_detector = None
+    resources.release("camera")
+    overload.forget("camera")
+    if person_tracker is not None:
+        person_tracker.close()
+        person_tracker = None
     print("Camera released")
 
 # -------------------------------------------------------------------
 # STREAM GENERATOR
 # -------------------------------------------------------------------
-def generate_frames():
-    while camera_running:
-        if last_frame:
-            yield (b"--frame\r\n"
-                   b"Content-Type: image/jpeg\r\n\r\n" +
-                   last_frame + b"\r\n")
+def generate_frames(raw=False):
+    global annotated_viewers, raw_viewers
+    with viewers_lock:
+        if raw:
+            raw_viewers += 1
         else:
-            time.sleep(0.1)
+            annotated_viewers += 1
+    try:
+        sent = None
+        while camera_running:
+            frame = last_raw_frame if raw else last_frame
+            # Each JPEG is sent once; re-sending it spins a core per viewer
+            if frame and frame is not sent:
+                sent = frame
+                yield (b"--frame\r\n"
+                       b"Content-Type: image/jpeg\r\n\r\n" +
+                       frame + b"\r\n")
+            else:
+                time.sleep(0.01 if frame else 0.1)
+    finally:
+        with viewers_lock:
+            if raw:
+                raw_viewers -= 1
+            else:
+                annotated_viewers -= 1
+
+# -------------------------------------------------------------------
+# POSE STREAM (client-side overlays)
+# -------------------------------------------------------------------
+def publish_pose(index):
+    global pose_summary
+    angles = None
+    if last_landmarks is not None and batch_pose_features is not None:
+        angles = batch_pose_features(last_landmarks[None])[0, -5:]
+    stats = {
+        "accuracy": int(round(accuracy)),
+        "feedback": feedback,
+        "form_correct": bool(form_correct),
+        "current_exercise": current_exercise,
+        "reps": exercise_counters.get(current_exercise, 0)
+    }
+    pose_hub.publish(index, time.time(), last_landmarks, angles, stats)
+    pose_summary = {"angles": angles.tolist() if angles is not None else None, "stats": stats}
+
+# -------------------------------------------------------------------
+# CONTROL (shared by the routes and the serve.py capture worker)
+# -------------------------------------------------------------------
+# Most recent events attached to the stats handed to serve.py front ends
+EVENT_TAIL = 16
+# Upper bound for /api/events long-polls (seconds)
+EVENT_WAIT_MAX_S = 30.0
+
+def event_log():
+    """FeedbackEngine of the analysed (or primary tracked) person, if any"""
+    if person_tracker is not None:
+        primary = person_tracker.primary()
+        return primary.session.events if primary is not None else None
+    return analysis_session.events if analysis_session is not None else None
+
+def stats_payload():
+    log = event_log()
+    remote = remote_viewers() if remote_viewers is not None else {"frames": 0, "pose": 0}
+    return {
+        "accuracy": round(accuracy,2),
+        "feedback": feedback,
+        "form_correct": form_correct,
+        "form_confidence": round(form_confidence,2),
+        "current_exercise": current_exercise,
+        "exercise_mode": analysis_session.mode if analysis_session else "None",
+        "counters": dict(exercise_counters),
+        "available_exercises": {k:v["name"] for k,v in EXERCISES.items()},
+        "multi_person": person_tracker.stats() if person_tracker is not None else None,
+        "viewers": {"annotated": annotated_viewers + remote["frames"], "raw": raw_viewers,
+                    "pose_stream": pose_hub.subscribers + remote["pose"]},
+        "motion_gate": motion_gate.stats() if motion_gate is not None else None,
+        "profile": performance_profile["name"],
+        "core_sets": {name: list(cores) for name, cores in resources.assignments.items()},
+        "overload": overload.stats(),
+        # serve.py HTTP workers score landmark batches with this version
+        "model_version": model_registry.current.version if local_model_loaded() else None,
+        "event_seq": log.seq if log is not None else 0
+    }
+
+def begin_camera_session(user=None):
+    """Close the current camera session (if any) and open a new one"""
+    global camera_session_id, camera_user
+    if session_store is None:
+        return
+    if camera_session_id is not None:
+        session_store.end_session(camera_session_id)
+    camera_user = user or DEFAULT_USER
+    camera_session_id = session_store.start_session(uuid.uuid4().hex, camera_user, "camera",
+                                                    analysis_session.mode if analysis_session else None)
+
+def end_camera_session():
+    global camera_session_id
+    if session_store is not None and camera_session_id is not None:
+        session_store.end_session(camera_session_id)
+    camera_session_id = None
+
+def start_capture(user=None):
+    """Start the capture thread; returns False if it was already running"""
+    global camera_running, capture_thread
+    if camera_running:
+        return False
+    if camera_session_id is None or (user and user != camera_user):
+        begin_camera_session(user)
+    camera_running = True
+    capture_thread = threading.Thread(target=capture_camera, daemon=True)
+    capture_thread.start()
+    return True
+
+def stop_capture():
+    global camera_running
+    camera_running = False
+    end_camera_session()
+
+def select_exercise(exercise):
+    """Apply a /api/set_exercise value; raises ValueError for unknown names"""
+    global current_exercise
+    exercise = normalize_exercise(exercise)
+    analysis_session.set_exercise(exercise)
+    current_exercise = analysis_session.current_exercise
+    return exercise
+
+def reset_all_counters():
+    if analysis_session is not None:
+        analysis_session.reset_counters()
+    else:
+        for k in exercise_counters:
+            exercise_counters[k] = 0
+    # Counter values restored on restart come from the session's reps, so a
+    # reset starts a new session
+    if camera_session_id is not None:
+        begin_camera_session(camera_user)
 
 # -------------------------------------------------------------------
 # ROUTES
 # -------------------------------------------------------------------
 @app.route("/")
 def index():
-    return jsonify({"status": "RepBot Backend", "mediapipe": MEDIAPIPE_AVAILABLE})
+    return jsonify({
+        "status": "RepBot Backend",
+        "mediapipe": MEDIAPIPE_AVAILABLE,
+        "model_version": model_registry.current.version if local_model_loaded() else None
+    })
+
+def overloaded():
+    """503 with Retry-After for a session or viewer refused under overload"""
+    retry_after = overload.refuse()
+    return (jsonify({"status": "error", "message": "Server overloaded, retry later",
+                     "retry_after": retry_after}), 503, {"Retry-After": str(retry_after)})
 
 @app.route("/video_feed")
 def video_feed():
+    if not overload.admitting:
+        return overloaded()
     return Response(
-        generate_frames(),
+        generate_frames(raw=request.args.get("raw") == "1"),
         mimetype="multipart/x-mixed-replace; boundary=frame"
     )
 
+@app.route("/api/pose_stream")
+def pose_stream():
+    """Landmarks, angles and feedback per frame (see pose_stream.py)"""
+    if not overload.admitting:
+        return overloaded()
+    if request.args.get("format") == "binary":
+        encoder, mimetype = BinaryEncoder(), "application/octet-stream"
+    else:
+        encoder, mimetype = DeltaJsonEncoder(), "text/event-stream"
+
+    def generate():
+        for frame in pose_hub.frames(active=lambda: camera_running):
+            yield encoder.encode(*frame)
+    return Response(generate(), mimetype=mimetype, headers={"Cache-Control": "no-cache"})
+
 @app.route("/api/start_camera", methods=["POST"])
 def start_camera():
-    global camera_running, capture_thread
-
-    if camera_running:
+    if not camera_running and not overload.admitting:
+        return overloaded()
+    if not start_capture((request.get_json(silent=True) or {}).get("user")):
         return jsonify({"status": "success", "message": "Camera already running"})
 
-    camera_running = True
-    capture_thread = threading.Thread(target=capture_camera, daemon=True)
-    capture_thread.start()
     time.sleep(0.5)
 
     return jsonify({"status": "success", "message": "Camera started"})
 
 @app.route("/api/stop_camera", methods=["POST"])
 def stop_camera():
-    global camera_running
-    camera_running = False
+    stop_capture()
     time.sleep(0.5)
     return jsonify({"status": "success", "message": "Camera stopped"})
 
 @app.route("/api/get_stats")
 def get_stats():
-    return jsonify({
-        "status": "success",
-        "data": {
-            "accuracy": round(accuracy,2),
-            "feedback": feedback,
-            "form_correct": form_correct,
-            "form_confidence": round(form_confidence,2),
-            "counters": exercise_counters,
-            "available_exercises": {k:v["name"] for k,v in EXERCISES.items()}
-        }
-    })
+    return jsonify({"status": "success", "data": stats_payload()})
+
+@app.route("/api/resources")
+def get_resources():
+    """Core roles, per-session core sets and per-core utilisation"""
+    return jsonify({"status": "success", "data": resources.report()})
+
+@app.route("/api/events")
+def feedback_events():
+    """Long-poll for feedback/rep/exercise events after ?since=<event_seq>"""
+    log = event_log()
+    if log is None:
+        return jsonify({"status": "success", "seq": 0, "events": []})
+    since = request.args.get("since", 0, type=int)
+    timeout = min(max(request.args.get("timeout", 25.0, type=float), 0.0), EVENT_WAIT_MAX_S)
+    if since > log.seq:
+        # The event source changed (e.g. a new primary person); start over
+        since = 0
+    events = log.wait(since, timeout) if timeout > 0 else log.events_since(since)
+    return jsonify({"status": "success", "seq": log.seq, "events": events})
+
+@app.route("/api/set_exercise", methods=["POST"])
+def set_exercise():
+    if analysis_session is None:
+        return jsonify({"status": "error", "message": "ML Pipeline not available"}), 503
+
+    exercise = (request.get_json(silent=True) or {}).get("exercise", AUTO_MODE)
+    try:
+        exercise = select_exercise(exercise)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", "exercise": exercise})
+
+@app.route("/api/reset_counters", methods=["POST"])
+def reset_counters():
+    reset_all_counters()
+    return jsonify({"status": "success", "message": "Counters reset"})
+
+def history_filters(args):
+    """user/exercise/since/until query arguments (times as Unix seconds)"""
+    exercise = args.get("exercise")
+    return {
+        "user_id": args.get("user"),
+        "exercise": normalize_exercise(exercise) if exercise else None,
+        "since": args.get("since", type=float),
+        "until": args.get("until", type=float),
+    }
+
+def history_query(name, args, session_id=None):
+    """Data of /api/history/<name> for the query arguments ``args`` (a
+    MultiDict or plain dict); serve.py forwards its requests here. Raises
+    ValueError for bad arguments"""
+    if not isinstance(args, MultiDict):
+        args = MultiDict(args)
+    filters = history_filters(args)
+    if name == "sessions":
+        return session_store.sessions(limit=min(args.get("limit", 100, type=int), 1000), **filters)
+    if name == "reps":
+        return session_store.reps(session_id=args.get("session"),
+                                  limit=min(args.get("limit", 1000, type=int), 10000), **filters)
+    if name == "rep_series":
+        resolution = args.get("resolution", "minute")
+        if resolution not in REP_RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {list(REP_RESOLUTIONS)}")
+        return session_store.rep_series(resolution, **filters)
+    if name == "session":
+        return session_store.session_summary(session_id)
+    if name == "angles":
+        angles = args.get("angles")
+        return session_store.angle_series(
+            session_id=args.get("session"), user_id=filters["user_id"],
+            since=filters["since"], until=filters["until"],
+            points=min(max(args.get("points", 500, type=int), 3), MAX_CHART_POINTS),
+            angles=angles.split(",") if angles else SAMPLE_ANGLES)
+    raise ValueError(f"Unknown history query: {name}")
+
+def history_response(name, session_id=None):
+    if session_store is None:
+        return jsonify({"status": "error", "message": "Session store disabled"}), 503
+    try:
+        data = history_query(name, request.args, session_id)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", "data": data})
+
+@app.route("/api/history/sessions")
+def history_sessions():
+    return history_response("sessions")
+
+@app.route("/api/history/reps")
+def history_reps():
+    return history_response("reps")
+
+@app.route("/api/history/rep_series")
+def history_rep_series():
+    """Rep totals per minute/hour/day from the rollup table"""
+    return history_response("rep_series")
+
+@app.route("/api/history/sessions/<session_id>")
+def history_session(session_id):
+    return history_response("session", session_id)
+
+@app.route("/api/history/angles")
+def history_angles():
+    """Joint-angle series of a session or user, downsampled to ?points="""
+    return history_response("angles")
+
+def models_info():
+    current = model_registry.current if model_registry else None
+    return {
+        "active": current.info() if current else None,
+        "versions": model_registry.list_versions() if model_registry else [],
+        "last_error": model_registry.last_error if model_registry else None
+    }
+
+@app.route("/api/admin/models")
+def list_models():
+    return jsonify({"status": "success", "data": models_info()})
+
+@app.route("/api/admin/reload_model", methods=["POST"])
+def reload_model():
+    # Without a configured token the route is disabled, not open
+    if not ADMIN_TOKEN:
+        return jsonify({"status": "error", "message": "Model reload disabled (set REPBOT_ADMIN_TOKEN)"}), 403
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    if model_registry is None:
+        return jsonify({"status": "error", "message": "Model registry not available"}), 503
+
+    version = (request.get_json(silent=True) or {}).get("version")
+    try:
+        bundle = model_registry.load(version)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Reload failed: {e}"}), 400
+    return jsonify({"status": "success", "data": bundle.info()})
+
+# -------------------------------------------------------------------
+# REMOTE FRAME INGESTION
+# -------------------------------------------------------------------
+def get_ingestor():
+    global frame_ingestor
+    with ingestor_lock:
+        if frame_ingestor is None:
+            from ingest import FrameIngestor
+            frame_ingestor = FrameIngestor(EXERCISES, model_registry, decode_workers=INGEST_DECODE_WORKERS,
+                                           max_pending=INGEST_MAX_PENDING, store=session_store,
+                                           pose_options=pose_options(performance_profile),
+                                           resources=resources, overload=overload)
+    return frame_ingestor
+
+@app.route("/api/ingest/sessions", methods=["GET", "POST"])
+def ingest_sessions():
+    if not (ML_PIPELINE_AVAILABLE and MEDIAPIPE_AVAILABLE):
+        return jsonify({"status": "error", "message": "ML Pipeline not available"}), 503
+    ingestor = get_ingestor()
+    if request.method == "GET":
+        return jsonify({"status": "success", "data": ingestor.stats()})
+
+    if not overload.admitting:
+        return overloaded()
+    body = request.get_json(silent=True) or {}
+    exercise = normalize_exercise(body.get("exercise", AUTO_MODE))
+    try:
+        session = ingestor.create_session(exercise, body.get("user") or DEFAULT_USER)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    return jsonify({"status": "success", "session_id": session.id})
+
+@app.route("/api/ingest/sessions/<session_id>", methods=["GET", "DELETE"])
+def ingest_session(session_id):
+    ingestor = get_ingestor()
+    session = ingestor.get(session_id)
+    if session is None:
+        return jsonify({"status": "error", "message": "Unknown session"}), 404
+    if request.method == "DELETE":
+        stats = session.stats()
+        ingestor.close_session(session_id)
+        return jsonify({"status": "success", "data": stats})
+    return jsonify({"status": "success", "data": session.stats()})
+
+@app.route("/api/ingest/sessions/<session_id>/frames", methods=["POST"])
+def ingest_frames(session_id):
+    session = get_ingestor().get(session_id)
+    if session is None:
+        return jsonify({"status": "error", "message": "Unknown session"}), 404
+
+    # image/jpeg: one frame per request; anything else: a (chunked) stream
+    # of length-prefixed frames, see ingest.FRAME_HEADER
+    if request.mimetype == "image/jpeg":
+        from ingest import MAX_FRAME_BYTES
+        if request.content_length is not None and request.content_length > MAX_FRAME_BYTES:
+            return jsonify({"status": "error", "message": f"Frame exceeds {MAX_FRAME_BYTES} bytes"}), 413
+        # Bounded read: chunked bodies carry no Content-Length
+        chunks, size = [], 0
+        while size <= MAX_FRAME_BYTES:
+            chunk = request.stream.read(MAX_FRAME_BYTES + 1 - size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        jpeg = b"".join(chunks)
+        if size > MAX_FRAME_BYTES:
+            return jsonify({"status": "error", "message": f"Frame exceeds {MAX_FRAME_BYTES} bytes"}), 413
+        client_ts = request.headers.get("X-Frame-Timestamp", type=float)
+        accepted = int(session.submit(jpeg, client_ts))
+    else:
+        try:
+            accepted = session.ingest_stream(request.stream)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", "accepted": accepted, "data": session.stats()})
+
+# -------------------------------------------------------------------
+# VIDEO UPLOADS (see video_stream.py)
+# -------------------------------------------------------------------
+# Clips analysed at the same time; each holds a MediaPipe graph and a decoder
+MAX_VIDEO_JOBS = int(os.environ.get("REPBOT_MAX_VIDEO_JOBS", 2))
+video_jobs = threading.BoundedSemaphore(MAX_VIDEO_JOBS)
+
+def start_video_job(stream, exercise, user):
+    """VideoStreamAnalysis holding a job slot; None when all slots are busy.
+    Raises ValueError for unknown exercises"""
+    if not video_jobs.acquire(blocking=False):
+        return None
+    try:
+        from video_stream import VideoStreamAnalysis
+        return VideoStreamAnalysis(stream, EXERCISES, model_registry, normalize_exercise(exercise),
+                                   pose_options=pose_options(performance_profile),
+                                   store=session_store, user_id=user or DEFAULT_USER)
+    except Exception:
+        video_jobs.release()
+        raise
+
+def run_video_job(job):
+    try:
+        # The request thread (and ffmpeg, MediaPipe) run on the job's cores
+        with resources.session(f"upload:{job.id[:12]}"):
+            yield from job.run()
+    finally:
+        video_jobs.release()
+
+@app.route("/api/video/analyze", methods=["POST"])
+def analyze_video():
+    """Raw video body, analysed as it uploads; progress streams back as SSE"""
+    if not (ML_PIPELINE_AVAILABLE and MEDIAPIPE_AVAILABLE):
+        return jsonify({"status": "error", "message": "ML Pipeline not available"}), 503
+    if not overload.admitting:
+        return overloaded()
+    try:
+        job = start_video_job(request.stream, request.args.get("exercise", AUTO_MODE), request.args.get("user"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if job is None:
+        return jsonify({"status": "error", "message": "Too many video analyses"}), 503
+    return Response(stream_with_context(run_video_job(job)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/detect", methods=["POST"])
+def detect():
+    """Multipart upload (field "video"); answers once the clip is analysed"""
+    if 'video' not in request.files:
+        return jsonify({'error': 'No video file provided'}), 400
+    if not (ML_PIPELINE_AVAILABLE and MEDIAPIPE_AVAILABLE):
+        return jsonify({'error': 'ML Pipeline not available'}), 503
+    if not overload.admitting:
+        return overloaded()
+    try:
+        job = start_video_job(request.files['video'].stream, request.form.get("exercise", AUTO_MODE),
+                              request.form.get("user"))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if job is None:
+        return jsonify({'error': 'Too many video analyses'}), 503
+    for _ in run_video_job(job):
+        pass
+    return jsonify(job.summary)
+
+# -------------------------------------------------------------------
+# ON-DEVICE LANDMARK BATCHES
+# -------------------------------------------------------------------
+landmark_analyzer = None
+
+def analyze_landmarks(body, exercise=AUTO_MODE, session_key=None):
+    """Result of one /api/landmarks/batch body; serve.py forwards the
+    batches of keyed sessions here. Raises ValueError for bad input"""
+    global landmark_analyzer
+    from landmark_batch import LandmarkBatchAnalyzer, parse_batch
+    if landmark_analyzer is None:
+        landmark_analyzer = LandmarkBatchAnalyzer(EXERCISES, model_registry)
+
+    timestamps, landmarks = parse_batch(body)
+    return landmark_analyzer.analyze(timestamps, landmarks, normalize_exercise(exercise), session_key)
+
+@app.route("/api/landmarks/batch", methods=["POST"])
+def landmark_batch():
+    if not ML_PIPELINE_AVAILABLE:
+        return jsonify({"status": "error", "message": "ML Pipeline not available"}), 503
+    try:
+        result = analyze_landmarks(request.get_data(cache=False), request.args.get("exercise", AUTO_MODE),
+                                   request.args.get("session"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", "data": result})
 
 # -------------------------------------------------------------------
 # CLEANUP
@@ -289,6 +997,13 @@ def get_stats():
 def cleanup():
     global camera_running
     camera_running = False
+    if ml_pipeline is not None and ml_pipeline.hf_worker is not None:
+        ml_pipeline.hf_worker.close()
+    if frame_ingestor is not None:
+        frame_ingestor.close()
+    if session_store is not None:
+        # The camera session stays open so a restart resumes it
+        session_store.close()
 
 atexit.register(cleanup)
 
@@ -297,4 +1012,6 @@ atexit.register(cleanup)
 # -------------------------------------------------------------------
 if __name__ == "__main__":
     print("RepBot Backend running on http://0.0.0.0:5000")
+    # Request threads inherit the serving thread's cores
+    resources.reserve_http()
     app.run(host="0.0.0.0", port=5000, debug=True, threaded=True, use_reloader=False)
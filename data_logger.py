@@ -0,0 +1,156 @@
+"""
+Background training-data logger
+Queues rows from the camera loop and writes them to disk in batches
+"""
+import os
+import csv
+import time
+import queue
+import threading
+import numpy as np
+
+
+class BatchedDataLogger:
+    """Non-blocking row logger with batched flushes and size-based rotation
+
+    The frame loop only pays for a ``queue.put``; a daemon thread drains the
+    queue and flushes when ``batch_size`` rows are pending or ``flush_interval``
+    seconds have passed. Files are rotated once they exceed ``max_bytes``
+    (``exercise_data.csv`` -> ``exercise_data.1.csv`` ...).
+
+    ``fmt="csv"`` appends to a CSV file; ``fmt="npz"`` writes each batch as a
+    columnar NumPy archive (one float32 array per numeric column) which loads
+    much faster than CSV for training.
+    """
+
+    def __init__(self, file_path, columns, batch_size=256, flush_interval=2.0,
+                 max_bytes=50 * 1024 * 1024, fmt="csv", max_queue=10000):
+        if fmt not in ("csv", "npz"):
+            raise ValueError(f"Unsupported log format: {fmt}")
+        self.file_path = file_path
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        # Continue after the chunks of earlier runs instead of overwriting them
+        self._chunk_index = self._next_chunk_index() if fmt == "npz" else 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok=True)
+        if fmt == "csv":
+            self._write_csv_header(file_path)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # PUBLIC API
+    # ------------------------------------------------------------------
+    def log(self, row):
+        """Queue one row; never blocks the caller (drops when saturated)"""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.rows_dropped += 1
+
+    def close(self, timeout=5.0):
+        """Flush everything still queued and stop the writer thread"""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # WRITER THREAD
+    # ------------------------------------------------------------------
+    def _run(self):
+        pending = []
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                pending.append(self._queue.get(timeout=timeout))
+                # Drain whatever else is already waiting without blocking
+                while len(pending) < self.batch_size:
+                    pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            due = time.monotonic() - last_flush >= self.flush_interval
+            if pending and (len(pending) >= self.batch_size or due or self._stop.is_set()):
+                self._flush(pending)
+                pending = []
+                last_flush = time.monotonic()
+            elif due:
+                last_flush = time.monotonic()
+
+            if self._stop.is_set() and self._queue.empty() and not pending:
+                break
+
+    def _flush(self, rows):
+        try:
+            if self.fmt == "csv":
+                self._flush_csv(rows)
+            else:
+                self._flush_npz(rows)
+            self.rows_written += len(rows)
+        except Exception as e:
+            print(f"⚠ Data logger flush failed: {e}")
+
+    def _flush_csv(self, rows):
+        self._rotate_if_needed()
+        with open(self.file_path, mode="a", newline="") as file:
+            csv.writer(file).writerows(rows)
+
+    def _flush_npz(self, rows):
+        base, _ = os.path.splitext(self.file_path)
+        columns = {}
+        for idx, name in enumerate(self.columns):
+            values = [row[idx] for row in rows]
+            try:
+                columns[name] = np.asarray(values, dtype=np.float32)
+            except (TypeError, ValueError):
+                columns[name] = np.asarray(values, dtype=str)
+        chunk_path = f"{base}.{self._chunk_index:05d}.npz"
+        np.savez(chunk_path, **columns)
+        self._chunk_index += 1
+
+    def _next_chunk_index(self):
+        base, _ = os.path.splitext(self.file_path)
+        directory, prefix = os.path.split(os.path.abspath(base))
+        indices = []
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                index = name[len(prefix) + 1:-len(".npz")]
+                if name.startswith(prefix + ".") and name.endswith(".npz") and index.isdigit():
+                    indices.append(int(index))
+        return max(indices) + 1 if indices else 0
+
+    def _rotate_if_needed(self):
+        if self.max_bytes is None:
+            return
+        try:
+            size = os.path.getsize(self.file_path)
+        except OSError:
+            return
+        if size < self.max_bytes:
+            return
+
+        base, ext = os.path.splitext(self.file_path)
+        index = 1
+        while os.path.exists(f"{base}.{index}{ext}"):
+            index += 1
+        os.replace(self.file_path, f"{base}.{index}{ext}")
+        self._write_csv_header(self.file_path)
+
+    def _write_csv_header(self, path):
+        with open(path, mode="w", newline="") as file:
+            csv.writer(file).writerow(self.columns)
@@ -0,0 +1,174 @@
+"""
+Decision Lookup Table
+Bakes the angle-based form model into a dense grid over 0-180 degrees so
+per-frame classification becomes a single array index.
+
+Usage:
+    python decision_table.py --resolution 1.0 --data exercise_data.csv
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+ANGLE_MIN = 0.0
+ANGLE_MAX = 180.0
+TABLE_FILE = "decision_table.npz"
+MAX_CELLS = 20_000_000
+BUILD_CHUNK = 65536
+
+
+class DecisionLookupTable:
+    """Dense (class, confidence) grid over the model's angle inputs
+
+    ``classes[i, j, ...]`` holds the index into ``model.classes_`` predicted at
+    grid point (i * resolution, j * resolution, ...) and ``confidence`` the
+    winning probability. Inputs are snapped to the nearest grid point.
+    """
+
+    def __init__(self, classes, confidence, resolution, features, model_classes,
+                 positive_class, report=None):
+        self.classes = classes
+        self.confidence = confidence
+        self.resolution = float(resolution)
+        self.features = list(features)
+        self.model_classes = np.asarray(model_classes)
+        self.positive_class = positive_class
+        self.report = report or {}
+        self._positive_idx = int(np.flatnonzero(self.model_classes == positive_class)[0]) \
+            if positive_class in self.model_classes else len(self.model_classes) - 1
+        self._max_index = np.array(classes.shape) - 1
+
+    # ------------------------------------------------------------------
+    # BUILD
+    # ------------------------------------------------------------------
+    @classmethod
+    def build(cls, model, scaler, features, positive_class, resolution=1.0, eval_rows=None):
+        """Evaluate the model on every grid point and measure the accuracy loss
+
+        ``eval_rows`` (N x len(features) angles, e.g. the training data) is
+        used to report how often the table disagrees with the model; uniform
+        random angles are used when it is not given.
+        """
+        axis = np.arange(ANGLE_MIN, ANGLE_MAX + resolution / 2, resolution)
+        shape = (len(axis),) * len(features)
+        cells = int(np.prod(shape))
+        if cells > MAX_CELLS:
+            raise ValueError(f"Grid of {cells} cells is too large; use a coarser resolution")
+
+        start = time.perf_counter()
+        classes = np.empty(cells, dtype=np.uint8)
+        confidence = np.empty(cells, dtype=np.float16)
+        for offset in range(0, cells, BUILD_CHUNK):
+            flat = np.arange(offset, min(offset + BUILD_CHUNK, cells))
+            grid = axis[np.stack(np.unravel_index(flat, shape), axis=1)]
+            proba = model.predict_proba(scaler.transform(grid))
+            classes[flat] = np.argmax(proba, axis=1)
+            confidence[flat] = np.max(proba, axis=1)
+        build_time = time.perf_counter() - start
+
+        table = cls(classes.reshape(shape), confidence.reshape(shape), resolution,
+                    features, model.classes_, positive_class)
+        table.report = table.evaluate(model, scaler, eval_rows)
+        table.report.update({"cells": cells, "build_time_s": build_time,
+                             "bytes": int(classes.nbytes + confidence.nbytes)})
+        return table
+
+    def evaluate(self, model, scaler, rows=None, samples=10000):
+        """Agreement with the exact model and mean confidence error"""
+        if rows is None:
+            rows = np.random.default_rng(0).uniform(ANGLE_MIN, ANGLE_MAX, size=(samples, len(self.features)))
+        rows = np.asarray(rows, dtype=np.float64)
+        proba = model.predict_proba(scaler.transform(rows))
+        exact_cls = np.argmax(proba, axis=1)
+        table_cls, table_conf = self.lookup_indices(rows)
+        return {
+            "resolution": self.resolution,
+            "eval_rows": int(len(rows)),
+            "agreement": float(np.mean(exact_cls == table_cls)),
+            "accuracy_loss": float(np.mean(exact_cls != table_cls)),
+            "confidence_mae": float(np.mean(np.abs(np.max(proba, axis=1) - table_conf))),
+        }
+
+    # ------------------------------------------------------------------
+    # LOOKUP
+    # ------------------------------------------------------------------
+    def _grid_index(self, rows):
+        idx = np.rint((np.asarray(rows, dtype=np.float64) - ANGLE_MIN) / self.resolution).astype(np.intp)
+        return np.clip(idx, 0, self._max_index)
+
+    def lookup_indices(self, rows):
+        """Class indices and confidences for N x d angle rows (one fancy index)"""
+        idx = tuple(self._grid_index(rows).T)
+        return self.classes[idx], self.confidence[idx].astype(np.float32)
+
+    def classify(self, row):
+        """(form_correct, confidence 0-100) for one angle row"""
+        idx = tuple(self._grid_index(row))
+        return bool(self.classes[idx] == self._positive_idx), float(self.confidence[idx]) * 100
+
+    def classify_batch(self, rows):
+        """Vectorised form verdicts for a whole recorded session"""
+        cls_idx, conf = self.lookup_indices(rows)
+        return cls_idx == self._positive_idx, conf * 100
+
+    # ------------------------------------------------------------------
+    # PERSISTENCE
+    # ------------------------------------------------------------------
+    def save(self, path):
+        np.savez(path, classes=self.classes, confidence=self.confidence,
+                 resolution=self.resolution, features=np.array(self.features),
+                 model_classes=self.model_classes, positive_class=self.positive_class,
+                 accuracy_loss=self.report.get("accuracy_loss", np.nan))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            report = {"accuracy_loss": float(data["accuracy_loss"]), "resolution": float(data["resolution"])}
+            return cls(data["classes"], data["confidence"], float(data["resolution"]),
+                       [str(f) for f in data["features"]], data["model_classes"],
+                       data["positive_class"].item(), report)
+
+
+def build_for_bundle(bundle, resolution, eval_rows=None):
+    """Build a table for a registry ModelBundle"""
+    return DecisionLookupTable.build(bundle.model, bundle.scaler, bundle.features,
+                                     bundle.positive_class, resolution, eval_rows)
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+def main(argv=None):
+    import pandas as pd
+    from model_registry import ModelRegistry, LEGACY_VERSION
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Bake the form model into a lookup table")
+    parser.add_argument("--resolution", type=float, default=1.0, help="grid step in degrees")
+    parser.add_argument("--data", help="CSV of real angles used to measure the accuracy loss")
+    parser.add_argument("--models-dir", default=os.path.join(base_dir, "models"))
+    parser.add_argument("--version", help="model version (default: active)")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.models_dir, legacy_dir=base_dir)
+    bundle = registry.load(args.version)
+    eval_rows = None
+    if args.data:
+        eval_rows = pd.read_csv(args.data, usecols=bundle.features).dropna()[bundle.features].to_numpy()
+
+    table = build_for_bundle(bundle, args.resolution, eval_rows)
+    directory = base_dir if bundle.version == LEGACY_VERSION else os.path.join(args.models_dir, bundle.version)
+    table.save(os.path.join(directory, TABLE_FILE))
+
+    r = table.report
+    print(f"✓ {r['cells']} cells ({r['bytes'] / 1024:.0f} KiB) built in {r['build_time_s']:.2f}s")
+    print(f"  agreement with model: {r['agreement'] * 100:.2f}% "
+          f"(accuracy loss {r['accuracy_loss'] * 100:.2f}%, confidence MAE {r['confidence_mae']:.4f}) "
+          f"on {r['eval_rows']} rows")
+    print(f"✓ Saved to {os.path.join(directory, TABLE_FILE)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Downsampling
+Largest-Triangle-Three-Buckets (LTTB) reduction of time series for charts.
+Keeps the first and last point and, per bucket, the point spanning the
+largest triangle with its neighbours, so peaks and troughs (rep extremes)
+survive where plain decimation or averaging would flatten them.
+"""
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """Indices of the ``n_out`` points of (x, y) LTTB keeps (sorted by x)
+
+    ``y`` may be N x K (several series sharing ``x``); the result is then
+    n_out x K, one column of indices per series, computed in one pass.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    flat = y.ndim == 1
+    y = y.reshape(len(y), -1)
+    n, k = y.shape
+    if n_out >= n:
+        selected = np.repeat(np.arange(n)[:, None], k, axis=1)
+    elif n_out < 3:
+        selected = np.repeat(np.array([0, n - 1], dtype=np.intp)[:max(n_out, 0), None], k, axis=1)
+    else:
+        selected = _lttb(x, y, n_out)
+    return selected[:, 0] if flat else selected
+
+
+def _lttb(x, y, n_out):
+    n, k = y.shape
+    # Buckets over the interior points; edges[i]:edges[i + 1] is bucket i
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.intp) + 1
+    edges[-1] = n - 1
+    # Mean of every bucket, used as the third vertex of the previous bucket
+    counts = np.diff(edges)
+    means_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts, x[-1])
+    means_y = np.vstack([np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts[:, None], y[-1:]])
+
+    selected = np.empty((n_out, k), dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = np.zeros(k, dtype=np.intp)
+    columns = np.arange(k)
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a, columns]
+        cx, cy = means_x[i + 1], means_y[i + 1]
+        # Twice the triangle area (a, candidate, next bucket mean), per series
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi, None]) * (cy - ay))
+        a = lo + area.argmax(axis=0)
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_series(x, y, n_out):
+    """(x, y) reduced to at most ``n_out`` points; NaN values are dropped first"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = ~np.isnan(y)
+    x, y = x[keep], y[keep]
+    idx = lttb(x, y, n_out)
+    return x[idx], y[idx]
@@ -0,0 +1,204 @@
+"""
+Exercise Auto-Detection
+Cost-aware cascade: cheap pose-geometry rules first, a window classifier
+only when the rules are ambiguous, geometric tie-breaks when there is no
+classifier (or it is unsure), and hysteresis on top so the detected label
+does not flap between frames.
+
+The classifier is the ``exercise_classifier.pkl`` of the active model
+version (see model_registry.py) unless one is passed in. DEADLIFT and
+BURPEE are always ambiguous for the rules, so without a classifier they come
+from the tie-breaks, which follow the torso inclination over the window.
+"""
+from collections import deque
+import numpy as np
+
+from ml_pipeline import KEY_JOINTS
+
+NONE_LABEL = "None"
+# Range of motion (degrees over the window) that counts as "moving"
+MOVING_RANGE = 35.0
+# Torso closer to horizontal than this (degrees from vertical) means lying down
+LYING_TORSO_ANGLE = 55.0
+# Torso inclination swing over the window of a burpee (standing <-> floor)
+# and of a hip hinge (deadlift)
+BURPEE_SWING = 60.0
+HINGE_SWING = 25.0
+# A deadlift keeps the knees above this angle; a squat goes below it
+DEADLIFT_MIN_KNEE = 110.0
+
+
+def _joint_xy(pose_features, name):
+    j = KEY_JOINTS.index(name)
+    return np.asarray(pose_features[4 * j:4 * j + 2], dtype=np.float64)
+
+
+class ExerciseDetector:
+    """Decides which exercise is being performed from pose + window features
+
+    ``update()`` returns the current (debounced) exercise key, or "None" while
+    nothing has been recognised yet. A new label only replaces the current one
+    after winning ``switch_frames`` consecutive frames. ``classifier`` is any
+    estimator with ``predict_proba`` / ``classes_`` trained on
+    ``SlidingWindowFeatureEngine.feature_vector()``; it is only consulted for
+    frames the rules cannot settle. Without one, the active model version's
+    classifier in ``model_registry`` is used, if it has one.
+    """
+
+    def __init__(self, classifier=None, switch_frames=15, min_confidence=0.6, model_registry=None):
+        self.classifier = classifier
+        self.model_registry = model_registry
+        self.switch_frames = switch_frames
+        self.min_confidence = min_confidence
+        self.current = NONE_LABEL
+        self.confidence = 0.0
+        self._candidate = None
+        self._candidate_frames = 0
+        # Torso inclination (degrees from vertical) over the window
+        self._inclination = None
+        self.stage_counts = {"rules": 0, "classifier": 0, "fallback": 0, "idle": 0}
+
+    def reset(self):
+        self.current = NONE_LABEL
+        self.confidence = 0.0
+        self._candidate = None
+        self._candidate_frames = 0
+        self._inclination = None
+
+    @property
+    def active_classifier(self):
+        if self.classifier is not None:
+            return self.classifier
+        bundle = self.model_registry.current if self.model_registry is not None else None
+        return getattr(bundle, "exercise_classifier", None)
+
+    # ------------------------------------------------------------------
+    # CASCADE
+    # ------------------------------------------------------------------
+    def _rules(self, pose_features, window):
+        """Stage 1: returns (label, candidates); label is None when ambiguous"""
+        mid_shoulder = (_joint_xy(pose_features, 'LEFT_SHOULDER') + _joint_xy(pose_features, 'RIGHT_SHOULDER')) / 2
+        torso_from_vertical = self._inclination[-1]
+        lying = torso_from_vertical > LYING_TORSO_ANGLE
+
+        stats = window.stats
+        names = window.angle_names
+        arm_range = max(stats[names.index('left_arm')].features()[5], stats[names.index('right_arm')].features()[5])
+        leg_range = max(stats[names.index('left_leg')].features()[5], stats[names.index('right_leg')].features()[5])
+        torso_range = stats[names.index('torso')].features()[5]
+        arms_moving = arm_range > MOVING_RANGE
+        legs_moving = leg_range > MOVING_RANGE
+        low, high = min(self._inclination), max(self._inclination)
+
+        # Standing up and getting down to the floor within one window
+        if legs_moving and high - low > BURPEE_SWING and high > LYING_TORSO_ANGLE:
+            return None, ["BURPEE"]
+
+        if lying:
+            if arms_moving and not legs_moving:
+                return "PUSH_UP", ["PUSH_UP"]
+            if torso_range > MOVING_RANGE and not arms_moving:
+                return "CRUNCH", ["CRUNCH"]
+            if not arms_moving and not legs_moving:
+                return "PLANK", ["PLANK"]
+            return None, ["PUSH_UP", "BURPEE"]
+
+        if not arms_moving and not legs_moving:
+            return NONE_LABEL, []
+
+        if legs_moving and not arms_moving:
+            asym = window.feature_vector()[window.feature_names().index('left_leg_right_leg_asymmetry')]
+            if asym > MOVING_RANGE:
+                return "LUNGE", ["LUNGE"]
+            leg_min = min(stats[names.index('left_leg')].features()[3], stats[names.index('right_leg')].features()[3])
+            if high - low > HINGE_SWING and leg_min > DEADLIFT_MIN_KNEE:
+                return None, ["DEADLIFT", "SQUAT"]
+            return "SQUAT", ["SQUAT"]
+
+        if arms_moving and not legs_moving:
+            wrist_y = min(_joint_xy(pose_features, 'LEFT_WRIST')[1], _joint_xy(pose_features, 'RIGHT_WRIST')[1])
+            arm_min = min(stats[names.index('left_arm')].features()[3], stats[names.index('right_arm')].features()[3])
+            if wrist_y < mid_shoulder[1] - 0.05 and arm_min < 120:
+                return "SHOULDER_PRESS", ["SHOULDER_PRESS"]
+            if arm_min > 130:
+                return "LATERAL_RAISE", ["LATERAL_RAISE"]
+            if arm_min < 70:
+                return "BICEP_CURL", ["BICEP_CURL"]
+            return None, ["BICEP_CURL", "LATERAL_RAISE", "SHOULDER_PRESS"]
+
+        # Whole body moving: deadlift / burpee / squat with arm swing
+        return None, ["DEADLIFT", "BURPEE", "SQUAT"]
+
+    def _classify(self, window, candidates):
+        """Stage 2: window classifier restricted to the rule candidates"""
+        classifier = self.active_classifier
+        if classifier is None or not window.ready:
+            return None, 0.0
+        proba = classifier.predict_proba(window.feature_vector().reshape(1, -1))[0]
+        classes = [str(c) for c in classifier.classes_]
+        best, best_p = None, 0.0
+        for label, p in zip(classes, proba):
+            if (not candidates or label in candidates) and p > best_p:
+                best, best_p = label, float(p)
+        if best_p < self.min_confidence:
+            return None, best_p
+        return best, best_p
+
+    def _fallback(self, window, candidates):
+        """Stage 3: geometric tie-breaks for the labels only stage 2 separates"""
+        low, high = min(self._inclination), max(self._inclination)
+        if "BURPEE" in candidates and high - low > BURPEE_SWING and high > LYING_TORSO_ANGLE:
+            return "BURPEE"
+        if "DEADLIFT" in candidates and high - low > HINGE_SWING and high <= LYING_TORSO_ANGLE:
+            stats, names = window.stats, window.angle_names
+            leg_min = min(stats[names.index('left_leg')].features()[3], stats[names.index('right_leg')].features()[3])
+            if leg_min > DEADLIFT_MIN_KNEE:
+                return "DEADLIFT"
+        return None
+
+    def _track_inclination(self, pose_features, window):
+        if self._inclination is None:
+            self._inclination = deque(maxlen=window.window)
+        mid_shoulder = (_joint_xy(pose_features, 'LEFT_SHOULDER') + _joint_xy(pose_features, 'RIGHT_SHOULDER')) / 2
+        mid_hip = (_joint_xy(pose_features, 'LEFT_HIP') + _joint_xy(pose_features, 'RIGHT_HIP')) / 2
+        torso = mid_shoulder - mid_hip
+        self._inclination.append(float(np.degrees(np.arctan2(abs(torso[0]), abs(torso[1]) + 1e-6))))
+
+    def update(self, pose_features, window):
+        """Feed one frame; returns the debounced exercise key"""
+        if pose_features is None:
+            return self.current
+
+        self._track_inclination(pose_features, window)
+        label, candidates = self._rules(pose_features, window)
+        confidence = 1.0
+        if label is None:
+            self.stage_counts["classifier"] += 1
+            label, confidence = self._classify(window, candidates)
+            if label is None:
+                label = self._fallback(window, candidates)
+                if label is not None:
+                    self.stage_counts["fallback"] += 1
+                    confidence = 0.5
+        elif label == NONE_LABEL:
+            self.stage_counts["idle"] += 1
+        else:
+            self.stage_counts["rules"] += 1
+
+        # Idle or unresolved frames keep the current label (rest between reps)
+        if label is None or label == NONE_LABEL:
+            self._candidate, self._candidate_frames = None, 0
+            return self.current
+
+        # Hysteresis: a new label must persist before it takes over
+        if label == self.current:
+            self._candidate, self._candidate_frames = None, 0
+            self.confidence = confidence
+        elif label == self._candidate:
+            self._candidate_frames += 1
+            if self._candidate_frames >= self.switch_frames:
+                self.current, self.confidence = label, confidence
+                self._candidate, self._candidate_frames = None, 0
+        else:
+            self._candidate, self._candidate_frames = label, 1
+        return self.current
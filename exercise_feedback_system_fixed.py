@@ -3,9 +3,12 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import math
-import csv
+import os
+import sys
 import time
-from sklearn.ensemble import RandomForestClassifier
+import subprocess
+from data_logger import BatchedDataLogger
+from perf_profile import select_profile, pose_options
 
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
@@ -37,12 +40,12 @@ distances = []
 data = []
 
 file_path = "exercise_data.csv"
-with open(file_path, mode='w', newline='') as file:
-    writer = csv.writer(file)
-    writer.writerow(["left_elbow_angle", "left_shoulder_angle", "right_elbow_angle", "right_shoulder_angle",
-                     "left_wrist_shoulder_dist", "right_wrist_shoulder_dist", "class"])
+data_logger = BatchedDataLogger(file_path, ["left_elbow_angle", "left_shoulder_angle", "right_elbow_angle",
+                                            "right_shoulder_angle", "left_wrist_shoulder_dist",
+                                            "right_wrist_shoulder_dist", "class"])
 
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+# Pose settings of REPBOT_PROFILE (see perf_profile.py)
+with mp_pose.Pose(**pose_options(select_profile(calibrate_if_auto=False))) as pose:
     start_time = time.time()
     while cap.isOpened():
         ret, frame = cap.read()
@@ -104,11 +107,9 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
                 feedback = "Fix Form"
                 feedback_color = (0, 0, 255)
 
-            with open(file_path, mode='a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([left_elbow_angle, left_shoulder_angle, right_elbow_angle,
-                                 right_shoulder_angle, left_wrist_shoulder_dist,
-                                 right_wrist_shoulder_dist, feedback])
+            data_logger.log([left_elbow_angle, left_shoulder_angle, right_elbow_angle,
+                             right_shoulder_angle, left_wrist_shoulder_dist,
+                             right_wrist_shoulder_dist, feedback])
 
         except Exception as e:
             print("Pose landmarks not detected:", e)
@@ -128,12 +129,10 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
 
     cap.release()
     cv2.destroyAllWindows()
+    data_logger.close()
 
+    # Report how well these features separate good reps (nothing is saved)
     if angles and distances:
-        angles = np.array(angles)
-        distances = np.array(distances)
-        features = np.hstack((angles, distances))
-        labels = np.array([1 if f == "Good Rep" else 0 for f in feedback])
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        model.fit(features, labels)
-        print("Model trained on collected data.")
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'train_model.py'),
+                        '--data', file_path, '--label', 'class', '--positive-label', 'Good Rep',
+                        '--no-save'], check=False)
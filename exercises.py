@@ -0,0 +1,32 @@
+"""
+Exercises
+The exercise catalogue shared by the development server, the serve.py
+capture worker and its HTTP workers. Dependency-free, so the HTTP workers
+can validate exercise names without importing app.py.
+"""
+
+AUTO_MODE = "auto"
+
+EXERCISES = {
+    "BICEP_CURL": {"name": "Bicep Curl"},
+    "SQUAT": {"name": "Squat"},
+    "PUSH_UP": {"name": "Push Up"},
+    "LUNGE": {"name": "Lunge"},
+    "PLANK": {"name": "Plank"},
+    "DEADLIFT": {"name": "Deadlift"},
+    "SHOULDER_PRESS": {"name": "Shoulder Press"},
+    "LATERAL_RAISE": {"name": "Lateral Raise"},
+    "CRUNCH": {"name": "Crunch"},
+    "BURPEE": {"name": "Burpee"}
+}
+
+# Short names accepted by /api/set_exercise besides the EXERCISES keys
+EXERCISE_ALIASES = {"bicep": "BICEP_CURL", "squat": "SQUAT", "lateral": "LATERAL_RAISE", "none": "None"}
+
+
+def normalize_exercise(exercise):
+    """Map aliases and lower-case keys onto EXERCISES keys"""
+    exercise = EXERCISE_ALIASES.get(str(exercise).lower(), exercise)
+    if exercise != AUTO_MODE and str(exercise).upper() in EXERCISES:
+        exercise = str(exercise).upper()
+    return exercise
@@ -0,0 +1,90 @@
+"""
+Feedback Events
+Debounced feedback for an analysis session. The per-frame verdict only
+becomes the displayed message after it has persisted for ``debounce_frames``
+consecutive frames, and every change (plus rep and exercise changes) is
+recorded as a numbered event, so clients fetch updates when something
+happens instead of re-reading a string that flickers every frame.
+"""
+import time
+import threading
+from collections import deque
+
+# Feedback for incorrect form when no specific rule was violated (the model
+# flagged the rep); precomputed once instead of per call
+FEEDBACK_TIPS = {
+    "BICEP_CURL": "Keep your elbow close to your body",
+    "SQUAT": "Keep your back straight",
+    "PUSH_UP": "Keep your body in a straight line",
+}
+DEFAULT_TIP = "Focus on proper form and control"
+CORRECT_FEEDBACK = "Correct Form - Keep it up!"
+DEBOUNCE_FRAMES = 8
+EVENT_HISTORY = 256
+
+
+class FeedbackEngine:
+    """Hysteresis on feedback messages plus a bounded, numbered event log"""
+
+    def __init__(self, debounce_frames=DEBOUNCE_FRAMES, history=EVENT_HISTORY, message="Ready"):
+        self.debounce_frames = debounce_frames
+        self.message = message
+        self.form_correct = True
+        self.seq = 0
+        self._candidate = None
+        self._candidate_frames = 0
+        self._events = deque(maxlen=history)
+        self._cond = threading.Condition()
+        # Called with every event, outside the lock (e.g. SessionStore)
+        self.listeners = []
+
+    def update(self, message, form_correct, timestamp=None, **data):
+        """Feed one frame's verdict; returns the event if the message changed"""
+        key = (message, bool(form_correct))
+        if key == (self.message, self.form_correct):
+            self._candidate, self._candidate_frames = None, 0
+            return None
+        if key == self._candidate:
+            self._candidate_frames += 1
+        else:
+            self._candidate, self._candidate_frames = key, 1
+        if self._candidate_frames < self.debounce_frames:
+            return None
+
+        self.message, self.form_correct = key
+        self._candidate, self._candidate_frames = None, 0
+        return self.emit("feedback", timestamp, message=message, form_correct=bool(form_correct), **data)
+
+    def force(self, message, form_correct=True, timestamp=None, **data):
+        """Show ``message`` immediately (state changes such as a reset)"""
+        self._candidate, self._candidate_frames = None, 0
+        if (message, form_correct) == (self.message, self.form_correct):
+            return None
+        self.message, self.form_correct = message, form_correct
+        return self.emit("feedback", timestamp, message=message, form_correct=form_correct, **data)
+
+    def emit(self, kind, timestamp=None, **data):
+        with self._cond:
+            self.seq += 1
+            # "time" is wall clock; "timestamp" the analysed frame's own clock
+            event = dict(data, seq=self.seq, type=kind, time=time.time())
+            if timestamp is not None:
+                event["timestamp"] = timestamp
+            self._events.append(event)
+            self._cond.notify_all()
+        for listener in self.listeners:
+            listener(event)
+        return event
+
+    # ------------------------------------------------------------------
+    # CONSUMERS
+    # ------------------------------------------------------------------
+    def events_since(self, seq):
+        with self._cond:
+            return [e for e in self._events if e["seq"] > seq]
+
+    def wait(self, seq, timeout=25.0):
+        """Long-poll: events after ``seq``, waiting up to ``timeout`` for one"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq, timeout=timeout)
+            return [e for e in self._events if e["seq"] > seq]
@@ -0,0 +1,179 @@
+"""
+Form Rules
+Exercise form checks declared as data and compiled into threshold arrays.
+
+RULE_ANGLES names joint-angle triplets; FORM_RULES lists, per exercise, the
+allowed (exclusive) range of an angle with a message and severity. At load
+time every rule becomes one column of ``low`` / ``high`` arrays, so a single
+NumPy comparison evaluates all rules of all exercises for one frame or a
+whole batch. Adding an exercise means adding entries here.
+"""
+import numpy as np
+
+# Angle name -> (a, b, c) joint names; the angle is measured at b in 2D
+RULE_ANGLES = {
+    "left_elbow": ("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"),
+    "right_elbow": ("RIGHT_SHOULDER", "RIGHT_ELBOW", "RIGHT_WRIST"),
+    "left_knee": ("LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"),
+    "right_knee": ("RIGHT_HIP", "RIGHT_KNEE", "RIGHT_ANKLE"),
+    "left_hip": ("LEFT_SHOULDER", "LEFT_HIP", "LEFT_KNEE"),
+    "body_line": ("LEFT_SHOULDER", "LEFT_HIP", "LEFT_ANKLE"),
+    "lateral_raise": ("LEFT_SHOULDER", "LEFT_ELBOW", "RIGHT_SHOULDER"),
+}
+
+# Severity 3 = wrong movement, 2 = unsafe or incomplete rep, 1 = refinement
+SEVERITY_CONFIDENCE = {1: 65.0, 2: 45.0, 3: 40.0}
+CORRECT_CONFIDENCE = 85.0
+CORRECT_MESSAGE = "Correct Form"
+
+# Exercise -> rules; ranges are exclusive, None means unbounded
+FORM_RULES = {
+    "BICEP_CURL": [
+        {"angle": "left_elbow", "min": 30, "max": 160, "severity": 3,
+         "message": "Keep elbow stable, maintain proper range of motion"},
+    ],
+    "SQUAT": [
+        {"angle": "left_knee", "min": 90, "max": 160, "severity": 2,
+         "message": "Go deeper, thighs should be parallel to ground"},
+        {"angle": "left_hip", "min": 45, "max": None, "severity": 1,
+         "message": "Keep your chest up"},
+    ],
+    "PUSH_UP": [
+        {"angle": "body_line", "min": 155, "max": None, "severity": 2,
+         "message": "Keep your body in a straight line"},
+    ],
+    "LUNGE": [
+        {"angle": "left_knee", "min": 70, "max": None, "severity": 2,
+         "message": "Front knee too far forward, keep it above the ankle"},
+        {"angle": "left_hip", "min": 60, "max": None, "severity": 1,
+         "message": "Keep your torso upright"},
+    ],
+    "PLANK": [
+        {"angle": "body_line", "min": 160, "max": None, "severity": 2,
+         "message": "Keep hips in line with shoulders and ankles"},
+    ],
+    "DEADLIFT": [
+        {"angle": "left_hip", "min": 45, "max": None, "severity": 2,
+         "message": "Keep your back flat, hinge at the hips"},
+        {"angle": "left_knee", "min": 100, "max": None, "severity": 1,
+         "message": "Don't squat the weight, keep a soft knee bend"},
+    ],
+    "SHOULDER_PRESS": [
+        {"angle": "left_hip", "min": 150, "max": None, "severity": 2,
+         "message": "Don't lean back, brace your core"},
+    ],
+    "LATERAL_RAISE": [
+        {"angle": "lateral_raise", "min": None, "max": 90, "severity": 2,
+         "message": "Don't raise above shoulder height"},
+        {"angle": "left_elbow", "min": 120, "max": None, "severity": 1,
+         "message": "Keep your arms nearly straight"},
+    ],
+    "CRUNCH": [
+        {"angle": "left_knee", "min": 45, "max": 135, "severity": 1,
+         "message": "Keep your knees bent at about 90 degrees"},
+    ],
+    # Burpee phases span the full range of every joint; no static rule applies
+    "BURPEE": [],
+}
+
+
+def batch_joint_angles(points, triplets):
+    """2D angles (degrees) at joint b for N x J x 2 points, one column per triplet"""
+    idx = np.asarray(triplets).reshape(-1, 3)
+    a, b, c = points[:, idx[:, 0]], points[:, idx[:, 1]], points[:, idx[:, 2]]
+    ba, bc = a - b, c - b
+    cosine = np.einsum('ntk,ntk->nt', ba, bc) / (
+        np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1) + 1e-6)
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+class FormRuleSet:
+    """FORM_RULES compiled into arrays
+
+    Columns are rules; ``members`` is an exercises x rules mask picking the
+    rules that apply to each exercise.
+    """
+
+    def __init__(self, rules=FORM_RULES, angles=RULE_ANGLES, joint_names=None):
+        self.exercises = list(rules)
+        self.angle_names = list(angles)
+        self._exercise_idx = {name: i for i, name in enumerate(self.exercises)}
+        self._angle_idx = {name: i for i, name in enumerate(self.angle_names)}
+
+        flat = [(e, rule) for e, exercise_rules in rules.items() for rule in exercise_rules]
+        self.rule_angle = np.array([self._angle_idx[r["angle"]] for _, r in flat], dtype=np.intp)
+        self.low = np.array([-np.inf if r["min"] is None else r["min"] for _, r in flat], dtype=np.float64)
+        self.high = np.array([np.inf if r["max"] is None else r["max"] for _, r in flat], dtype=np.float64)
+        self.severity = np.array([r["severity"] for _, r in flat], dtype=np.int8)
+        self.confidence = np.array([SEVERITY_CONFIDENCE[r["severity"]] for _, r in flat])
+        self.messages = [r["message"] for _, r in flat]
+        self.members = np.zeros((len(self.exercises) + 1, len(flat)), dtype=bool)
+        for col, (e, _) in enumerate(flat):
+            self.members[self._exercise_idx[e], col] = True
+        # Rank used to pick the reported violation: severity first, then
+        # declaration order
+        self._rank = self.severity.astype(np.int64) * len(flat) - np.arange(len(flat))
+
+        self.joint_names = list(joint_names) if joint_names is not None else None
+        self.triplets = None
+        if self.joint_names is not None:
+            joint_idx = {name: i for i, name in enumerate(self.joint_names)}
+            self.triplets = np.array([[joint_idx[j] for j in angles[a]] for a in self.angle_names])
+
+    def exercise_index(self, exercise):
+        """Row of ``members``; unknown exercises map to an empty rule row"""
+        return self._exercise_idx.get(exercise, len(self.exercises))
+
+    # ------------------------------------------------------------------
+    # EVALUATION
+    # ------------------------------------------------------------------
+    def angles_from_points(self, points):
+        """N x A rule angles from N x J x 2 joint coordinates (joint_names order)"""
+        return batch_joint_angles(np.asarray(points, dtype=np.float64), self.triplets)
+
+    def violations(self, angles):
+        """N x R bool: the one comparison that checks every rule"""
+        values = np.asarray(angles, dtype=np.float64)[:, self.rule_angle]
+        return (values <= self.low) | (values >= self.high)
+
+    def evaluate_batch(self, angles, exercises):
+        """Per-frame (form_correct, confidence, rule index or -1)
+
+        ``exercises`` is one exercise key or one key per frame.
+        """
+        angles = np.atleast_2d(angles)
+        n = len(angles)
+        if isinstance(exercises, str):
+            rows = np.full(n, self.exercise_index(exercises))
+        else:
+            rows = np.array([self.exercise_index(e) for e in exercises], dtype=np.intp)
+        failed = self.violations(angles) & self.members[rows]
+        correct = ~failed.any(axis=1)
+        if not self.messages:
+            return correct, np.full(n, CORRECT_CONFIDENCE), np.full(n, -1)
+        worst = np.where(failed, self._rank, np.iinfo(np.int64).min).argmax(axis=1)
+        worst = np.where(correct, -1, worst)
+        confidence = np.where(correct, CORRECT_CONFIDENCE, self.confidence[np.maximum(worst, 0)])
+        return correct, confidence, worst
+
+    def evaluate(self, angles, exercise):
+        """Single frame: {'form_correct', 'confidence', 'feedback', 'score'}"""
+        correct, confidence, worst = self.evaluate_batch(np.asarray(angles)[None], exercise)
+        message = CORRECT_MESSAGE if correct[0] else self.messages[worst[0]]
+        return {
+            'form_correct': bool(correct[0]),
+            'confidence': float(confidence[0]),
+            'feedback': message,
+            'score': float(confidence[0]) / 100.0
+        }
+
+    def check_angles(self, exercise_angles):
+        """True if no rule is violated; ``exercise_angles`` maps an exercise to
+        {angle name: degrees}. Each exercise's rules only see its own angles,
+        and rules whose angle is not given never fail."""
+        angles = np.full((len(exercise_angles), len(self.angle_names)), np.nan)
+        for row, values in enumerate(exercise_angles.values()):
+            for name, value in values.items():
+                angles[row, self._angle_idx[name]] = value
+        rows = [self.exercise_index(e) for e in exercise_angles]
+        return not (self.violations(angles) & self.members[rows]).any()
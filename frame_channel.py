@@ -0,0 +1,194 @@
+"""
+Frame Channel
+Shared-memory ring buffer carrying encoded frames, landmark arrays and stats
+snapshots from the capture/inference process to the HTTP worker processes.
+
+Layout (one SharedMemory block):
+    [ring header][slot 0][slot 1]...[slot N-1]
+    slot = [slot header][frame bytes][landmarks float32 33x4][stats json]
+
+Each slot has its own sequence counter (seqlock): the writer makes it odd,
+writes the slot, then makes it even. Readers take zero-copy memoryviews of
+the latest slot and call ``SlotView.valid()`` after using them; a changed or
+odd sequence means the writer lapped the ring and the data may be torn.
+With N slots the writer only comes back to a slot after N-1 further frames,
+so readers have several frame periods to consume a view.
+
+The ring header also carries the readers' viewer counts per stream (VIEWER
+KINDS), so the writer can skip rendering what nobody watches. Readers update
+them under a lock shared between the reader processes; the writer only
+reads them.
+"""
+import json
+import struct
+import time
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+import numpy as np
+
+# published count (uint64), slot count (uint32), landmark rows (uint32),
+# then one int64 viewer count per VIEWER_KINDS entry
+VIEWER_KINDS = ("frames", "pose")
+RING_HEADER = struct.Struct("<QII")
+VIEWER_COUNTS = struct.Struct("<" + "q" * len(VIEWER_KINDS))
+# seq (uint64), timestamp (float64), frame length, stats length, has landmarks
+SLOT_HEADER = struct.Struct("<QdIII4x")
+N_SLOTS = 4
+MAX_FRAME_BYTES = 2 * 1024 * 1024
+MAX_STATS_BYTES = 64 * 1024
+N_LANDMARKS = 33
+LANDMARK_DIMS = 4  # x, y, z, visibility
+
+
+class SlotView:
+    """Zero-copy view of one ring slot
+
+    ``frame`` and ``stats_bytes`` are memoryviews and ``landmarks`` is a numpy
+    view into shared memory; copy them (or check ``valid()`` after use) before
+    relying on them.
+    """
+    __slots__ = ("index", "seq", "timestamp", "frame", "landmarks", "stats_bytes", "_channel", "_slot")
+
+    def __init__(self, channel, slot, index, seq, timestamp, frame, landmarks, stats_bytes):
+        self._channel = channel
+        self._slot = slot
+        self.index = index
+        self.seq = seq
+        self.timestamp = timestamp
+        self.frame = frame
+        self.landmarks = landmarks
+        self.stats_bytes = stats_bytes
+
+    def valid(self):
+        """True while the writer has not started overwriting this slot"""
+        return self._channel._slot_seq(self._slot) == self.seq
+
+    def stats(self):
+        return json.loads(bytes(self.stats_bytes)) if len(self.stats_bytes) else {}
+
+    def release(self):
+        self.frame.release()
+        self.stats_bytes.release()
+        self.landmarks = None
+
+
+class FrameChannel:
+    """Single-writer, many-reader ring of the most recent frames"""
+
+    def __init__(self, name=None, create=False, n_slots=N_SLOTS, max_frame_bytes=MAX_FRAME_BYTES,
+                 max_stats_bytes=MAX_STATS_BYTES, n_landmarks=N_LANDMARKS, viewer_lock=None):
+        self._viewer_lock = viewer_lock if viewer_lock is not None else nullcontext()
+        self.max_frame_bytes = max_frame_bytes
+        self.max_stats_bytes = max_stats_bytes
+        self._landmark_shape = (n_landmarks, LANDMARK_DIMS)
+        self._landmark_bytes = n_landmarks * LANDMARK_DIMS * 4
+        self._frame_off = SLOT_HEADER.size
+        self._landmark_off = self._frame_off + max_frame_bytes
+        self._stats_off = self._landmark_off + self._landmark_bytes
+        # Keep slots 8-byte aligned so the float32 views stay aligned
+        self.slot_size = (self._stats_off + max_stats_bytes + 7) // 8 * 8
+
+        size = RING_HEADER.size + VIEWER_COUNTS.size + n_slots * self.slot_size
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self._owner = create
+        if create:
+            self.shm.buf[:size] = bytes(size)
+            RING_HEADER.pack_into(self.shm.buf, 0, 0, n_slots, n_landmarks)
+        self.n_slots = RING_HEADER.unpack_from(self.shm.buf, 0)[1]
+
+    def _slot_base(self, slot):
+        return RING_HEADER.size + VIEWER_COUNTS.size + slot * self.slot_size
+
+    def _slot_seq(self, slot):
+        return SLOT_HEADER.unpack_from(self.shm.buf, self._slot_base(slot))[0]
+
+    # ------------------------------------------------------------------
+    # WRITER
+    # ------------------------------------------------------------------
+    def publish(self, frame_bytes, stats, landmarks=None, timestamp=None):
+        """Write the next slot; ``frame_bytes`` may be any bytes-like object"""
+        frame = memoryview(frame_bytes).cast("B")
+        stats_bytes = json.dumps(stats).encode()
+        if frame.nbytes > self.max_frame_bytes or len(stats_bytes) > self.max_stats_bytes:
+            return False
+        buf = self.shm.buf
+        count = RING_HEADER.unpack_from(buf, 0)[0]
+        slot = count % self.n_slots
+        base = self._slot_base(slot)
+        seq = SLOT_HEADER.unpack_from(buf, base)[0]
+        timestamp = time.time() if timestamp is None else timestamp
+
+        struct.pack_into("<Q", buf, base, seq + 1)
+        buf[base + self._frame_off:base + self._frame_off + frame.nbytes] = frame
+        if landmarks is not None:
+            lm = np.ndarray(self._landmark_shape, dtype=np.float32, buffer=buf,
+                            offset=base + self._landmark_off)
+            lm[:] = landmarks
+            del lm
+        buf[base + self._stats_off:base + self._stats_off + len(stats_bytes)] = stats_bytes
+        SLOT_HEADER.pack_into(buf, base, seq + 2, timestamp, frame.nbytes, len(stats_bytes),
+                              int(landmarks is not None))
+        struct.pack_into("<Q", buf, 0, count + 1)
+        return True
+
+    def viewers(self):
+        """{kind: viewer count} over every reader process"""
+        return dict(zip(VIEWER_KINDS, VIEWER_COUNTS.unpack_from(self.shm.buf, RING_HEADER.size)))
+
+    # ------------------------------------------------------------------
+    # READERS
+    # ------------------------------------------------------------------
+    def add_viewer(self, kind, delta=1):
+        """Count a viewer of stream ``kind`` in (or, with -1, out)"""
+        offset = RING_HEADER.size + 8 * VIEWER_KINDS.index(kind)
+        with self._viewer_lock:
+            count = struct.unpack_from("<q", self.shm.buf, offset)[0]
+            struct.pack_into("<q", self.shm.buf, offset, max(count + delta, 0))
+
+    def sequence(self):
+        """Number of frames published so far (changes on every publish)"""
+        return RING_HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    def latest(self, retries=100):
+        """SlotView of the newest complete slot, or None if nothing published"""
+        buf = self.shm.buf
+        for _ in range(retries):
+            count = RING_HEADER.unpack_from(buf, 0)[0]
+            if count == 0:
+                return None
+            slot = (count - 1) % self.n_slots
+            base = self._slot_base(slot)
+            seq, timestamp, frame_len, stats_len, has_lm = SLOT_HEADER.unpack_from(buf, base)
+            if seq % 2:
+                time.sleep(0)
+                continue
+            frame = buf[base + self._frame_off:base + self._frame_off + frame_len]
+            stats = buf[base + self._stats_off:base + self._stats_off + stats_len]
+            landmarks = None
+            if has_lm:
+                landmarks = np.ndarray(self._landmark_shape, dtype=np.float32, buffer=buf,
+                                       offset=base + self._landmark_off)
+            view = SlotView(self, slot, count, seq, timestamp, frame, landmarks, stats)
+            if view.valid():
+                return view
+            view.release()
+        return None
+
+    def read(self, retries=100):
+        """(frame index, frame bytes, stats dict) copied out of the latest slot"""
+        for _ in range(retries):
+            view = self.latest()
+            if view is None:
+                return None, b"", {}
+            index, frame, stats = view.index, bytes(view.frame), bytes(view.stats_bytes)
+            valid = view.valid()
+            view.release()
+            if valid:
+                return index, frame, json.loads(stats) if stats else {}
+        return None, b"", {}
+
+    def close(self):
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
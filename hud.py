@@ -0,0 +1,124 @@
+"""
+HUD Compositor
+Feedback/rep overlay for the desktop feedback scripts. Boxes, headers and
+labels are rendered once per frame size into a layer plus mask; per frame,
+only fields whose text changed are re-rasterised (inside their own cell,
+together with any field overlapping it) and the layer is blended onto the
+dimmed camera frame in one pass.
+"""
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+WHITE = (255, 255, 255)
+ROW_COLOR = (30, 30, 30)
+HEADER_COLOR = (50, 50, 50)
+# Darkening applied to the camera frame under the HUD (0 = none, 1 = black)
+DIM_ALPHA = 0.4
+
+
+class HudCompositor:
+    """Cached overlay: ``draw()`` costs one dim + one masked copy per frame"""
+
+    def __init__(self, exercises=("Bicep Curl", "Squat", "Lateral Raise"), dim_alpha=DIM_ALPHA):
+        self.exercises = list(exercises)
+        self.dim_alpha = dim_alpha
+        self._shape = None
+        self._values = {}
+
+    # ------------------------------------------------------------------
+    # LAYOUT (once per frame size)
+    # ------------------------------------------------------------------
+    def _build(self, shape):
+        h, w = shape[:2]
+        self._shape = shape
+        self._values = {}
+        self.layer = np.zeros((h, w, 3), dtype=np.uint8)
+        self.mask = np.zeros((h, w), dtype=np.uint8)
+        # field -> (x0, y0, x1, y1, text origin, scale, thickness, background or None)
+        self.fields = {}
+
+        self._box((0, 0), (w, 50), (0, 0, 0))
+        self.fields["exercise"] = (0, 0, w, 50, (20, 30), 1.0, 2, (0, 0, 0))
+        self.fields["feedback"] = (50, 380, w - 50, 430, (60, 415), 1.0, 3, None)
+        self.fields["confidence"] = (w - 250, 25, w, 60, (w - 250, 50), 0.8, 2, None)
+
+        start_x = 50
+        self._box((start_x, 450), (w - 50, 500), HEADER_COLOR)
+        for label, dx in (("Exercise", 20), ("Reps", 200), ("Stage", 350), ("Accuracy", 500)):
+            self._text(label, (start_x + dx, 485), 0.7, WHITE, 2)
+
+        start_y = 510
+        for i, name in enumerate(self.exercises):
+            self._box((start_x, start_y), (w - 50, start_y + 40), ROW_COLOR)
+            self._text(name, (start_x + 20, start_y + 30), 0.7, WHITE, 2)
+            for field, x0, x1 in (("reps", 210, 360), ("stage", 360, 530), ("acc", 530, w - 50 - start_x)):
+                self.fields[f"{field}{i}"] = (start_x + x0, start_y, start_x + x1, start_y + 40,
+                                              (start_x + x0 + 10, start_y + 30), 0.7, 2, ROW_COLOR)
+            start_y += 50
+
+        self._static_layer = self.layer.copy()
+        self._static_mask = self.mask.copy()
+
+    def _box(self, p0, p1, color):
+        cv2.rectangle(self.layer, p0, p1, color, -1)
+        cv2.rectangle(self.mask, p0, p1, 255, -1)
+
+    def _text(self, text, org, scale, color, thickness):
+        cv2.putText(self.layer, text, org, FONT, scale, color, thickness)
+        cv2.putText(self.mask, text, org, FONT, scale, 255, thickness)
+
+    # ------------------------------------------------------------------
+    # DYNAMIC FIELDS
+    # ------------------------------------------------------------------
+    def _set(self, field, text, color=WHITE, background=None):
+        key = (text, color, background)
+        if self._values.get(field) == key:
+            return
+        self._values[field] = key
+        x0, y0, x1, y1 = self.fields[field][:4]
+        h, w = self.mask.shape
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, w), min(y1, h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        cell = (slice(y0, y1), slice(x0, x1))
+        # Restore the cell, then repaint every field that overlaps it (in
+        # layout order), clipped to the cell: neighbours outside stay
+        # untouched and overlapping ones are not erased
+        layer_cell, mask_cell = self._static_layer[cell].copy(), self._static_mask[cell].copy()
+        for name, (fx0, fy0, fx1, fy1, org, scale, thickness, default_bg) in self.fields.items():
+            value = self._values.get(name)
+            if value is None or fx0 >= x1 or fx1 <= x0 or fy0 >= y1 or fy1 <= y0:
+                continue
+            text, color, background = value
+            background = background or default_bg
+            if background is not None:
+                cv2.rectangle(layer_cell, (fx0 - x0, fy0 - y0), (fx1 - x0, fy1 - y0), background, -1)
+                cv2.rectangle(mask_cell, (fx0 - x0, fy0 - y0), (fx1 - x0, fy1 - y0), 255, -1)
+            local = (org[0] - x0, org[1] - y0)
+            cv2.putText(layer_cell, text, local, FONT, scale, color, thickness)
+            cv2.putText(mask_cell, text, local, FONT, scale, 255, thickness)
+        self.layer[cell], self.mask[cell] = layer_cell, mask_cell
+
+    # ------------------------------------------------------------------
+    # COMPOSITE
+    # ------------------------------------------------------------------
+    def draw(self, image, exercise, feedback, feedback_color, accuracy, rows):
+        """Overlay the HUD on ``image`` in place
+
+        ``rows`` holds one (reps, stage) pair per exercise, in order.
+        """
+        if image.shape != self._shape:
+            self._build(image.shape)
+
+        self._set("exercise", f"Exercise: {exercise}")
+        self._set("feedback", f"Form Feedback: {feedback}", background=tuple(feedback_color))
+        self._set("confidence", f"Confidence: {accuracy:.2f}%", color=(0, 255, 255))
+        for i, (reps, stage) in enumerate(rows):
+            self._set(f"reps{i}", str(reps))
+            self._set(f"stage{i}", stage if stage else "N/A")
+            self._set(f"acc{i}", f"{accuracy:.2f}%")
+
+        cv2.convertScaleAbs(image, dst=image, alpha=1.0 - self.dim_alpha)
+        cv2.copyTo(self.layer, self.mask, image)
+        return image
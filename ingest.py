@@ -0,0 +1,324 @@
+"""
+Frame Ingestion
+Client-pushed JPEG frames for remote athletes. Each ingest session owns a
+MediaPipe Pose graph and an AnalysisSession; a shared pool of decode workers
+turns JPEG bytes into RGB frames held in reused per-session buffers.
+
+Back-pressure: a session accepts at most ``max_pending`` frames that are
+still being decoded or analysed. Anything beyond that is dropped on arrival,
+so a slow client or an overloaded server sees a lower processed frame rate
+instead of a growing queue and growing latency.
+
+Frames of one session can decode in parallel and finish out of order. Each
+frame carries its arrival sequence number, and the inference thread drops
+any frame older than the last one it analysed, so rep segmentation and the
+window features never see time go backwards.
+"""
+import time
+import uuid
+import struct
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from analysis_session import AnalysisSession, AUTO_MODE
+from perf_profile import DEFAULT_POSE_OPTIONS
+
+mp_pose = mp.solutions.pose
+
+# Streamed upload framing: frame length (uint32) + client capture time
+# (float64 seconds, 0 = use arrival time), followed by the JPEG bytes
+FRAME_HEADER = struct.Struct("<Id")
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+# Latency samples kept per session for the percentiles
+LATENCY_WINDOW = 300
+# Sessions with no frames for this long are closed; checked when sessions
+# are created and every IDLE_CHECK_INTERVAL_S
+IDLE_TIMEOUT_S = 120.0
+IDLE_CHECK_INTERVAL_S = 10.0
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.asarray(samples), [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+
+class IngestSession:
+    """One remote client: decode -> pose -> analysis with bounded in-flight frames"""
+
+    def __init__(self, session_id, exercises, model_registry, decode_pool, max_pending=2,
+                 pose_options=DEFAULT_POSE_OPTIONS, resources=None, overload=None):
+        self.id = session_id
+        # Optional OverloadController fed with this session's frame latency
+        self.overload = overload
+        self.analysis = AnalysisSession(exercises, model_registry)
+        # Optional ResourceManager: the Pose graph (its calculator threads)
+        # and the inference thread run on this session's cores
+        self.resources = resources
+        self.cores = resources.acquire(f"ingest:{session_id}") if resources is not None else None
+        with resources.pinned(self.cores) if resources is not None else nullcontext():
+            self.pose = mp_pose.Pose(**pose_options)
+        self.max_pending = max_pending
+        self._decode_pool = decode_pool
+        # One inference thread per session: a Pose graph is not thread safe.
+        # Frames must reach the analysis in order; _analyze drops any frame
+        # that a later one overtook while decoding
+        self._infer = ThreadPoolExecutor(max_workers=1,
+                                         initializer=resources.pin if resources is not None else None,
+                                         initargs=(self.cores,) if resources is not None else ())
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._next_seq = 0
+        self._analyzed_seq = -1
+        self._free_buffers = deque()
+        self._closed = False
+
+        self.created = time.monotonic()
+        self.last_frame_at = self.created
+        self.received = 0
+        self.received_bytes = 0
+        self.processed = 0
+        self.dropped = 0
+        self.out_of_order = 0
+        self.decode_errors = 0
+        self.latency_ms = deque(maxlen=LATENCY_WINDOW)
+        self.decode_ms = deque(maxlen=LATENCY_WINDOW)
+        self.inference_ms = deque(maxlen=LATENCY_WINDOW)
+        self._arrivals = deque(maxlen=LATENCY_WINDOW)
+
+    # ------------------------------------------------------------------
+    # INGEST
+    # ------------------------------------------------------------------
+    def submit(self, jpeg, client_ts=None):
+        """Queue one JPEG frame; False if it was dropped for back-pressure"""
+        received = time.monotonic()
+        with self._lock:
+            self.received += 1
+            self.received_bytes += len(jpeg)
+            self.last_frame_at = received
+            self._arrivals.append(received)
+            if self._closed or self._pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending += 1
+            seq = self._next_seq
+            self._next_seq += 1
+        self._decode_pool.submit(self._decode, seq, jpeg, received, client_ts or None)
+        return True
+
+    def _take_buffer(self, shape):
+        with self._lock:
+            while self._free_buffers:
+                buf = self._free_buffers.popleft()
+                if buf.shape == shape:
+                    return buf
+        return np.empty(shape, dtype=np.uint8)
+
+    def _give_buffer(self, buf):
+        with self._lock:
+            if len(self._free_buffers) <= self.max_pending:
+                self._free_buffers.append(buf)
+
+    def _decode(self, seq, jpeg, received, client_ts):
+        start = time.perf_counter()
+        try:
+            bgr = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if bgr is None:
+                raise ValueError("not a decodable image")
+            # imdecode always allocates; the RGB frame Pose reads is written
+            # into a buffer recycled from earlier frames of this session
+            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=self._take_buffer(bgr.shape))
+        except Exception:
+            with self._lock:
+                self.decode_errors += 1
+                self._pending -= 1
+            return
+        self.decode_ms.append((time.perf_counter() - start) * 1000)
+        try:
+            self._infer.submit(self._analyze, seq, rgb, received, client_ts)
+        except RuntimeError:
+            # Session closed while this frame was decoding
+            self._give_buffer(rgb)
+            with self._lock:
+                self._pending -= 1
+
+    def _analyze(self, seq, rgb, received, client_ts):
+        try:
+            # Only the inference thread touches _analyzed_seq
+            if seq < self._analyzed_seq:
+                self.out_of_order += 1
+                return
+            self._analyzed_seq = seq
+            start = time.perf_counter()
+            rgb.flags.writeable = False
+            results = self.pose.process(rgb)
+            rgb.flags.writeable = True
+            landmarks = results.pose_landmarks.landmark if results.pose_landmarks else None
+            self.analysis.analyze(landmarks, client_ts if client_ts is not None else received)
+            self.inference_ms.append((time.perf_counter() - start) * 1000)
+            latency = (time.monotonic() - received) * 1000
+            self.latency_ms.append(latency)
+            if self.overload is not None:
+                self.overload.observe(f"ingest:{self.id}", latency)
+            self.processed += 1
+        except Exception as e:
+            print("Ingest frame error:", e)
+        finally:
+            self._give_buffer(rgb)
+            with self._lock:
+                self._pending -= 1
+
+    def ingest_stream(self, stream):
+        """Read length-prefixed frames (FRAME_HEADER + JPEG) until EOF
+
+        Works with chunked transfer encoding: frames are handed off as soon
+        as they are complete, long before the upload ends.
+        """
+        accepted = 0
+        while True:
+            header = _read_exact(stream, FRAME_HEADER.size)
+            if header is None:
+                break
+            length, client_ts = FRAME_HEADER.unpack(header)
+            if length > MAX_FRAME_BYTES:
+                raise ValueError(f"Frame of {length} bytes exceeds limit")
+            jpeg = _read_exact(stream, length)
+            if jpeg is None:
+                raise ValueError("Stream ended mid-frame")
+            accepted += self.submit(jpeg, client_ts)
+        return accepted
+
+    # ------------------------------------------------------------------
+    # OUTPUT
+    # ------------------------------------------------------------------
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            arrivals = [t for t in self._arrivals if now - t <= 5.0]
+            pending = self._pending
+        span = (arrivals[-1] - arrivals[0]) if len(arrivals) > 1 else 0.0
+        elapsed = max(now - self.created, 1e-6)
+        return {
+            "session_id": self.id,
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "out_of_order": self.out_of_order,
+            "decode_errors": self.decode_errors,
+            "pending": pending,
+            "ingest_fps": round((len(arrivals) - 1) / span, 2) if span > 0 else 0.0,
+            "ingest_kbps": round(self.received_bytes * 8 / 1000 / elapsed, 1),
+            "latency_ms": _percentiles(list(self.latency_ms)),
+            "decode_ms": _percentiles(list(self.decode_ms)),
+            "inference_ms": _percentiles(list(self.inference_ms)),
+            "analysis": self.analysis.stats(),
+        }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._infer.shutdown(wait=True)
+        self.pose.close()
+        if self.resources is not None:
+            self.resources.release(f"ingest:{self.id}")
+        if self.overload is not None:
+            self.overload.forget(f"ingest:{self.id}")
+
+
+def _read_exact(stream, n):
+    """n bytes from a file-like stream, None on clean EOF before any byte"""
+    chunks, remaining = [], n
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            if remaining == n:
+                return None
+            raise ValueError("Stream ended mid-frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+class FrameIngestor:
+    """Session registry plus the shared decode worker pool"""
+
+    def __init__(self, exercises, model_registry=None, decode_workers=4, max_pending=2,
+                 max_sessions=16, store=None, pose_options=DEFAULT_POSE_OPTIONS, resources=None,
+                 overload=None):
+        self.exercises = list(exercises)
+        # Keyword arguments for every session's Pose graph (perf_profile.pose_options)
+        self.pose_options = dict(pose_options)
+        self.resources = resources
+        self.overload = overload
+        self.model_registry = model_registry
+        # Optional SessionStore recording each session and its reps
+        self.store = store
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.decode_pool = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="decode")
+        self.sessions = {}
+        self._lock = threading.Lock()
+        # Clients that vanish without closing their session would otherwise
+        # hold their graph (and core set) until the next create_session
+        self._closed = threading.Event()
+        self._reaper = threading.Thread(target=self._reap, name="ingest-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self):
+        while not self._closed.wait(IDLE_CHECK_INTERVAL_S):
+            try:
+                self.expire_idle()
+            except Exception as e:
+                print(f"⚠ Ingest session expiry failed: {e}")
+
+    def create_session(self, exercise=AUTO_MODE, user_id="default"):
+        self.expire_idle()
+        with self._lock:
+            if len(self.sessions) >= self.max_sessions:
+                raise RuntimeError("Too many ingest sessions")
+            session_id = uuid.uuid4().hex[:12]
+            session = IngestSession(session_id, self.exercises, self.model_registry, self.decode_pool,
+                                    self.max_pending, self.pose_options, self.resources, self.overload)
+            try:
+                session.analysis.set_exercise(exercise)
+            except ValueError:
+                session.close()
+                raise
+            self.sessions[session_id] = session
+        if self.store is not None:
+            self.store.start_session(session_id, user_id, "ingest", exercise)
+            session.analysis.events.listeners.append(self.store.event_listener(session_id, user_id))
+            session.analysis.frame_listeners.append(self.store.frame_listener(session_id, user_id))
+        return session
+
+    def get(self, session_id):
+        return self.sessions.get(session_id)
+
+    def close_session(self, session_id):
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+            if self.store is not None:
+                self.store.end_session(session_id)
+        return session is not None
+
+    def expire_idle(self, timeout=IDLE_TIMEOUT_S):
+        now = time.monotonic()
+        for session_id in [sid for sid, s in list(self.sessions.items()) if now - s.last_frame_at > timeout]:
+            self.close_session(session_id)
+
+    def stats(self):
+        return {sid: s.stats() for sid, s in list(self.sessions.items())}
+
+    def close(self):
+        self._closed.set()
+        for session_id in list(self.sessions):
+            self.close_session(session_id)
+        self.decode_pool.shutdown(wait=False)
@@ -0,0 +1,170 @@
+"""
+Landmark Batch Analysis
+Form verdicts, angles and rep events for clients that run pose estimation
+on-device and upload landmarks instead of video.
+
+Request body (little-endian):
+    magic      4s   b"RBL1"
+    n_frames   u32
+    n_points   u16  (33)
+    dims       u16  (4: x, y, z, visibility)
+    timestamps f64 x n_frames
+    landmarks  f32 x n_frames x n_points x dims
+
+The whole batch goes through the vectorized feature, model / lookup-table
+and rep segmentation paths; only auto exercise detection walks frames one
+by one.
+"""
+import time
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from ml_pipeline import (ANGLE_NAMES, LEGACY_FEATURES, FORM_RULE_SET, batch_pose_features,
+                         batch_model_features, batch_rule_angles, supports_features)
+from analysis_session import REP_RULES, AUTO_MODE
+from rep_segmenter import segment_reps
+from window_features import SlidingWindowFeatureEngine
+from exercise_detector import ExerciseDetector, NONE_LABEL
+
+BATCH_HEADER = struct.Struct("<4sIHH")
+BATCH_MAGIC = b"RBL1"
+MAX_BATCH_FRAMES = 10000
+# Rep state kept per client session between batches
+MAX_SESSIONS = 10000
+
+
+def parse_batch(body):
+    """(timestamps float64 (N,), landmarks float32 (N, 33, 4)) from a request body"""
+    if len(body) < BATCH_HEADER.size:
+        raise ValueError("Batch too short")
+    magic, n_frames, n_points, dims = BATCH_HEADER.unpack_from(body, 0)
+    if magic != BATCH_MAGIC:
+        raise ValueError("Bad batch magic")
+    if n_frames > MAX_BATCH_FRAMES:
+        raise ValueError(f"Batch of {n_frames} frames exceeds {MAX_BATCH_FRAMES}")
+    if n_points != 33 or dims != 4:
+        raise ValueError("Expected 33 x 4 landmarks per frame")
+    expected = BATCH_HEADER.size + n_frames * 8 + n_frames * n_points * dims * 4
+    if len(body) != expected:
+        raise ValueError(f"Batch body is {len(body)} bytes, expected {expected}")
+    timestamps = np.frombuffer(body, dtype="<f8", count=n_frames, offset=BATCH_HEADER.size)
+    landmarks = np.frombuffer(body, dtype="<f4", offset=BATCH_HEADER.size + n_frames * 8)
+    return timestamps, landmarks.reshape(n_frames, n_points, dims)
+
+
+def encode_batch(timestamps, landmarks):
+    """Client-side helper: request body for ``parse_batch``"""
+    landmarks = np.ascontiguousarray(landmarks, dtype="<f4")
+    timestamps = np.ascontiguousarray(timestamps, dtype="<f8")
+    return (BATCH_HEADER.pack(BATCH_MAGIC, len(landmarks), landmarks.shape[1], landmarks.shape[2])
+            + timestamps.tobytes() + landmarks.tobytes())
+
+
+class _BatchSession:
+    """Rep state and detection history that carry across a client's batches"""
+
+    def __init__(self, exercises, model_registry=None):
+        self.counters = {k: 0 for k in exercises}
+        # exercise -> (timestamps, signal, form_correct) of the rep in progress
+        self.pending = {}
+        self.detector = ExerciseDetector(model_registry=model_registry)
+        self.window = SlidingWindowFeatureEngine()
+        self.last_used = time.monotonic()
+
+
+class LandmarkBatchAnalyzer:
+    """Stateless per request unless a ``session`` key is given"""
+
+    def __init__(self, exercises, model_registry=None):
+        self.exercises = list(exercises)
+        self.model_registry = model_registry
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _session(self, key):
+        if key is None:
+            return _BatchSession(self.exercises, self.model_registry)
+        with self._lock:
+            session = self._sessions.pop(key, None) or _BatchSession(self.exercises, self.model_registry)
+            self._sessions[key] = session
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        session.last_used = time.monotonic()
+        return session
+
+    def _detect(self, session, features, timestamps):
+        labels = []
+        angles = features[:, -len(ANGLE_NAMES):]
+        for row, angle_row, ts in zip(features, angles, timestamps):
+            session.window.update(angle_row, float(ts))
+            labels.append(session.detector.update(row, session.window))
+        return np.array(labels, dtype=object)
+
+    def _verdicts(self, features, exercise):
+        """(form_correct bool (N,), confidence (N,)) for one exercise"""
+        bundle = self.model_registry.current if self.model_registry is not None else None
+        table = bundle.lookup_table if bundle is not None else None
+        names = table.features if table is not None else (bundle.features if bundle is not None else LEGACY_FEATURES)
+        if bundle is not None and supports_features(names):
+            rows = batch_model_features(features, names)
+            if table is not None:
+                return table.classify_batch(rows)
+            proba = bundle.model.predict_proba(bundle.scaler.transform(rows))
+            classes = list(bundle.model.classes_)
+            positive_idx = classes.index(bundle.positive_class) if bundle.positive_class in classes else len(classes) - 1
+            return np.argmax(proba, axis=1) == positive_idx, proba.max(axis=1) * 100
+
+        correct, confidence, _ = FORM_RULE_SET.evaluate_batch(batch_rule_angles(features), exercise)
+        return correct, confidence
+
+    def analyze(self, timestamps, landmarks, exercise=AUTO_MODE, session_key=None):
+        if exercise != AUTO_MODE and exercise not in self.exercises:
+            raise ValueError(f"Unknown exercise: {exercise}")
+        session = self._session(session_key)
+        features = batch_pose_features(landmarks)
+        n = len(features)
+        angles = features[:, -len(ANGLE_NAMES):]
+
+        if exercise == AUTO_MODE:
+            labels = self._detect(session, features, timestamps)
+        else:
+            labels = np.full(n, exercise, dtype=object)
+
+        form_correct = np.ones(n, dtype=bool)
+        confidence = np.zeros(n)
+        events = []
+        for label in set(labels.tolist()) - {NONE_LABEL}:
+            mask = labels == label
+            form_correct[mask], confidence[mask] = self._verdicts(features[mask], label)
+
+            rule = REP_RULES.get(label)
+            if rule is None or label not in session.counters:
+                continue
+            frames = np.flatnonzero(mask)
+            signal = (timestamps[frames], batch_model_features(features[frames], [rule[0]])[:, 0],
+                      form_correct[frames])
+            carried = session.pending.get(label)
+            if carried is not None:
+                signal = tuple(np.concatenate([old, new]) for old, new in zip(carried, signal))
+            records, ends, pending = segment_reps(label, rule, *signal)
+            session.pending[label] = tuple(part[pending:] for part in signal)
+            # Reps complete on frames of this batch; carried frames come first
+            offset = len(signal[0]) - len(frames)
+            for record, end in zip(records, ends):
+                frame = frames[end - offset]
+                session.counters[label] += 1
+                events.append(dict(record, frame=int(frame), timestamp=float(timestamps[frame]),
+                                   rep=session.counters[label]))
+
+        events.sort(key=lambda e: e["frame"])
+        return {
+            "frames": n,
+            "exercise": labels.tolist(),
+            "form_correct": form_correct.tolist(),
+            "confidence": np.round(confidence, 1).tolist(),
+            "angles": {name: np.round(angles[:, i], 1).tolist() for i, name in enumerate(ANGLE_NAMES)},
+            "rep_events": events,
+            "counters": dict(session.counters),
+        }
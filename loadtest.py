@@ -0,0 +1,302 @@
+"""
+RepBot Load Test
+Hammers a running backend with stats pollers, MJPEG viewers and video upload
+jobs and reports throughput, latency percentiles, delivered FPS per viewer
+and server CPU, so builds (and `python app.py` vs `python serve.py`) can be
+compared on the same machine.
+
+With --launch the server is started here, fed by --source (a video file
+replayed in a loop through REPBOT_CAMERA_SOURCE), so the test runs offline
+without a webcam.
+
+Usage:
+    python loadtest.py --url http://localhost:5000 --pollers 32 --viewers 4 --duration 30
+    python loadtest.py --launch serve --source clip.mp4 --viewers 4 --uploads 1 --output report.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+import subprocess
+import urllib.request
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_STARTUP_TIMEOUT_S = 120.0
+CPU_SAMPLE_INTERVAL_S = 1.0
+UPLOAD_CHUNK = 64 * 1024
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _percentiles(samples_ms):
+    if not samples_ms:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    arr = np.asarray(samples_ms)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2), "max": round(float(arr.max()), 2)}
+
+
+def stats_poller(url, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url + "/api/get_stats", timeout=10) as resp:
+                resp.read()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            errors.append(1)
+
+
+def mjpeg_viewer(url, deadline, frame_gaps, errors):
+    """Count frames on /video_feed by scanning for JPEG end-of-image markers"""
+    try:
+        resp = urllib.request.urlopen(url + "/video_feed", timeout=10)
+    except Exception:
+        errors.append(1)
+        return
+    last = time.perf_counter()
+    tail = b""
+    with resp:
+        while time.monotonic() < deadline:
+            chunk = resp.read1(65536)
+            if not chunk:
+                break
+            data = tail + chunk
+            for _ in range(data.count(b"\xff\xd9")):
+                now = time.perf_counter()
+                frame_gaps.append((now - last) * 1000)
+                last = now
+            tail = data[-1:]
+
+
+def upload_job(url, path, exercise, deadline, results, errors):
+    """Stream ``path`` to /api/video/analyze repeatedly; record time to the
+    first SSE event and to the end of the analysis"""
+    query = f"/api/video/analyze?exercise={exercise}&user=loadtest"
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        first = None
+        try:
+            with open(path, "rb") as body:
+                req = urllib.request.Request(url + query, data=iter(lambda: body.read(UPLOAD_CHUNK), b""),
+                                             method="POST",
+                                             headers={"Content-Type": "application/octet-stream"})
+                with urllib.request.urlopen(req, timeout=600) as resp:
+                    failed = False
+                    for line in resp:
+                        if first is None and line.startswith(b"event:"):
+                            first = (time.perf_counter() - start) * 1000
+                        failed = failed or line.startswith(b"event: error")
+            if failed:
+                errors.append(1)
+                continue
+            results.append({"first_event_ms": first, "total_ms": (time.perf_counter() - start) * 1000})
+        except Exception:
+            errors.append(1)
+            # Busy job slots answer 503 immediately; do not spin on them
+            time.sleep(0.5)
+
+
+# -------------------------------------------------------------------
+# SERVER CPU (Linux /proc; None elsewhere)
+# -------------------------------------------------------------------
+def _process_tree(pid):
+    """pid and all its descendants"""
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _cpu_seconds(pid):
+    """User + system CPU time of the process tree rooted at ``pid``"""
+    total = 0.0
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                # Fields after the parenthesised command name; utime/stime are 14/15
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+class CpuSampler(threading.Thread):
+    """Samples the server's CPU use (100 = one full core) until stopped"""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.samples = []
+        self.total_s = 0.0
+        self.done = threading.Event()
+
+    def run(self):
+        start_cpu = last_cpu = _cpu_seconds(self.pid)
+        last = time.monotonic()
+        while not self.done.wait(CPU_SAMPLE_INTERVAL_S):
+            now, cpu = time.monotonic(), _cpu_seconds(self.pid)
+            self.samples.append((cpu - last_cpu) / (now - last) * 100)
+            last, last_cpu = now, cpu
+        self.total_s = last_cpu - start_cpu
+
+    def stop(self):
+        self.done.set()
+        self.join(timeout=5)
+
+    def report(self, elapsed):
+        if not self.samples:
+            return None
+        arr = np.asarray(self.samples)
+        return {"pid": self.pid, "cores": os.cpu_count(), "cpu_seconds": round(self.total_s, 2),
+                "mean_percent": round(self.total_s / elapsed * 100, 1),
+                "p95_percent": round(float(np.percentile(arr, 95)), 1),
+                "max_percent": round(float(arr.max()), 1)}
+
+
+# -------------------------------------------------------------------
+# LOCAL SERVER
+# -------------------------------------------------------------------
+def launch_server(kind, source, port):
+    """Start app.py or serve.py on ``port`` with ``source`` as the camera"""
+    env = dict(os.environ, REPBOT_CAMERA_SOURCE=source, PYTHONUNBUFFERED="1")
+    if kind == "app":
+        code = f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True, use_reloader=False)"
+        cmd = [sys.executable, "-c", code]
+    else:
+        cmd = [sys.executable, os.path.join(BASE_DIR, "serve.py"), "--port", str(port)]
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_STARTUP_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{kind} exited with code {proc.returncode} during startup")
+        try:
+            with urllib.request.urlopen(url + "/api/get_stats", timeout=2) as resp:
+                resp.read()
+            return proc, url
+        except Exception:
+            time.sleep(0.5)
+    proc.kill()
+    raise RuntimeError(f"{kind} did not answer within {SERVER_STARTUP_TIMEOUT_S:.0f}s")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def run(url, pollers, viewers, duration, start_camera, uploads=0, upload_file=None,
+        exercise="auto", server_pid=None):
+    url = url.rstrip("/")
+    if start_camera:
+        req = urllib.request.Request(url + "/api/start_camera", data=b"", method="POST")
+        urllib.request.urlopen(req, timeout=30).read()
+        time.sleep(2.0)
+    if uploads and not upload_file:
+        raise ValueError("upload jobs need a video file")
+
+    latencies, frame_gaps, poll_errors, view_errors = [], [], [], []
+    upload_results, upload_errors = [], []
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=stats_poller, args=(url, deadline, latencies, poll_errors), daemon=True)
+               for _ in range(pollers)]
+    threads += [threading.Thread(target=mjpeg_viewer, args=(url, deadline, frame_gaps, view_errors), daemon=True)
+                for _ in range(viewers)]
+    threads += [threading.Thread(target=upload_job, daemon=True,
+                                 args=(url, upload_file, exercise, deadline, upload_results, upload_errors))
+                for _ in range(uploads)]
+    sampler = CpuSampler(server_pid) if server_pid and os.path.isdir(f"/proc/{server_pid}") else None
+    if sampler is not None:
+        sampler.start()
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=max(0.0, deadline - time.monotonic()) + 15)
+    elapsed = time.monotonic() - started
+    if sampler is not None:
+        sampler.stop()
+
+    return {
+        "url": url,
+        "duration_s": round(elapsed, 2),
+        "pollers": pollers,
+        "viewers": viewers,
+        "uploads": uploads,
+        "stats_requests": len(latencies),
+        "stats_rps": round(len(latencies) / elapsed, 1),
+        "stats_latency_ms": _percentiles(latencies),
+        "stats_errors": len(poll_errors),
+        "frames_received": len(frame_gaps),
+        "fps_per_viewer": round(len(frame_gaps) / elapsed / viewers, 2) if viewers else None,
+        "frame_gap_ms": _percentiles(frame_gaps),
+        "viewer_errors": len(view_errors),
+        "upload_jobs": len(upload_results),
+        "upload_first_event_ms": _percentiles([r["first_event_ms"] for r in upload_results
+                                               if r["first_event_ms"] is not None]),
+        "upload_total_ms": _percentiles([r["total_ms"] for r in upload_results]),
+        "upload_errors": len(upload_errors),
+        "server_cpu": sampler.report(elapsed) if sampler is not None else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a RepBot backend")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--pollers", type=int, default=16, help="concurrent /api/get_stats clients")
+    parser.add_argument("--viewers", type=int, default=2, help="concurrent /video_feed clients")
+    parser.add_argument("--uploads", type=int, default=0, help="concurrent /api/video/analyze jobs")
+    parser.add_argument("--upload-file", help="clip for upload jobs (default: --source)")
+    parser.add_argument("--exercise", default="auto", help="exercise for upload jobs")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--start-camera", action="store_true", help="POST /api/start_camera first")
+    parser.add_argument("--launch", choices=["app", "serve"],
+                        help="start app.py or serve.py locally (implies --start-camera)")
+    parser.add_argument("--source", help="video file the launched server replays as its camera")
+    parser.add_argument("--port", type=int, default=5055, help="port for --launch")
+    parser.add_argument("--server-pid", type=int, help="pid of an already running server, for CPU usage")
+    parser.add_argument("--label", help="build or configuration name stored in the report")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args(argv)
+    if args.launch and not args.source:
+        parser.error("--launch needs --source")
+
+    proc = None
+    url, server_pid, start_camera = args.url, args.server_pid, args.start_camera
+    if args.launch:
+        proc, url = launch_server(args.launch, os.path.abspath(args.source), args.port)
+        server_pid, start_camera = proc.pid, True
+    try:
+        report = run(url, args.pollers, args.viewers, args.duration, start_camera,
+                     args.uploads, args.upload_file or args.source, args.exercise, server_pid)
+    finally:
+        if proc is not None:
+            stop_server(proc)
+    report = {"label": args.label, "launched": args.launch, "source": args.source,
+              "host": {"platform": platform.platform(), "cpus": os.cpu_count()}, **report}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
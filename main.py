@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 import mediapipe as mp
 import cv2
+from perf_profile import select_profile, pose_options
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
@@ -11,7 +12,8 @@ cap = cv2.VideoCapture(0)
 counter = 0
 stage = None
 ##Setup mediapipe instance 
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+# Pose settings of REPBOT_PROFILE (see perf_profile.py)
+with mp_pose.Pose(**pose_options(select_profile(calibrate_if_auto=False))) as pose:
     while cap.isOpened():
         ret, frame = cap.read()
 
@@ -6,6 +6,9 @@ import numpy as np
 from collections import deque
 import json
 
+from form_rules import FormRuleSet, batch_joint_angles
+from feedback_events import FEEDBACK_TIPS, DEFAULT_TIP, CORRECT_FEEDBACK
+
 # Try to import torch (optional)
 try:
     import torch
@@ -24,15 +27,116 @@ except ImportError:
     HF_AVAILABLE = False
     print("⚠ Hugging Face transformers not available (optional)")
 
+# Joints exported by extract_pose_features (x, y, z, visibility each),
+# followed by the angles from _calculate_key_angles in ANGLE_NAMES order
+KEY_JOINTS = [
+    'LEFT_SHOULDER', 'RIGHT_SHOULDER',
+    'LEFT_ELBOW', 'RIGHT_ELBOW',
+    'LEFT_WRIST', 'RIGHT_WRIST',
+    'LEFT_HIP', 'RIGHT_HIP',
+    'LEFT_KNEE', 'RIGHT_KNEE',
+    'LEFT_ANKLE', 'RIGHT_ANKLE',
+    'NOSE'
+]
+ANGLE_NAMES = ['left_arm', 'right_arm', 'left_leg', 'right_leg', 'torso']
+# MediaPipe PoseLandmark indices of KEY_JOINTS (for raw 33-landmark arrays)
+KEY_JOINT_INDICES = [11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28, 0]
+# Joint triplets (a, b, c) into KEY_JOINTS for each of ANGLE_NAMES
+ANGLE_TRIPLETS = [(0, 2, 4), (1, 3, 5), (6, 8, 10), (7, 9, 11), (12, 0, 6)]
+
+# Model input columns the pipeline knows how to build from pose features.
+# ("angle", i) reads angle i; ("joints", (a, b, c)) measures the 2D angle at
+# joint b between joints a and c (indices into KEY_JOINTS).
+FEATURE_COLUMNS = {
+    'Bicep Angle': ('angle', 0),
+    'Squat Angle': ('angle', 2),
+    'Lateral Raise Angle': ('joints', (0, 2, 1)),
+    'Shoulder Abduction Angle': ('joints', (6, 0, 2)),
+    'left_elbow_angle': ('angle', 0),
+    'right_elbow_angle': ('angle', 1),
+    'left_knee_angle': ('angle', 2),
+}
+# Schema of the original exercise_form_model.pkl (bicep and squat angles)
+LEGACY_FEATURES = ['Bicep Angle', 'Squat Angle']
+# Encoded label meaning "correct form" when a model has no metadata.
+# LabelEncoder sorts the labels, so "correct" comes before "incorrect"
+LEGACY_POSITIVE_CLASS = 0
+# Declarative form checks (form_rules.FORM_RULES) over KEY_JOINTS coordinates
+FORM_RULE_SET = FormRuleSet(joint_names=KEY_JOINTS)
+
+
+def supports_features(feature_names):
+    """True if every model input column can be built from pose features"""
+    return all(name in FEATURE_COLUMNS for name in feature_names)
+
+
+def select_model_features(pose_features, feature_names):
+    """Build the model input row for ``feature_names`` from a pose feature vector"""
+    angles = pose_features[-len(ANGLE_NAMES):]
+    row = []
+    for name in feature_names:
+        kind, ref = FEATURE_COLUMNS[name]
+        if kind == 'angle':
+            row.append(float(angles[ref]))
+        else:
+            a, b, c = (np.asarray(pose_features[4 * j:4 * j + 2], dtype=np.float64) for j in ref)
+            ba, bc = a - b, c - b
+            cosine = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
+            row.append(float(np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))))
+    return np.array(row, dtype=np.float64)
+
+
+def batch_pose_features(landmarks):
+    """N x 57 pose feature matrix from raw N x 33 x 4 landmark arrays
+
+    Same layout as ExerciseMLPipeline.extract_pose_features, computed for
+    the whole batch at once.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    joints = landmarks[:, KEY_JOINT_INDICES, :]
+    angles = batch_joint_angles(joints[:, :, :2].astype(np.float64), ANGLE_TRIPLETS)
+    return np.concatenate([joints.reshape(len(joints), -1), angles.astype(np.float32)], axis=1)
+
+
+def batch_model_features(pose_features, feature_names):
+    """N x F model input matrix (select_model_features for every row)"""
+    pose_features = np.asarray(pose_features)
+    angles = pose_features[:, -len(ANGLE_NAMES):].astype(np.float64)
+    points = pose_features[:, :4 * len(KEY_JOINTS)].reshape(len(pose_features), len(KEY_JOINTS), 4)
+    columns = []
+    for name in feature_names:
+        kind, ref = FEATURE_COLUMNS[name]
+        if kind == 'angle':
+            columns.append(angles[:, ref])
+        else:
+            columns.append(batch_joint_angles(points[:, :, :2].astype(np.float64), [ref])[:, 0])
+    return np.stack(columns, axis=1) if columns else np.empty((len(pose_features), 0))
+
+
+def batch_rule_angles(pose_features):
+    """N x len(RULE_ANGLES) form-rule angles from an N x 57 pose feature matrix"""
+    pose_features = np.atleast_2d(pose_features)
+    points = pose_features[:, :4 * len(KEY_JOINTS)].reshape(len(pose_features), len(KEY_JOINTS), 4)
+    return FORM_RULE_SET.angles_from_points(points[:, :, :2])
+
+
 class ExerciseMLPipeline:
     """ML Pipeline for exercise form analysis and rep counting"""
     
-    def __init__(self):
+    def __init__(self, verbose=True):
+        self.verbose = verbose
         self.device = "cuda" if TORCH_AVAILABLE and torch is not None and torch.cuda.is_available() and HF_AVAILABLE else "cpu"
         self.pose_history = deque(maxlen=30)  # Store last 30 frames
         self.rep_counters = {}
         self.exercise_states = {}
         
+        # Streaming temporal features over the same 30-frame history
+        from window_features import SlidingWindowFeatureEngine
+        self.window_engine = SlidingWindowFeatureEngine(window=self.pose_history.maxlen)
+        
+        # Out-of-process transformer worker (see start_transformer_worker)
+        self.hf_worker = None
+        
         # Initialize Hugging Face model for exercise analysis
         if HF_AVAILABLE and TORCH_AVAILABLE:
             try:
@@ -42,17 +146,43 @@ class ExerciseMLPipeline:
                 self.feature_extractor = None
                 # For now, we'll use rule-based + local model, but structure is ready for HF
                 self.hf_model_ready = False
-                print("✓ ML Pipeline initialized (HF transformers available)")
+                if verbose:
+                    print("✓ ML Pipeline initialized (HF transformers available)")
             except Exception as e:
                 print(f"⚠ HF model initialization failed: {e}")
                 self.hf_model_ready = False
         else:
             self.hf_model_ready = False
-            if not TORCH_AVAILABLE:
+            if verbose and not TORCH_AVAILABLE:
                 print("✓ ML Pipeline initialized (using local models - PyTorch not required)")
-            else:
+            elif verbose:
                 print("✓ ML Pipeline initialized (HF transformers not available, using local models)")
     
+    def start_transformer_worker(self, model_dir, input_kind="landmarks", num_threads=2,
+                                 quantize=False, frame_size=224):
+        """Run transformer inference in a separate process (local model dir only)
+        
+        Landmark windows are the pose history (30 x 57 features); frames are
+        downsampled to ``frame_size`` RGB before being handed over.
+        """
+        from transformer_worker import TransformerWorker
+        if input_kind == "frames":
+            slot_shape = (frame_size, frame_size, 3)
+        else:
+            slot_shape = (self.pose_history.maxlen, len(KEY_JOINTS) * 4 + len(ANGLE_NAMES))
+        self.hf_worker = TransformerWorker(model_dir, input_kind=input_kind, slot_shape=slot_shape,
+                                           num_threads=num_threads, quantize=quantize)
+        self.model_name = model_dir
+        self.hf_model_ready = True
+        return self.hf_worker
+    
+    def submit_landmark_window(self):
+        """Hand the current pose history to the transformer worker (non-blocking)"""
+        if self.hf_worker is None or self.hf_worker.input_kind != "landmarks" \
+                or len(self.pose_history) < self.pose_history.maxlen:
+            return False
+        return self.hf_worker.submit(np.stack(self.pose_history))
+    
     def extract_pose_features(self, landmarks):
         """Extract normalized pose features from MediaPipe landmarks"""
         if landmarks is None:
@@ -62,20 +192,10 @@ class ExerciseMLPipeline:
             features = []
             
             # Extract key joint positions (normalized 0-1)
-            key_joints = [
-                'LEFT_SHOULDER', 'RIGHT_SHOULDER',
-                'LEFT_ELBOW', 'RIGHT_ELBOW',
-                'LEFT_WRIST', 'RIGHT_WRIST',
-                'LEFT_HIP', 'RIGHT_HIP',
-                'LEFT_KNEE', 'RIGHT_KNEE',
-                'LEFT_ANKLE', 'RIGHT_ANKLE',
-                'NOSE'
-            ]
-            
             import mediapipe as mp
             mp_pose = mp.solutions.pose
             
-            for joint_name in key_joints:
+            for joint_name in KEY_JOINTS:
                 try:
                     landmark = landmarks[mp_pose.PoseLandmark[joint_name].value]
                     features.extend([landmark.x, landmark.y, landmark.z, landmark.visibility])
@@ -91,6 +211,22 @@ class ExerciseMLPipeline:
             print(f"Error extracting pose features: {e}")
             return None
     
+    def update_history(self, pose_features, timestamp=None):
+        """Append a frame to the history and return the window feature vector
+
+        Window statistics are updated incrementally (O(1) per frame) instead of
+        being recomputed over the whole history.
+        """
+        if pose_features is None or len(pose_features) < len(ANGLE_NAMES):
+            return self.window_engine.feature_vector()
+        self.pose_history.append(pose_features)
+        self.window_engine.update(pose_features[-len(ANGLE_NAMES):], timestamp)
+        return self.window_engine.feature_vector()
+    
+    def reset_history(self):
+        self.pose_history.clear()
+        self.window_engine.reset()
+    
     def _calculate_key_angles(self, landmarks):
         """Calculate key joint angles for exercise analysis"""
         import mediapipe as mp
@@ -143,8 +279,15 @@ class ExerciseMLPipeline:
         
         return angles
     
-    def analyze_exercise_form(self, pose_features, exercise_type, local_model=None, scaler=None):
-        """Analyze exercise form using ML models"""
+    def analyze_exercise_form(self, pose_features, exercise_type, local_model=None, scaler=None,
+                              feature_names=None, positive_class=LEGACY_POSITIVE_CLASS, lookup_table=None):
+        """Analyze exercise form using ML models
+
+        ``feature_names`` is the model's input schema (see FEATURE_COLUMNS);
+        it defaults to the legacy bicep/squat angle pair. ``positive_class``
+        is the encoded label meaning "correct form". A DecisionLookupTable
+        baked from the same model replaces the model call with one array index.
+        """
         if pose_features is None:
             return {
                 'form_correct': False,
@@ -154,20 +297,24 @@ class ExerciseMLPipeline:
             }
         
         # Use local model if available
-        if local_model is not None and scaler is not None:
+        feature_names = lookup_table.features if lookup_table is not None else (feature_names or LEGACY_FEATURES)
+        has_model = lookup_table is not None or (local_model is not None and scaler is not None)
+        if has_model and len(pose_features) >= len(ANGLE_NAMES) and supports_features(feature_names):
             try:
-                # Extract angle features for local model
-                angle_features = pose_features[-5:] if len(pose_features) >= 5 else pose_features
-                if len(angle_features) < 2:
-                    angle_features = np.array([0.0, 0.0])
+                # Build the model input row in the schema the model was trained on
+                model_input = select_model_features(pose_features, feature_names)
                 
-                # Scale and predict
-                scaled = scaler.transform([angle_features[:2]])  # bicep and squat angles
-                prediction = local_model.predict(scaled)[0]
-                proba = local_model.predict_proba(scaled)[0]
-                
-                form_correct = prediction == 1
-                confidence = float(proba[1] if form_correct else proba[0]) * 100
+                if lookup_table is not None:
+                    form_correct, confidence = lookup_table.classify(model_input)
+                else:
+                    # Scale and predict
+                    scaled = scaler.transform(model_input.reshape(1, -1))
+                    proba = local_model.predict_proba(scaled)[0]
+                    classes = list(local_model.classes_)
+                    positive_idx = classes.index(positive_class) if positive_class in classes else len(classes) - 1
+                    
+                    form_correct = bool(np.argmax(proba) == positive_idx)
+                    confidence = float(np.max(proba)) * 100
                 
                 feedback = self._generate_feedback(exercise_type, pose_features, form_correct)
                 
@@ -184,77 +331,33 @@ class ExerciseMLPipeline:
         return self._rule_based_analysis(pose_features, exercise_type)
     
     def _rule_based_analysis(self, pose_features, exercise_type):
-        """Rule-based form analysis as fallback"""
-        if len(pose_features) < 5:
+        """Rule-based form analysis as fallback (form_rules.FORM_RULES)"""
+        if len(pose_features) < 4 * len(KEY_JOINTS):
             return {
                 'form_correct': False,
                 'confidence': 0.0,
                 'feedback': 'Insufficient pose data',
                 'score': 0.0
             }
-        
-        # Extract angles (last 5 values)
-        angles = pose_features[-5:] if len(pose_features) >= 5 else [0.0] * 5
-        bicep_angle = angles[0] if len(angles) > 0 else 0
-        squat_angle = angles[2] if len(angles) > 2 else 0
-        
-        form_correct = True
-        feedback = "Correct Form"
-        confidence = 85.0
-        
-        if exercise_type == "BICEP_CURL":
-            if not (30 < bicep_angle < 160):
-                form_correct = False
-                feedback = "Keep elbow stable, maintain proper range of motion"
-                confidence = 40.0
-        elif exercise_type == "SQUAT":
-            if not (90 < squat_angle < 160):
-                form_correct = False
-                feedback = "Go deeper, thighs should be parallel to ground"
-                confidence = 45.0
-        
-        return {
-            'form_correct': form_correct,
-            'confidence': confidence,
-            'feedback': feedback,
-            'score': confidence / 100.0
-        }
+        return FORM_RULE_SET.evaluate(batch_rule_angles(pose_features)[0], exercise_type)
     
     def _generate_feedback(self, exercise_type, pose_features, form_correct):
-        """Generate specific feedback based on exercise type and form"""
+        """Generate specific feedback based on exercise type and form
+
+        Deterministic for a given pose so that FeedbackEngine can debounce it:
+        the violated form rule's message if there is one, else the
+        exercise's tip.
+        """
         if form_correct:
-            return "Correct Form - Keep it up!"
+            return CORRECT_FEEDBACK
         
-        if len(pose_features) < 5:
+        if len(pose_features) < 4 * len(KEY_JOINTS):
             return "Adjust your position for better detection"
         
-        angles = pose_features[-5:] if len(pose_features) >= 5 else [0.0] * 5
-        bicep_angle = angles[0] if len(angles) > 0 else 0
-        squat_angle = angles[2] if len(angles) > 2 else 0
-        
-        feedback_tips = {
-            "BICEP_CURL": [
-                "Keep your elbow close to your body",
-                "Control the weight, don't swing",
-                "Full range of motion - extend and contract fully"
-            ],
-            "SQUAT": [
-                "Keep your back straight",
-                "Go deeper - thighs parallel to ground",
-                "Push through your heels when standing"
-            ],
-            "PUSH_UP": [
-                "Keep your body in a straight line",
-                "Lower your chest to the ground",
-                "Push up with control"
-            ]
-        }
-        
-        if exercise_type in feedback_tips:
-            import random
-            return random.choice(feedback_tips[exercise_type])
-        
-        return "Focus on proper form and control"
+        rule_result = FORM_RULE_SET.evaluate(batch_rule_angles(pose_features)[0], exercise_type)
+        if not rule_result['form_correct']:
+            return rule_result['feedback']
+        return FEEDBACK_TIPS.get(exercise_type, DEFAULT_TIP)
 
 
 
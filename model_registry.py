@@ -0,0 +1,294 @@
+"""
+Model Registry
+Versioned form-model artifacts with validated loading and atomic hot reload
+"""
+import os
+import json
+import time
+import shutil
+import threading
+import joblib
+import numpy as np
+
+from ml_pipeline import LEGACY_FEATURES, LEGACY_POSITIVE_CLASS, supports_features
+
+MODEL_FILE = "exercise_form_model.pkl"
+SCALER_FILE = "scaler.pkl"
+META_FILE = "model_meta.json"
+ENCODER_FILE = "label_encoder.pkl"
+# Optional window classifier for ExerciseDetector (see exercise_detector.py)
+EXERCISE_CLASSIFIER_FILE = "exercise_classifier.pkl"
+EXERCISE_CLASSIFIER_META_FILE = "exercise_classifier.json"
+ARTIFACT_FILES = (MODEL_FILE, SCALER_FILE, META_FILE, ENCODER_FILE,
+                  EXERCISE_CLASSIFIER_FILE, EXERCISE_CLASSIFIER_META_FILE)
+CURRENT_FILE = "CURRENT"
+LEGACY_VERSION = "legacy"
+WARMUP_ROWS = 64
+
+
+class ModelBundle:
+    """One loaded model version: estimator, scaler and feature schema
+
+    Bundles are never mutated after validation, so a frame that grabbed
+    ``registry.current`` keeps a consistent model even if a reload swaps
+    in a new version halfway through.
+    """
+
+    def __init__(self, version, model, scaler, features, positive_class, meta=None):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.features = list(features)
+        self.positive_class = positive_class
+        self.meta = meta or {}
+        self.exercise_classifier = None
+        self.lookup_table = None
+        self.loaded_at = time.time()
+        self.load_time_ms = 0.0
+        self.warmup_ms = 0.0
+
+    def info(self):
+        return {
+            "version": self.version,
+            "features": self.features,
+            "positive_class": self.positive_class,
+            "exercise_classes": ([str(c) for c in self.exercise_classifier.classes_]
+                                 if self.exercise_classifier is not None else None),
+            "loaded_at": self.loaded_at,
+            "load_time_ms": round(self.load_time_ms, 2),
+            "warmup_ms": round(self.warmup_ms, 2),
+            "lookup_table": self.lookup_table.report if self.lookup_table is not None else None,
+        }
+
+
+class ModelRegistry:
+    """Versioned model store under ``root`` (``root/<version>/`` + ``root/CURRENT``)
+
+    ``legacy_dir`` holds the original flat ``exercise_form_model.pkl`` /
+    ``scaler.pkl`` pair and is used when no version has been published.
+    """
+
+    def __init__(self, root, legacy_dir=None, lookup_resolution=None):
+        self.root = root
+        self.legacy_dir = legacy_dir
+        # Optional DecisionLookupTable step (degrees); a prebuilt
+        # decision_table.npz in the version directory is used when present
+        self.lookup_resolution = lookup_resolution
+        self._current = None
+        self._lock = threading.Lock()
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self._watched_state = None
+        self.last_error = None
+
+    # ------------------------------------------------------------------
+    # ACCESS
+    # ------------------------------------------------------------------
+    @property
+    def current(self):
+        """The active ModelBundle (or None); a plain reference read, never blocks"""
+        return self._current
+
+    def list_versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isfile(os.path.join(self.root, name, MODEL_FILE)))
+
+    def active_version(self):
+        """Version named in CURRENT, else the newest published one, else legacy"""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                version = f.read().strip()
+            if version:
+                return version
+        except OSError:
+            pass
+        versions = self.list_versions()
+        return versions[-1] if versions else LEGACY_VERSION
+
+    # ------------------------------------------------------------------
+    # LOADING
+    # ------------------------------------------------------------------
+    def load(self, version=None):
+        """Load, warm up and atomically activate a version
+
+        The previous bundle stays active if anything fails; the error is
+        kept in ``last_error`` and re-raised.
+        """
+        version = version or self.active_version()
+        try:
+            bundle = self._load_bundle(version)
+            self._warm_up(bundle)
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            raise
+
+        with self._lock:
+            self._current = bundle
+        self.last_error = None
+        print(f"✓ Model {version} active (load {bundle.load_time_ms:.1f} ms, "
+              f"warm-up {bundle.warmup_ms:.1f} ms)")
+        return bundle
+
+    def _version_dir(self, version):
+        """Directory of a published version; anything else (paths, names not
+        in list_versions()) is refused, since loading unpickles the files"""
+        if version == LEGACY_VERSION:
+            if not self.legacy_dir:
+                raise FileNotFoundError("No legacy model directory configured")
+            return self.legacy_dir
+        if (not isinstance(version, str) or "/" in version or "\\" in version or ".." in version
+                or version not in self.list_versions()):
+            raise ValueError(f"Unknown model version: {version!r}")
+        return os.path.join(self.root, version)
+
+    def _load_bundle(self, version):
+        directory = self._version_dir(version)
+        start = time.perf_counter()
+        model = joblib.load(os.path.join(directory, MODEL_FILE))
+        scaler = joblib.load(os.path.join(directory, SCALER_FILE))
+
+        meta = {}
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        features = meta.get("features", LEGACY_FEATURES)
+        positive_class = meta.get("positive_class")
+        if positive_class is None:
+            positive_class = self._positive_class_from_encoder(directory)
+
+        bundle = ModelBundle(version, model, scaler, features, positive_class, meta)
+        classifier_path = os.path.join(directory, EXERCISE_CLASSIFIER_FILE)
+        if os.path.exists(classifier_path):
+            bundle.exercise_classifier = joblib.load(classifier_path)
+        bundle.load_time_ms = (time.perf_counter() - start) * 1000
+        bundle.lookup_table = self._load_lookup_table(directory, bundle)
+        return bundle
+
+    def _positive_class_from_encoder(self, directory):
+        """Encoded "correct" label of a model without metadata: its index in
+        label_encoder.pkl, else the LabelEncoder ordering (see
+        LEGACY_POSITIVE_CLASS)"""
+        encoder_path = os.path.join(directory, ENCODER_FILE)
+        if os.path.exists(encoder_path):
+            classes = [str(c) for c in getattr(joblib.load(encoder_path), "classes_", [])]
+            if "correct" in classes:
+                return classes.index("correct")
+        return LEGACY_POSITIVE_CLASS
+
+    def _load_lookup_table(self, directory, bundle):
+        from decision_table import DecisionLookupTable, TABLE_FILE, build_for_bundle
+
+        table_path = os.path.join(directory, TABLE_FILE)
+        if os.path.exists(table_path) and os.path.getmtime(table_path) >= os.path.getmtime(
+                os.path.join(directory, MODEL_FILE)):
+            table = DecisionLookupTable.load(table_path)
+            if table.features == bundle.features:
+                return table
+        if self.lookup_resolution:
+            table = build_for_bundle(bundle, self.lookup_resolution)
+            print(f"✓ Lookup table built at {self.lookup_resolution}° "
+                  f"(accuracy loss {table.report['accuracy_loss'] * 100:.2f}%)")
+            return table
+        return None
+
+    def _warm_up(self, bundle):
+        """Run a synthetic batch through the model and check the output is sane"""
+        if not supports_features(bundle.features):
+            raise ValueError(f"Unsupported feature schema: {bundle.features}")
+
+        rng = np.random.default_rng(0)
+        batch = rng.uniform(0.0, 180.0, size=(WARMUP_ROWS, len(bundle.features)))
+        start = time.perf_counter()
+        proba = bundle.model.predict_proba(bundle.scaler.transform(batch))
+        bundle.warmup_ms = (time.perf_counter() - start) * 1000
+
+        n_classes = len(bundle.model.classes_)
+        if proba.shape != (WARMUP_ROWS, n_classes):
+            raise ValueError(f"Unexpected prediction shape {proba.shape}")
+        if not np.all(np.isfinite(proba)) or not np.allclose(proba.sum(axis=1), 1.0, atol=1e-3):
+            raise ValueError("Model returned invalid probabilities")
+        if bundle.positive_class not in bundle.model.classes_:
+            raise ValueError(f"Positive class {bundle.positive_class} not in model classes")
+
+        if bundle.exercise_classifier is not None:
+            from window_features import SlidingWindowFeatureEngine
+            width = len(SlidingWindowFeatureEngine().feature_names())
+            proba = bundle.exercise_classifier.predict_proba(rng.uniform(0.0, 180.0, size=(1, width)))
+            if proba.shape != (1, len(bundle.exercise_classifier.classes_)):
+                raise ValueError(f"Unexpected exercise classifier output shape {proba.shape}")
+
+    # ------------------------------------------------------------------
+    # PUBLISHING
+    # ------------------------------------------------------------------
+    def publish(self, source_dir, version=None, activate=True, files=ARTIFACT_FILES, base=None):
+        """Copy artifacts from ``source_dir`` into a new version directory
+
+        Only ``files`` are taken from ``source_dir``; the other artifacts
+        are carried over from the ``base`` version when one is given, e.g.
+        to ship a new exercise classifier with the active form model.
+        """
+        version = version or time.strftime("%Y%m%d-%H%M%S")
+        target = os.path.join(self.root, version)
+        staging = target + ".tmp"
+        os.makedirs(staging, exist_ok=True)
+        base_dir = self._version_dir(base) if base else None
+        for name in ARTIFACT_FILES:
+            directory = source_dir if name in files else base_dir
+            path = os.path.join(directory, name) if directory else None
+            if path and os.path.exists(path):
+                shutil.copy2(path, os.path.join(staging, name))
+        # Readers only ever see complete version directories
+        os.replace(staging, target)
+        if activate:
+            self.set_active(version)
+        return version
+
+    def set_active(self, version):
+        """Point CURRENT at ``version`` (atomic rename, picked up by watchers)"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, CURRENT_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+
+    # ------------------------------------------------------------------
+    # FILE WATCH
+    # ------------------------------------------------------------------
+    def start_watching(self, interval=2.0):
+        """Poll CURRENT and hot-reload when it points at a new version"""
+        if self._watch_thread is not None:
+            return
+        self._watched_state = self._pointer_state()
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        self._watch_stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=1.0)
+            self._watch_thread = None
+
+    def _pointer_state(self):
+        try:
+            stat = os.stat(os.path.join(self.root, CURRENT_FILE))
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _watch(self, interval):
+        while not self._watch_stop.wait(interval):
+            state = self._pointer_state()
+            if state == self._watched_state:
+                continue
+            self._watched_state = state
+            version = self.active_version()
+            if self._current is not None and self._current.version == version:
+                continue
+            try:
+                self.load(version)
+            except Exception as e:
+                print(f"⚠ Model reload failed, keeping current model: {e}")
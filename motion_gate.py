@@ -0,0 +1,75 @@
+"""
+Motion Gate
+Skips pose inference while the scene is still. Each frame is shrunk to a
+tiny grayscale thumbnail and compared with the thumbnail of the last frame
+that went through inference; when too few pixels changed, the caller reuses
+the previous landmarks and results. A forced refresh every
+``refresh_interval`` frames keeps that state from going stale.
+
+Comparing against the last *processed* frame rather than the previous one
+means slow, steady movement still adds up and opens the gate.
+"""
+import cv2
+import numpy as np
+
+THUMBNAIL_SIZE = (64, 48)
+# Grey-level change for a thumbnail pixel to count as moving
+PIXEL_DELTA = 12
+# Share of moving pixels that opens the gate
+MOTION_THRESHOLD = 0.01
+REFRESH_INTERVAL = 15
+
+
+class MotionGate:
+    """``check(frame)`` -> True when the frame needs pose inference"""
+
+    def __init__(self, threshold=MOTION_THRESHOLD, refresh_interval=REFRESH_INTERVAL,
+                 size=THUMBNAIL_SIZE, pixel_delta=PIXEL_DELTA):
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.size = size
+        self.pixel_delta = pixel_delta
+        self.processed = 0
+        self.gated = 0
+        self.last_motion = None
+        self._small = None
+        self._gray = np.empty(size[::-1], dtype=np.uint8)
+        self._reference = np.empty(size[::-1], dtype=np.uint8)
+        self._diff = np.empty(size[::-1], dtype=np.uint8)
+        self._has_reference = False
+        self._since_processed = 0
+
+    def reset(self):
+        """Force inference on the next frame (e.g. after a camera restart)"""
+        self._has_reference = False
+
+    def check(self, frame):
+        self._small = cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        if self._small.ndim == 3:
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        else:
+            self._gray[...] = self._small
+
+        if self._has_reference:
+            cv2.absdiff(self._gray, self._reference, dst=self._diff)
+            self.last_motion = cv2.countNonZero(
+                cv2.threshold(self._diff, self.pixel_delta, 255, cv2.THRESH_BINARY)[1]) / self._diff.size
+            if self.last_motion < self.threshold and self._since_processed < self.refresh_interval:
+                self._since_processed += 1
+                self.gated += 1
+                return False
+
+        self._reference[...] = self._gray
+        self._has_reference = True
+        self._since_processed = 0
+        self.processed += 1
+        return True
+
+    def stats(self):
+        total = self.processed + self.gated
+        return {
+            "processed": self.processed,
+            "gated": self.gated,
+            "gated_ratio": round(self.gated / total, 3) if total else 0.0,
+            "last_motion": None if self.last_motion is None else round(self.last_motion, 4),
+        }
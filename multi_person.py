@@ -0,0 +1,250 @@
+"""
+Multi-Person Tracking
+Finds people every N frames, tracks each person's box in between and runs
+MediaPipe Pose on each person's crop with a separate AnalysisSession
+(angle history, rep counters, feedback) per tracked id.
+
+Pose cost grows linearly with the number of tracks: every tracked person has
+their own Pose graph and runs a full landmark inference on each frame. Crops
+run in parallel, but the CPU spent per frame is still one inference per
+person, so ``max_people`` bounds the cost.
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import mediapipe as mp
+from mediapipe.framework.formats import landmark_pb2
+
+from analysis_session import AnalysisSession
+from perf_profile import DEFAULT_POSE_OPTIONS
+
+mp_pose = mp.solutions.pose
+mp_drawing = mp.solutions.drawing_utils
+
+# Width the frame is downscaled to for person detection
+DETECT_WIDTH = 400
+# Extra context around a person's box when cropping (fraction of box size)
+CROP_MARGIN = 0.2
+MATCH_IOU = 0.3
+TRACK_COLORS = [(0, 255, 0), (255, 128, 0), (0, 128, 255), (255, 0, 255), (0, 255, 255), (128, 0, 255)]
+
+
+class _Landmark:
+    """Full-frame landmark with the attributes the pipeline reads"""
+    __slots__ = ("x", "y", "z", "visibility")
+
+    def __init__(self, x, y, z, visibility):
+        self.x, self.y, self.z, self.visibility = x, y, z, visibility
+
+
+def _center_inside(inner, outer):
+    cx, cy = inner[0] + inner[2] / 2, inner[1] + inner[3] / 2
+    return outer[0] <= cx <= outer[0] + outer[2] and outer[1] <= cy <= outer[1] + outer[3]
+
+
+def _iou(a, b):
+    ax2, ay2, bx2, by2 = a[0] + a[2], a[1] + a[3], b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    ih = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class HogPersonDetector:
+    """OpenCV's built-in HOG people detector on a downscaled frame"""
+
+    def __init__(self, width=DETECT_WIDTH):
+        self.width = width
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def __call__(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.width / float(w) if w > self.width else 1.0
+        small = cv2.resize(frame, (int(w * scale), int(h * scale))) if scale != 1.0 else frame
+        rects, _ = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        return [tuple(int(v / scale) for v in r) for r in rects]
+
+
+class PersonTrack:
+    """One tracked person: box, private Pose graph and analysis session"""
+
+    def __init__(self, track_id, box, session, pose_options=DEFAULT_POSE_OPTIONS):
+        self.id = track_id
+        self.box = box
+        self.session = session
+        self.pose = mp_pose.Pose(**pose_options)
+        self.landmarks = None
+        self.misses = 0
+        self.last_seen = time.monotonic()
+
+    def close(self):
+        self.pose.close()
+
+
+class MultiPersonTracker:
+    """Detect every ``detect_every`` frames, track boxes from landmarks between
+
+    Between detections each box is re-centred on the person's landmarks from
+    the previous frame, so the detector cost is amortised over N frames and
+    pose runs on small crops instead of the full frame. Crops are processed
+    concurrently (each track owns its Pose graph).
+
+    The capture thread adds and removes tracks while request threads read
+    stats; changes to ``tracks`` hold ``_lock`` and readers iterate a
+    ``snapshot()``.
+    """
+
+    def __init__(self, exercises, model_registry=None, detector=None, detect_every=15,
+                 max_people=6, max_misses=10, pose_options=DEFAULT_POSE_OPTIONS, workers=4):
+        self.exercises = list(exercises)
+        self.model_registry = model_registry
+        self.detector = detector or HogPersonDetector()
+        self.detect_every = detect_every
+        self.max_people = max_people
+        self.max_misses = max_misses
+        # Keyword arguments for every track's Pose graph (perf_profile.pose_options)
+        self.pose_options = dict(pose_options)
+        self.tracks = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._frame_index = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self.timings = {"detect_ms": 0.0, "pose_ms": 0.0, "detections": 0}
+
+    # ------------------------------------------------------------------
+    # DETECTION + ASSOCIATION
+    # ------------------------------------------------------------------
+    def _detect(self, frame):
+        start = time.perf_counter()
+        boxes = self.detector(frame)
+        self.timings["detect_ms"] = (time.perf_counter() - start) * 1000
+        self.timings["detections"] += 1
+
+        with self._lock:
+            self._associate(boxes)
+
+    def _associate(self, boxes):
+        unmatched = set(self.tracks)
+        for box in sorted(boxes, key=lambda b: -b[2] * b[3]):
+            best_id, best_iou = None, MATCH_IOU
+            for track_id in unmatched:
+                track_box = self.tracks[track_id].box
+                # Tracked boxes hug the landmarks, detector boxes are looser
+                iou = _iou(track_box, box) + (MATCH_IOU if _center_inside(track_box, box) else 0.0)
+                if iou > best_iou:
+                    best_id, best_iou = track_id, iou
+            if best_id is not None:
+                self.tracks[best_id].box = box
+                unmatched.discard(best_id)
+            elif len(self.tracks) < self.max_people:
+                session = AnalysisSession(self.exercises, self.model_registry)
+                self.tracks[self._next_id] = PersonTrack(self._next_id, box, session, self.pose_options)
+                self._next_id += 1
+        for track_id in unmatched:
+            self.tracks[track_id].misses += 1
+
+    # ------------------------------------------------------------------
+    # PER-PERSON POSE
+    # ------------------------------------------------------------------
+    def _process_track(self, track, rgb, timestamp):
+        fh, fw = rgb.shape[:2]
+        x, y, w, h = track.box
+        mx, my = int(w * CROP_MARGIN), int(h * CROP_MARGIN)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(fw, x + w + mx), min(fh, y + h + my)
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            track.misses += 1
+            return
+
+        crop = rgb[y0:y1, x0:x1]
+        results = track.pose.process(crop)
+        if not results.pose_landmarks:
+            track.misses += 1
+            track.landmarks = None
+            track.session.analyze(None, timestamp)
+            return
+
+        # Map crop-normalised landmarks back to full-frame normalised coords
+        cw, ch = x1 - x0, y1 - y0
+        landmarks = [_Landmark((lm.x * cw + x0) / fw, (lm.y * ch + y0) / fh, lm.z, lm.visibility)
+                     for lm in results.pose_landmarks.landmark]
+        track.landmarks = landmarks
+        track.misses = 0
+        track.last_seen = time.monotonic()
+        track.session.analyze(landmarks, timestamp)
+
+        # Track: the next box is the landmarks' extent (visible joints only)
+        pts = np.array([(lm.x * fw, lm.y * fh) for lm in landmarks if lm.visibility > 0.3])
+        if len(pts) >= 4:
+            bx0, by0 = pts.min(axis=0)
+            bx1, by1 = pts.max(axis=0)
+            track.box = (int(bx0), int(by0), max(int(bx1 - bx0), 1), max(int(by1 - by0), 1))
+
+    def process(self, frame, timestamp=None):
+        """Update every track for one BGR frame; returns the active tracks"""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if self._frame_index % self.detect_every == 0:
+            self._detect(frame)
+        self._frame_index += 1
+
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        start = time.perf_counter()
+        list(self._executor.map(lambda t: self._process_track(t, rgb, timestamp), self.snapshot()))
+        self.timings["pose_ms"] = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            lost = [self.tracks.pop(tid) for tid, t in list(self.tracks.items()) if t.misses > self.max_misses]
+        for track in lost:
+            track.close()
+        return self.snapshot()
+
+    # ------------------------------------------------------------------
+    # OUTPUT
+    # ------------------------------------------------------------------
+    def snapshot(self):
+        """Current tracks as a list, safe to iterate while tracks change"""
+        with self._lock:
+            return list(self.tracks.values())
+
+    def draw(self, frame):
+        for track in self.snapshot():
+            color = TRACK_COLORS[track.id % len(TRACK_COLORS)]
+            x, y, w, h = track.box
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            label = f"#{track.id} {track.session.current_exercise}"
+            reps = track.session.counters.get(track.session.current_exercise)
+            if reps is not None:
+                label += f" x{reps}"
+            cv2.putText(frame, label, (x, max(y - 8, 15)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            if track.landmarks is not None:
+                proto = landmark_pb2.NormalizedLandmarkList(landmark=[
+                    landmark_pb2.NormalizedLandmark(x=lm.x, y=lm.y, z=lm.z, visibility=lm.visibility)
+                    for lm in track.landmarks])
+                mp_drawing.draw_landmarks(frame, proto, mp_pose.POSE_CONNECTIONS,
+                                          mp_drawing.DrawingSpec(color=color, thickness=2, circle_radius=2))
+        return frame
+
+    def primary(self):
+        """Largest (closest) tracked person, used for the single-person stats"""
+        tracks = self.snapshot()
+        if not tracks:
+            return None
+        return max(tracks, key=lambda t: t.box[2] * t.box[3])
+
+    def stats(self):
+        return {
+            "people": {str(t.id): dict(t.session.stats(), box=list(t.box)) for t in self.snapshot()},
+            "timings": {k: round(v, 2) for k, v in self.timings.items()},
+        }
+
+    def close(self):
+        with self._lock:
+            tracks = list(self.tracks.values())
+            self.tracks.clear()
+        for track in tracks:
+            track.close()
+        self._executor.shutdown(wait=False)
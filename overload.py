@@ -0,0 +1,177 @@
+"""
+Overload Controller
+Admission control and graceful degradation against a per-session
+frame-latency SLO.
+
+Each session (the camera loop, each ingest client) reports its frame
+latency. When the worst session's p95 stays above REPBOT_LATENCY_SLO_MS for
+ESCALATE_AFTER_S, the controller moves one level down this ladder:
+
+    0 normal
+    1 stream-quality      streamed JPEGs at 3/4 size and lower quality
+    2 stream-quality-low  streamed JPEGs at 1/2 size and low quality
+    3 inference-stride    pose inference on every other frame, in addition
+    4 admission-closed    new sessions and viewers get 503 + Retry-After
+
+Existing sessions are never dropped. Load is shed from them (cheaper
+frames) and new work is refused, so they keep their frame rate. Each level
+is undone once the p95 stays below RECOVER_RATIO x SLO for RECOVER_AFTER_S.
+The gap between the escalation and recovery bands prevents flapping. After
+each level change the latency windows restart, so the next decision only
+sees frames produced at the new level.
+
+A session that stops reporting (a client that vanished without closing its
+session) is dropped after IDLE_EXPIRE_S, so its last p95 cannot hold the
+ladder up. Expiry runs on every observation and on every admission check;
+with no session left the ladder resets, as it does on ``forget``.
+"""
+import time
+import threading
+from collections import deque
+import numpy as np
+
+LEVELS = ["normal", "stream-quality", "stream-quality-low", "inference-stride", "admission-closed"]
+# (scale, max JPEG quality) of the streamed frames per level; the first
+# entry keeps the profile's settings
+STREAM_TIERS = [(1.0, 100), (0.75, 60), (0.5, 40)]
+SLO_MS = 100.0
+# Frame latencies per session used for the p95
+WINDOW_FRAMES = 60
+MIN_SAMPLES = 15
+# First frames of a session (graph start-up, warm caches) are not judged
+WARMUP_FRAMES = 10
+ESCALATE_AFTER_S = 2.0
+RECOVER_AFTER_S = 10.0
+RECOVER_RATIO = 0.6
+RETRY_AFTER_S = 15
+# Sessions without a sample for this long no longer count
+IDLE_EXPIRE_S = 5.0
+
+
+class OverloadController:
+    """Degradation level driven by ``observe(session, latency_ms)``"""
+
+    def __init__(self, slo_ms=SLO_MS, window=WINDOW_FRAMES, escalate_after=ESCALATE_AFTER_S,
+                 recover_after=RECOVER_AFTER_S, recover_ratio=RECOVER_RATIO, retry_after=RETRY_AFTER_S,
+                 idle_expire=IDLE_EXPIRE_S):
+        self.slo_ms = slo_ms
+        self.window = window
+        self.escalate_after = escalate_after
+        self.recover_after = recover_after
+        self.recover_ratio = recover_ratio
+        self.retry_after = retry_after
+        self.idle_expire = idle_expire
+        self.level = 0
+        self.refused = 0
+        self.changes = 0
+        self._samples = {}
+        self._p95 = {}
+        self._warmup = {}
+        self._last_seen = {}
+        self._breach_since = None
+        self._healthy_since = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # INPUT
+    # ------------------------------------------------------------------
+    def observe(self, session, latency_ms):
+        with self._lock:
+            now = time.monotonic()
+            self._last_seen[session] = now
+            self._expire(now)
+            skipped = self._warmup.get(session, 0)
+            if skipped < WARMUP_FRAMES:
+                self._warmup[session] = skipped + 1
+                return
+            samples = self._samples.get(session)
+            if samples is None:
+                samples = self._samples[session] = deque(maxlen=self.window)
+            samples.append(latency_ms)
+            if len(samples) >= MIN_SAMPLES:
+                self._p95[session] = float(np.percentile(samples, 95))
+                self._evaluate(now)
+
+    def forget(self, session):
+        """Drop a finished session; with none left the ladder resets"""
+        with self._lock:
+            self._drop(session)
+
+    def _drop(self, session):
+        self._samples.pop(session, None)
+        self._p95.pop(session, None)
+        self._warmup.pop(session, None)
+        self._last_seen.pop(session, None)
+        if not self._last_seen and self.level:
+            self._set_level(0)
+
+    def _expire(self, now):
+        for session in [s for s, seen in self._last_seen.items() if now - seen > self.idle_expire]:
+            print(f"⚠ Overload: session {session} idle, dropping its latency")
+            self._drop(session)
+
+    def _evaluate(self, now):
+        worst = max(self._p95.values())
+        if worst > self.slo_ms:
+            self._healthy_since = None
+            if self._breach_since is None:
+                self._breach_since = now
+            elif now - self._breach_since >= self.escalate_after and self.level < len(LEVELS) - 1:
+                self._set_level(self.level + 1)
+        elif worst < self.slo_ms * self.recover_ratio:
+            self._breach_since = None
+            if self._healthy_since is None:
+                self._healthy_since = now
+            elif now - self._healthy_since >= self.recover_after and self.level > 0:
+                self._set_level(self.level - 1)
+        else:
+            self._breach_since = self._healthy_since = None
+
+    def _set_level(self, level):
+        print(f"⚠ Overload level {LEVELS[self.level]} -> {LEVELS[level]}")
+        self.level = level
+        self.changes += 1
+        self._breach_since = self._healthy_since = None
+        for samples in self._samples.values():
+            samples.clear()
+        self._p95.clear()
+
+    # ------------------------------------------------------------------
+    # DECISIONS
+    # ------------------------------------------------------------------
+    @property
+    def stream_tier(self):
+        """(scale, max JPEG quality) for streamed frames"""
+        return STREAM_TIERS[min(self.level, len(STREAM_TIERS) - 1)]
+
+    @property
+    def stride_factor(self):
+        return 2 if self.level >= LEVELS.index("inference-stride") else 1
+
+    @property
+    def admitting(self):
+        with self._lock:
+            self._expire(time.monotonic())
+        return self.level < LEVELS.index("admission-closed")
+
+    def refuse(self):
+        """Count a refused session or viewer; returns Retry-After seconds"""
+        with self._lock:
+            self.refused += 1
+        return self.retry_after
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            p95 = {session: round(value, 1) for session, value in self._p95.items()}
+        return {
+            "level": self.level,
+            "state": LEVELS[self.level],
+            "slo_ms": self.slo_ms,
+            "p95_ms": p95,
+            "admitting": self.admitting,
+            "retry_after_s": self.retry_after,
+            "refused": self.refused,
+            "level_changes": self.changes,
+        }
+
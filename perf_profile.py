@@ -0,0 +1,206 @@
+"""
+Performance Profiles
+Named bundles of the settings that trade accuracy for speed in the capture
+loop: capture width, MediaPipe model complexity, landmark smoothing and
+confidence thresholds, inference stride (pose runs on every Nth frame), JPEG
+quality of the streamed frames and the pause between frames.
+
+select_profile() times each profile, most accurate first, on the clip in
+REPBOT_CALIBRATION_CLIP and keeps the first one that reaches the target FPS
+(REPBOT_TARGET_FPS). The clip must show a person: without one MediaPipe
+never runs its landmark model, so the timing would be optimistic. A clip in
+which nobody is detected, or no clip at all, leaves DEFAULT_PROFILE active.
+REPBOT_PROFILE names a profile and skips the calibration.
+
+Results are cached in REPBOT_CALIBRATION_CACHE, keyed on the clip, the
+target and the profile settings, so the backend only benchmarks once per
+machine. The backend calibrates when the camera first starts, not at import.
+"""
+import os
+import json
+import time
+import cv2
+
+PROFILES = {
+    "low-power": {
+        "width": 480,
+        "model_complexity": 0,
+        "smooth_landmarks": True,
+        "min_detection_confidence": 0.5,
+        "min_tracking_confidence": 0.5,
+        "inference_stride": 2,
+        "jpeg_quality": 60,
+        "frame_interval": 0.05,
+    },
+    "balanced": {
+        "width": 640,
+        "model_complexity": 1,
+        "smooth_landmarks": True,
+        "min_detection_confidence": 0.5,
+        "min_tracking_confidence": 0.5,
+        "inference_stride": 1,
+        "jpeg_quality": 80,
+        "frame_interval": 0.03,
+    },
+    "high-accuracy": {
+        "width": 960,
+        "model_complexity": 2,
+        "smooth_landmarks": True,
+        "min_detection_confidence": 0.6,
+        "min_tracking_confidence": 0.6,
+        "inference_stride": 1,
+        "jpeg_quality": 90,
+        "frame_interval": 0.01,
+    },
+}
+# Calibration order: the first profile reaching the target wins
+PROFILE_ORDER = ["high-accuracy", "balanced", "low-power"]
+DEFAULT_PROFILE = "balanced"
+AUTO_PROFILE = "auto"
+TARGET_FPS = 15.0
+CALIBRATION_FRAMES = 12
+WARMUP_FRAMES = 3
+CALIBRATION_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration.json")
+
+
+def pose_options(profile):
+    """Keyword arguments for mp.solutions.pose.Pose"""
+    return {key: profile[key] for key in ("model_complexity", "smooth_landmarks",
+                                          "min_detection_confidence", "min_tracking_confidence")}
+
+
+# Pose settings for graphs built without a profile at hand
+DEFAULT_POSE_OPTIONS = pose_options(PROFILES[DEFAULT_PROFILE])
+
+
+def fit_width(frame, width):
+    """Downscale ``frame`` to at most ``width`` pixels wide"""
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame
+    return cv2.resize(frame, (width, int(round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+
+def calibration_frames(count, clip):
+    """BGR frames from ``clip``, looped when short; empty if it cannot be read"""
+    frames = []
+    cap = cv2.VideoCapture(clip)
+    while len(frames) < count:
+        ok, frame = cap.read()
+        if not ok:
+            if not frames:
+                break
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            continue
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def measure_fps(profile, frames):
+    """(capture-loop frame rate this machine sustains with ``profile``,
+    number of frames in which a person was found)"""
+    import mediapipe as mp
+
+    quality = [cv2.IMWRITE_JPEG_QUALITY, profile["jpeg_quality"]]
+    stride = profile["inference_stride"]
+    detected = 0
+    with mp.solutions.pose.Pose(**pose_options(profile)) as pose:
+        for frame in frames[:WARMUP_FRAMES]:
+            pose.process(cv2.cvtColor(fit_width(frame, profile["width"]), cv2.COLOR_BGR2RGB))
+        start = time.perf_counter()
+        for i, frame in enumerate(frames):
+            frame = fit_width(frame, profile["width"])
+            if i % stride == 0:
+                detected += pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).pose_landmarks is not None
+            cv2.imencode(".jpg", frame, quality)
+        per_frame = (time.perf_counter() - start) / len(frames)
+    return 1.0 / (per_frame + profile["frame_interval"]), detected
+
+
+def calibrate(clip, target_fps=TARGET_FPS, frames=CALIBRATION_FRAMES):
+    """(profile name, {name: measured fps}); profiles that cannot run (e.g.
+    their model file is missing offline) are recorded as None and skipped.
+    Raises ValueError when the clip cannot be read or shows nobody"""
+    clip_frames = calibration_frames(WARMUP_FRAMES + frames, clip)
+    if not clip_frames:
+        raise ValueError(f"Cannot read calibration clip {clip}")
+    measured = {}
+    for name in PROFILE_ORDER:
+        try:
+            fps, detected = measure_fps(PROFILES[name], clip_frames)
+        except Exception as e:
+            print(f"⚠ Profile {name} failed calibration: {e}")
+            measured[name] = None
+            continue
+        if not detected:
+            raise ValueError(f"No person detected in calibration clip {clip}")
+        measured[name] = round(fps, 1)
+        if measured[name] >= target_fps:
+            return name, measured
+    # Nothing reaches the target: the fastest profile that ran
+    ran = [name for name in PROFILE_ORDER if measured[name] is not None]
+    return (max(ran, key=measured.get) if ran else DEFAULT_PROFILE), measured
+
+
+def _cache_key(clip, target_fps):
+    stat = os.stat(clip)
+    return {"clip": os.path.abspath(clip), "clip_size": stat.st_size, "clip_mtime": stat.st_mtime,
+            "target_fps": target_fps, "cpus": os.cpu_count(), "profiles": PROFILES}
+
+
+def _load_cached(path, key):
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("key") != key or cached.get("profile") not in PROFILES:
+        return None
+    return cached
+
+
+def _save_cached(path, key, name, calibration):
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"key": key, "profile": name, "calibration": calibration}, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠ Could not cache calibration: {e}")
+
+
+def select_profile(calibrate_if_auto=True):
+    """Active profile: REPBOT_PROFILE, else the calibrated one (cached or, if
+    ``calibrate_if_auto``, measured now), else the default. The dict carries
+    ``name``, the ``calibration`` result if there is one, and
+    ``calibration_pending`` when a clip is configured but not measured yet"""
+    name = os.environ.get("REPBOT_PROFILE", AUTO_PROFILE)
+    calibration, pending = None, False
+    if name == AUTO_PROFILE:
+        name = DEFAULT_PROFILE
+        clip = os.environ.get("REPBOT_CALIBRATION_CLIP")
+        if clip and os.path.isfile(clip):
+            target = float(os.environ.get("REPBOT_TARGET_FPS", TARGET_FPS))
+            cache_path = os.environ.get("REPBOT_CALIBRATION_CACHE", CALIBRATION_CACHE)
+            key = _cache_key(clip, target)
+            cached = _load_cached(cache_path, key)
+            if cached is not None:
+                name, calibration = cached["profile"], cached["calibration"]
+            elif calibrate_if_auto:
+                started = time.perf_counter()
+                try:
+                    name, measured = calibrate(clip, target)
+                    calibration = {"target_fps": target, "measured_fps": measured}
+                except ValueError as e:
+                    print(f"⚠ {e}; using the {DEFAULT_PROFILE} profile")
+                    calibration = {"target_fps": target, "error": str(e)}
+                calibration["elapsed_s"] = round(time.perf_counter() - started, 2)
+                _save_cached(cache_path, key, name, calibration)
+            else:
+                pending = True
+        elif clip:
+            print(f"⚠ Calibration clip {clip} not found; using the {DEFAULT_PROFILE} profile")
+    elif name not in PROFILES:
+        raise ValueError(f"Unknown REPBOT_PROFILE {name!r}; expected one of {', '.join(PROFILES)}")
+    return {**PROFILES[name], "name": name, "calibration": calibration, "calibration_pending": pending}
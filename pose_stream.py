@@ -0,0 +1,119 @@
+"""
+Pose Stream
+Per-frame landmarks, angles and feedback for clients that draw their own
+overlays. Two wire formats:
+
+- "json": Server-Sent Events. Landmarks are quantised to integers (1e-4 of
+  the frame, visibility in 1/100) and sent as a keyframe every
+  ``keyframe_interval`` frames; in between only the changed values are sent
+  as [flat index, delta] pairs. Angles and stats are sent only when they
+  change.
+- "binary": length-prefixed packets, see PACKET_HEADER; landmarks and
+  angles as float16, stats JSON only when it changed.
+"""
+import json
+import struct
+import threading
+import numpy as np
+
+N_POINTS = 33
+# Quantisation of x, y, z and visibility for the JSON stream
+LANDMARK_SCALE = np.array([10000, 10000, 10000, 100], dtype=np.float32)
+# Landmark deltas below this many quantisation steps are not sent
+DELTA_THRESHOLD = 3
+KEYFRAME_INTERVAL = 30
+# packet length (uint32, excluding itself), frame index (uint32),
+# timestamp (float64), has pose (uint8), stats JSON length (uint16)
+PACKET_HEADER = struct.Struct("<IIdBH")
+
+
+class PoseStreamHub:
+    """Latest pose frame plus wake-ups for any number of stream subscribers"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self.subscribers = 0
+
+    def publish(self, frame_index, timestamp, landmarks, angles, stats):
+        """``landmarks`` is a 33x4 float array or None; ``stats`` a small dict"""
+        with self._cond:
+            self._frame = (frame_index, timestamp, landmarks, angles, stats)
+            self._cond.notify_all()
+
+    def frames(self, timeout=1.0, active=lambda: True):
+        """Yield each new frame tuple (skips frames a slow reader missed)"""
+        with self._cond:
+            self.subscribers += 1
+        try:
+            last_index = None
+            while active():
+                with self._cond:
+                    self._cond.wait_for(lambda: self._frame is not None and self._frame[0] != last_index,
+                                        timeout=timeout)
+                    frame = self._frame
+                if frame is None or frame[0] == last_index:
+                    continue
+                last_index = frame[0]
+                yield frame
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+
+class DeltaJsonEncoder:
+    """Per-subscriber state for the delta-encoded JSON stream"""
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self._sent = None
+        self._angles = None
+        self._stats = None
+        self._since_key = 0
+
+    def encode(self, frame_index, timestamp, landmarks, angles, stats):
+        msg = {"f": frame_index, "t": round(timestamp, 3)}
+        if landmarks is None:
+            self._sent = None
+            msg["lm"] = None
+        else:
+            quantised = np.rint(np.asarray(landmarks, dtype=np.float32) * LANDMARK_SCALE).astype(np.int32).ravel()
+            if self._sent is None or self._since_key >= self.keyframe_interval:
+                msg["k"] = quantised.tolist()
+                self._sent = quantised
+                self._since_key = 0
+            else:
+                diff = quantised - self._sent
+                changed = np.flatnonzero(np.abs(diff) >= DELTA_THRESHOLD)
+                if changed.size:
+                    msg["d"] = np.stack([changed, diff[changed]], axis=1).ravel().tolist()
+                    self._sent[changed] = quantised[changed]
+                self._since_key += 1
+
+        if angles is not None:
+            rounded = [round(float(a), 1) for a in angles]
+            if rounded != self._angles:
+                msg["a"] = self._angles = rounded
+        if stats != self._stats:
+            msg["s"] = self._stats = stats
+        return "data: " + json.dumps(msg, separators=(",", ":")) + "\n\n"
+
+
+class BinaryEncoder:
+    """Per-subscriber state for the binary stream"""
+
+    def __init__(self):
+        self._stats = None
+
+    def encode(self, frame_index, timestamp, landmarks, angles, stats):
+        stats_bytes = b""
+        if stats != self._stats:
+            self._stats = stats
+            stats_bytes = json.dumps(stats, separators=(",", ":")).encode()
+        body = b""
+        if landmarks is not None:
+            body = (np.asarray(landmarks, dtype="<f2").tobytes()
+                    + np.asarray(angles if angles is not None else np.zeros(5), dtype="<f2").tobytes())
+        length = PACKET_HEADER.size - 4 + len(body) + len(stats_bytes)
+        return PACKET_HEADER.pack(length, frame_index, timestamp, int(landmarks is not None),
+                                  len(stats_bytes)) + body + stats_bytes
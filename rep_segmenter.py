@@ -0,0 +1,158 @@
+"""
+Rep Segmenter
+Turns a rep signal (a joint angle, see analysis_session.REP_RULES) into
+per-rep records instead of a bare counter.
+
+The thresholds of a rule split the signal into a start zone (e.g. elbow
+above 160 degrees for a curl), an end zone (below 30) and the band between
+them. A rep starts at the last frame in the start zone, turns at the most
+extreme frame of the end-zone excursion and ends at the first frame back in
+the start zone. Each record carries:
+- start, turn and end timestamps, and the duration;
+- concentric and eccentric durations;
+- min/max angle and range of motion;
+- form score, the share of frames judged correct.
+
+RepSegmenter processes one frame at a time for live sessions.
+segment_reps() segments a whole recorded signal with array operations; both
+produce the same records.
+"""
+import numpy as np
+
+# Exercises whose start -> end half is the lifting (concentric) phase; for
+# the others (squat, push-up, lunge) it is the lowering (eccentric) phase
+CONCENTRIC_FIRST = {"BICEP_CURL", "SHOULDER_PRESS", "LATERAL_RAISE"}
+# Frames of an unfinished rep kept between offline batches
+MAX_PENDING_FRAMES = 900
+
+
+def _zones(direction, high, low):
+    """(sign, start threshold, end threshold) so that, on sign * value, the
+    start zone is above the first threshold and the end zone below the second"""
+    return (1.0, high, low) if direction == "down" else (-1.0, -low, -high)
+
+
+def _record(exercise, start, turn, end, low_value, high_value, correct, frames):
+    first, second = turn - start, end - turn
+    concentric, eccentric = (first, second) if exercise in CONCENTRIC_FIRST else (second, first)
+    return {
+        "exercise": exercise,
+        "start": round(float(start), 3),
+        "turn": round(float(turn), 3),
+        "end": round(float(end), 3),
+        "duration_s": round(float(end - start), 3),
+        "concentric_s": round(float(concentric), 3),
+        "eccentric_s": round(float(eccentric), 3),
+        "min_angle": round(float(low_value), 1),
+        "max_angle": round(float(high_value), 1),
+        "range_of_motion": round(float(high_value - low_value), 1),
+        "form_score": round(float(correct) / max(int(frames), 1), 3),
+    }
+
+
+class RepSegmenter:
+    """Online segmentation of one exercise's rep signal"""
+
+    def __init__(self, exercise, rule):
+        signal, high, low, direction = rule
+        self.exercise = exercise
+        self.signal = signal
+        self.sign, self.start_threshold, self.end_threshold = _zones(direction, high, low)
+        self.stage = None
+        self.count = 0
+        self._rep = None
+
+    def reset(self):
+        self.stage = None
+        self.count = 0
+        self._rep = None
+
+    def update(self, timestamp, value, form_correct=True):
+        """Feed one frame; returns the record of a rep completed by it, else None"""
+        s = self.sign * value
+        record = None
+        if s > self.start_threshold:
+            if self.stage == "end" and self._rep is not None:
+                self._track(timestamp, value, s, form_correct)
+                rep = self._rep
+                self.count += 1
+                record = _record(self.exercise, rep["start"], rep["turn"], timestamp,
+                                 rep["min"], rep["max"], rep["correct"], rep["frames"])
+            self.stage = "start"
+            # Still at rest: the rep begins at the last frame in this zone
+            self._rep = {"start": timestamp, "turn": timestamp, "extreme": s,
+                         "min": value, "max": value, "correct": int(form_correct), "frames": 1}
+            return record
+
+        if self._rep is not None:
+            self._track(timestamp, value, s, form_correct)
+        if s < self.end_threshold:
+            # Without a start-zone frame first (no rep in progress) the next
+            # return to the start zone does not count
+            self.stage = "end"
+        return None
+
+    def _track(self, timestamp, value, s, form_correct):
+        rep = self._rep
+        rep["min"], rep["max"] = min(rep["min"], value), max(rep["max"], value)
+        rep["correct"] += int(form_correct)
+        rep["frames"] += 1
+        if s < rep["extreme"]:
+            rep["extreme"], rep["turn"] = s, timestamp
+
+
+def segment_reps(exercise, rule, timestamps, values, form_correct=None):
+    """Offline segmentation of a whole signal
+
+    Returns (records, end frame index of each record, pending): ``pending``
+    is the index where an unfinished rep (or the last rest frame) begins;
+    prepend ``[pending:]`` to the next batch to carry it over.
+    """
+    _, high, low, direction = rule
+    ts = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return [], np.empty(0, dtype=np.intp), 0
+    correct = np.ones(n, dtype=np.int64) if form_correct is None else np.asarray(form_correct, dtype=np.int64)
+    sign, start_threshold, end_threshold = _zones(direction, high, low)
+    s = sign * values
+
+    # Zone per frame (1 start, -1 end, 0 band) forward-filled across the band;
+    # last_mark[i] is the last frame <= i inside a zone
+    marks = np.where(s > start_threshold, 1, np.where(s < end_threshold, -1, 0))
+    last_mark = np.where(marks != 0, np.arange(n), -1)
+    np.maximum.accumulate(last_mark, out=last_mark)
+    filled = np.where(last_mark >= 0, marks[np.maximum(last_mark, 0)], 0)
+    previous = np.concatenate([[0], filled[:-1]])
+
+    descents = np.flatnonzero((previous == 1) & (filled == -1))
+    returns = np.flatnonzero((previous == -1) & (filled == 1))
+    # Zone changes alternate; a return before the first descent closes a rep
+    # that started outside this signal and does not count
+    if len(returns) and (not len(descents) or returns[0] < descents[0]):
+        returns = returns[1:]
+    starts = last_mark[descents[:len(returns)] - 1]
+    ends = returns
+
+    records = []
+    if len(ends):
+        # Per-rep min/max/correct frames over [start, end] in one reduceat each
+        bounds = np.stack([starts, ends + 1], axis=1).ravel()
+        padded = np.append(values, values[-1])
+        low_values = np.minimum.reduceat(padded, bounds)[::2]
+        high_values = np.maximum.reduceat(padded, bounds)[::2]
+        correct_frames = np.add.reduceat(np.append(correct, 0), bounds)[::2]
+        for start, end, lo, hi, ok in zip(starts, ends, low_values, high_values, correct_frames):
+            turn = start + int(np.argmin(s[start:end + 1]))
+            records.append(_record(exercise, ts[start], ts[turn], ts[end], lo, hi, ok, end - start + 1))
+
+    if len(descents) > len(ends):
+        pending = int(last_mark[descents[len(ends)] - 1])
+    elif filled[-1] == 1:
+        pending = int(last_mark[-1])
+    elif filled[-1] == -1:
+        pending = n
+    else:
+        pending = 0
+    return records, ends, max(pending, n - MAX_PENDING_FRAMES)
@@ -0,0 +1,174 @@
+"""
+Resource Manager
+Splits the machine's cores between the HTTP layer and the analysis
+sessions, so that OpenCV, MediaPipe, the BLAS/OpenMP pools and the request
+threads stop oversubscribing the CPU.
+
+- The first REPBOT_HTTP_CORES cores (default 1 on machines with 4 or more)
+  are reserved for HTTP request threads.
+- Every session (camera, ingest client, video upload) gets
+  REPBOT_SESSION_CORES of the remaining cores, least used first. Sessions
+  share cores only once every core has one.
+- A session's threads are pinned to its cores. Threads they start inherit
+  the set, which includes MediaPipe's calculator threads when the Pose
+  graph is built on a pinned thread.
+- OpenCV, BLAS and OpenMP pools are sized to one session's core count.
+
+Pinning uses sched_setaffinity (Linux). Elsewhere, or with
+REPBOT_PIN_CORES=0, only the thread counts are applied.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS")
+# Utilisation reports closer together than this reuse the previous one
+REPORT_MIN_INTERVAL_S = 0.5
+
+
+def available_cores():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+CORES = available_cores()
+HTTP_CORES = int(os.environ.get("REPBOT_HTTP_CORES", 1 if len(CORES) >= 4 else 0))
+SESSION_CORES = int(os.environ.get("REPBOT_SESSION_CORES", 2 if len(CORES) - HTTP_CORES >= 4 else 1))
+PIN_CORES = os.environ.get("REPBOT_PIN_CORES", "1") == "1" and hasattr(os, "sched_setaffinity")
+
+
+def limit_native_threads(threads=SESSION_CORES):
+    """Size the BLAS/OpenMP pools; they read these variables when NumPy (or
+    torch) loads, so call this before importing them. Values already set in
+    the environment win"""
+    for var in THREAD_ENV_VARS:
+        os.environ.setdefault(var, str(threads))
+
+
+def _cpu_times():
+    """{core: (busy, total)} jiffies from /proc/stat; empty where unavailable"""
+    times = {}
+    try:
+        with open("/proc/stat") as f:
+            for line in f:
+                if not line.startswith("cpu") or line.startswith("cpu "):
+                    continue
+                name, *fields = line.split()
+                values = [int(v) for v in fields[:8]]
+                idle = values[3] + values[4]
+                times[int(name[3:])] = (sum(values) - idle, sum(values))
+    except OSError:
+        pass
+    return times
+
+
+class ResourceManager:
+    """Core sets for the HTTP layer and each analysis session"""
+
+    def __init__(self, cores=None, http_cores=HTTP_CORES, session_cores=SESSION_CORES, pin=PIN_CORES):
+        cores = list(cores or CORES)
+        # At least one core is always left for the sessions
+        http_cores = max(0, min(http_cores, len(cores) - 1))
+        self.http_cores = cores[:http_cores]
+        self.worker_cores = cores[http_cores:]
+        self.session_cores = max(1, min(session_cores, len(self.worker_cores)))
+        self.pin_enabled = pin
+        self.assignments = {}
+        self._load = {core: 0 for core in self.worker_cores}
+        self._lock = threading.Lock()
+        self._last_times = _cpu_times()
+        self._last_report_at = time.monotonic()
+        self._utilisation = {}
+
+    def configure(self):
+        """Size OpenCV's pool (process wide) to one session's cores"""
+        import cv2
+        cv2.setNumThreads(self.session_cores)
+
+    # ------------------------------------------------------------------
+    # ASSIGNMENT
+    # ------------------------------------------------------------------
+    def acquire(self, name):
+        """Core set for session ``name``: the least loaded worker cores"""
+        with self._lock:
+            if name in self.assignments:
+                return self.assignments[name]
+            cores = tuple(sorted(sorted(self._load, key=lambda core: (self._load[core], core))
+                                 [:self.session_cores]))
+            for core in cores:
+                self._load[core] += 1
+            self.assignments[name] = cores
+            return cores
+
+    def release(self, name):
+        with self._lock:
+            for core in self.assignments.pop(name, ()):
+                self._load[core] -= 1
+
+    # ------------------------------------------------------------------
+    # PINNING (calling thread only)
+    # ------------------------------------------------------------------
+    def pin(self, cores):
+        """Pin the calling thread to ``cores``; returns its previous set"""
+        if not self.pin_enabled or not cores:
+            return None
+        previous = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, cores)
+        return previous
+
+    @contextmanager
+    def pinned(self, cores):
+        previous = self.pin(cores)
+        try:
+            yield cores
+        finally:
+            if previous is not None:
+                os.sched_setaffinity(0, previous)
+
+    @contextmanager
+    def session(self, name):
+        """Acquire a core set and pin the calling thread to it meanwhile"""
+        cores = self.acquire(name)
+        try:
+            with self.pinned(cores):
+                yield cores
+        finally:
+            self.release(name)
+
+    def reserve_http(self):
+        """Pin the calling thread (and the request threads it will start) to
+        the HTTP cores"""
+        self.pin(self.http_cores)
+
+    # ------------------------------------------------------------------
+    # REPORT
+    # ------------------------------------------------------------------
+    def report(self, assignments=None):
+        """Per-core role, sessions and utilisation (percent busy since the
+        previous report)"""
+        now = time.monotonic()
+        if now - self._last_report_at >= REPORT_MIN_INTERVAL_S:
+            times = _cpu_times()
+            self._utilisation = {
+                core: round(100.0 * (busy - self._last_times[core][0])
+                            / max(total - self._last_times[core][1], 1), 1)
+                for core, (busy, total) in times.items() if core in self._last_times
+            }
+            self._last_times, self._last_report_at = times, now
+        assignments = self.assignments if assignments is None else assignments
+        return {
+            "http_cores": list(self.http_cores),
+            "session_cores": self.session_cores,
+            "pinning": self.pin_enabled,
+            "sessions": {name: list(cores) for name, cores in assignments.items()},
+            "cores": [{
+                "core": core,
+                "role": "http" if core in self.http_cores else "sessions",
+                "sessions": [name for name, cores in assignments.items() if core in cores],
+                "utilisation": self._utilisation.get(core),
+            } for core in self.http_cores + self.worker_cores],
+        }
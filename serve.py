@@ -0,0 +1,440 @@
+"""
+RepBot Production Server
+Capture and inference run in a dedicated worker process; a multi-worker WSGI
+front end (gunicorn on Linux/macOS, waitress elsewhere) serves the API and
+MJPEG streams from a shared-memory frame channel.
+
+Commands, history queries and model listings are forwarded to the capture
+worker. Landmark batches are scored in the HTTP workers on the model version
+the capture worker reports; only batches of a keyed session, whose rep state
+must stay in one process, are forwarded. Remote frame ingestion (/api/ingest/...) and video
+uploads (/api/video/analyze, /detect) stream their bodies into a MediaPipe
+session of their own and are only served by the development server
+(python app.py); here they answer 501.
+
+Usage:
+    python serve.py --workers 4 --threads 8 --port 5000
+"""
+import os
+import hmac
+import time
+import uuid
+import queue
+import argparse
+import threading
+import multiprocessing as mp
+import numpy as np
+
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+
+from frame_channel import FrameChannel
+from pose_stream import BinaryEncoder, DeltaJsonEncoder
+from resource_manager import ResourceManager
+from exercises import EXERCISES, AUTO_MODE, normalize_exercise
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Same model store and lookup-table setting as app.py
+MODELS_DIR = os.environ.get("REPBOT_MODELS_DIR", os.path.join(BASE_DIR, "models"))
+LOOKUP_RESOLUTION = float(os.environ.get("REPBOT_LOOKUP_RESOLUTION", 0)) or None
+STREAM_POLL_S = 0.01
+COMMAND_TIMEOUT_S = 5.0
+EVENT_POLL_S = 0.1
+EVENT_WAIT_MAX_S = 30.0
+# Landmark batch bodies go through the command queue
+MAX_LANDMARK_BATCH_BYTES = 8 * 1024 * 1024
+
+# -------------------------------------------------------------------
+# CAPTURE / INFERENCE WORKER PROCESS
+# -------------------------------------------------------------------
+def capture_worker(channel_name, commands, replies):
+    """Owns the camera, MediaPipe and the models; publishes to the channel"""
+    import app as backend
+
+    channel = FrameChannel(channel_name)
+    backend.frame_publisher = channel.publish
+    # Frames are only drawn and encoded while an HTTP worker streams them
+    backend.remote_viewers = channel.viewers
+    channel.publish(b"", backend.stats_payload())
+    print("✓ Capture worker ready")
+
+    while True:
+        request_id, command, payload = commands.get()
+        reply = {"status": "success"}
+        try:
+            if command == "shutdown":
+                backend.stop_capture()
+                break
+            elif command == "start_camera":
+                if not backend.camera_running and not backend.overload.admitting:
+                    reply = {"status": "error", "message": "Server overloaded, retry later",
+                             "retry_after": backend.overload.refuse()}
+                else:
+                    started = backend.start_capture(payload)
+                    reply["message"] = "Camera started" if started else "Camera already running"
+            elif command == "stop_camera":
+                backend.stop_capture()
+                reply["message"] = "Camera stopped"
+            elif command == "reset_counters":
+                backend.reset_all_counters()
+                reply["message"] = "Counters reset"
+            elif command == "set_exercise":
+                reply["exercise"] = backend.select_exercise(payload)
+            elif command == "reload_model":
+                reply["data"] = backend.model_registry.load(payload).info()
+            elif command == "list_models":
+                reply["data"] = backend.models_info()
+            elif command == "history":
+                if backend.session_store is None:
+                    reply = {"status": "error", "message": "Session store disabled", "code": 503}
+                else:
+                    name, args, session_id = payload
+                    reply["data"] = backend.history_query(name, args, session_id)
+            elif command == "landmark_batch":
+                if not backend.ML_PIPELINE_AVAILABLE:
+                    reply = {"status": "error", "message": "ML Pipeline not available", "code": 503}
+                else:
+                    reply["data"] = backend.analyze_landmarks(*payload)
+            # Idle frames still need fresh stats for pollers
+            if not backend.camera_running:
+                channel.publish(b"", backend.stats_payload())
+        except Exception as e:
+            reply = {"status": "error", "message": str(e)}
+        replies.put((request_id, reply))
+    channel.close()
+
+# -------------------------------------------------------------------
+# HTTP LAYER (NO CAMERA; MODELS ONLY FOR LANDMARK BATCHES)
+# -------------------------------------------------------------------
+def create_http_app(channel_name, commands, replies, command_lock, viewer_lock):
+    http = Flask(__name__)
+    CORS(http)
+    channel = FrameChannel(channel_name, viewer_lock=viewer_lock)
+    # Same split as the capture worker's; it reports the session core sets
+    resources = ResourceManager()
+
+    def send_command(command, payload=None):
+        # One outstanding command at a time across the front-end processes.
+        # A reply that arrives after its caller timed out is still in the
+        # queue; the request id lets the next caller discard it
+        request_id = uuid.uuid4().hex
+        with command_lock:
+            commands.put((request_id, command, payload))
+            deadline = time.monotonic() + COMMAND_TIMEOUT_S
+            while True:
+                try:
+                    reply_id, reply = replies.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    return {"status": "error", "message": "Capture worker not responding", "code": 504}
+                if reply_id == request_id:
+                    return reply
+
+    analyzer = None
+    analyzer_lock = threading.Lock()
+
+    def batch_analyzer():
+        """This worker's LandmarkBatchAnalyzer on the capture worker's model
+        version, or None without the ML pipeline"""
+        nonlocal analyzer
+        _, _, stats = channel.read()
+        version = (stats or {}).get("model_version")
+        with analyzer_lock:
+            if analyzer is None:
+                try:
+                    from landmark_batch import LandmarkBatchAnalyzer
+                    from model_registry import ModelRegistry
+                    registry = ModelRegistry(MODELS_DIR, legacy_dir=BASE_DIR,
+                                             lookup_resolution=LOOKUP_RESOLUTION)
+                    analyzer = LandmarkBatchAnalyzer(EXERCISES, registry)
+                except Exception as e:
+                    print("⚠ ML Pipeline not available:", e)
+                    analyzer = False
+            if not analyzer:
+                return None
+            current = analyzer.model_registry.current
+            if version and (current is None or current.version != version):
+                try:
+                    analyzer.model_registry.load(version)
+                except Exception as e:
+                    # The registry keeps the previous bundle
+                    print(f"⚠ Landmark batches stay on the previous model: {e}")
+        return analyzer
+
+    def reply_json(reply):
+        if "retry_after" in reply:
+            return jsonify(reply), 503, {"Retry-After": str(reply["retry_after"])}
+        code = reply.pop("code", None)
+        return jsonify(reply), code or (200 if reply.get("status") == "success" else 400)
+
+    def dev_server_only():
+        return jsonify({"status": "error", "message": "Not available in production mode; "
+                                                     "run the development server (python app.py)"}), 501
+
+    def generate_frames():
+        # The capture worker encodes frames only while this count is positive
+        channel.add_viewer("frames")
+        try:
+            last_index = None
+            while True:
+                if channel.sequence() == last_index:
+                    time.sleep(STREAM_POLL_S)
+                    continue
+                view = channel.latest()
+                if view is None:
+                    time.sleep(STREAM_POLL_S)
+                    continue
+                last_index = view.index
+                # The socket write needs one copy; build it straight from the slot
+                chunk = b"".join((b"--frame\r\nContent-Type: image/jpeg\r\n\r\n", view.frame, b"\r\n"))
+                valid, empty = view.valid(), not len(view.frame)
+                view.release()
+                if valid and not empty:
+                    yield chunk
+        finally:
+            channel.add_viewer("frames", -1)
+
+    def generate_poses(encoder):
+        # Landmarks come from the slot, angles and feedback from its stats
+        channel.add_viewer("pose")
+        try:
+            last_index = None
+            while True:
+                if channel.sequence() == last_index:
+                    time.sleep(STREAM_POLL_S)
+                    continue
+                view = channel.latest()
+                if view is None:
+                    time.sleep(STREAM_POLL_S)
+                    continue
+                last_index, timestamp = view.index, view.timestamp
+                landmarks = None if view.landmarks is None else view.landmarks.copy()
+                stats = view.stats()
+                valid = view.valid()
+                view.release()
+                pose = stats.get("pose")
+                # Idle stats records (camera stopped) carry no pose
+                if not valid or pose is None:
+                    continue
+                angles = None if pose["angles"] is None else np.array(pose["angles"], dtype=np.float32)
+                yield encoder.encode(last_index, timestamp, landmarks, angles, pose["stats"])
+        finally:
+            channel.add_viewer("pose", -1)
+
+    def refused_while_overloaded():
+        """503 reply for new viewers while the capture worker sheds load"""
+        _, _, stats = channel.read()
+        state = (stats or {}).get("overload") or {}
+        if not state.get("admitting", True):
+            return reply_json({"status": "error", "message": "Server overloaded, retry later",
+                               "retry_after": state["retry_after_s"]})
+        return None
+
+    @http.route("/")
+    def index():
+        return jsonify({"status": "RepBot Backend", "mode": "production", "pid": os.getpid()})
+
+    @http.route("/video_feed")
+    def video_feed():
+        return refused_while_overloaded() or Response(
+            generate_frames(), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+    @http.route("/api/pose_stream")
+    def pose_stream():
+        """Landmarks, angles and feedback per frame (see pose_stream.py)"""
+        refused = refused_while_overloaded()
+        if refused is not None:
+            return refused
+        if request.args.get("format") == "binary":
+            encoder, mimetype = BinaryEncoder(), "application/octet-stream"
+        else:
+            encoder, mimetype = DeltaJsonEncoder(), "text/event-stream"
+        return Response(generate_poses(encoder), mimetype=mimetype, headers={"Cache-Control": "no-cache"})
+
+    @http.route("/api/get_stats")
+    def get_stats():
+        _, _, stats = channel.read()
+        return jsonify({"status": "success", "data": stats})
+
+    @http.route("/api/resources")
+    def get_resources():
+        _, _, stats = channel.read()
+        return jsonify({"status": "success", "data": resources.report((stats or {}).get("core_sets", {}))})
+
+    @http.route("/api/events")
+    def feedback_events():
+        # The capture worker attaches its latest events to every stats record;
+        # poll the ring until one newer than ``since`` shows up
+        since = request.args.get("since", 0, type=int)
+        deadline = time.monotonic() + min(max(request.args.get("timeout", 25.0, type=float), 0.0),
+                                          EVENT_WAIT_MAX_S)
+        while True:
+            _, _, stats = channel.read()
+            seq = (stats or {}).get("event_seq", 0)
+            if since > seq:
+                since = 0
+            if seq > since or time.monotonic() >= deadline:
+                events = [e for e in (stats or {}).get("events", []) if e["seq"] > since]
+                return jsonify({"status": "success", "seq": seq, "events": events})
+            time.sleep(EVENT_POLL_S)
+
+    @http.route("/api/start_camera", methods=["POST"])
+    def start_camera():
+        return reply_json(send_command("start_camera", (request.get_json(silent=True) or {}).get("user")))
+
+    @http.route("/api/stop_camera", methods=["POST"])
+    def stop_camera():
+        return reply_json(send_command("stop_camera"))
+
+    @http.route("/api/reset_counters", methods=["POST"])
+    def reset_counters():
+        return reply_json(send_command("reset_counters"))
+
+    @http.route("/api/set_exercise", methods=["POST"])
+    def set_exercise():
+        exercise = (request.get_json(silent=True) or {}).get("exercise", "auto")
+        return reply_json(send_command("set_exercise", exercise))
+
+    @http.route("/api/history/sessions")
+    def history_sessions():
+        return reply_json(send_command("history", ("sessions", request.args.to_dict(), None)))
+
+    @http.route("/api/history/reps")
+    def history_reps():
+        return reply_json(send_command("history", ("reps", request.args.to_dict(), None)))
+
+    @http.route("/api/history/rep_series")
+    def history_rep_series():
+        return reply_json(send_command("history", ("rep_series", request.args.to_dict(), None)))
+
+    @http.route("/api/history/sessions/<session_id>")
+    def history_session(session_id):
+        return reply_json(send_command("history", ("session", request.args.to_dict(), session_id)))
+
+    @http.route("/api/history/angles")
+    def history_angles():
+        return reply_json(send_command("history", ("angles", request.args.to_dict(), None)))
+
+    @http.route("/api/landmarks/batch", methods=["POST"])
+    def landmark_batch():
+        if (request.content_length or 0) > MAX_LANDMARK_BATCH_BYTES:
+            return jsonify({"status": "error", "message": "Batch too large"}), 413
+        body = request.get_data(cache=False)
+        if len(body) > MAX_LANDMARK_BATCH_BYTES:
+            return jsonify({"status": "error", "message": "Batch too large"}), 413
+        exercise = normalize_exercise(request.args.get("exercise", AUTO_MODE))
+        session = request.args.get("session")
+        if session is not None:
+            # Rep counts carry over between a session's batches, so they all
+            # go to the one process that holds them
+            return reply_json(send_command("landmark_batch", (body, exercise, session)))
+
+        analyzer = batch_analyzer()
+        if analyzer is None:
+            return jsonify({"status": "error", "message": "ML Pipeline not available"}), 503
+        from landmark_batch import parse_batch
+        try:
+            timestamps, landmarks = parse_batch(body)
+            result = analyzer.analyze(timestamps, landmarks, exercise)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify({"status": "success", "data": result})
+
+    @http.route("/api/ingest/sessions", methods=["GET", "POST"])
+    @http.route("/api/ingest/sessions/<session_id>", methods=["GET", "DELETE"])
+    @http.route("/api/ingest/sessions/<session_id>/frames", methods=["POST"])
+    @http.route("/api/video/analyze", methods=["POST"])
+    @http.route("/detect", methods=["POST"])
+    def streaming_upload(session_id=None):
+        return dev_server_only()
+
+    @http.route("/api/admin/models")
+    def list_models():
+        return reply_json(send_command("list_models"))
+
+    @http.route("/api/admin/reload_model", methods=["POST"])
+    def reload_model():
+        token = os.environ.get("REPBOT_ADMIN_TOKEN")
+        # Without a configured token the route is disabled, not open
+        if not token:
+            return jsonify({"status": "error", "message": "Model reload disabled (set REPBOT_ADMIN_TOKEN)"}), 403
+        if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token):
+            return jsonify({"status": "error", "message": "Unauthorized"}), 401
+        version = (request.get_json(silent=True) or {}).get("version")
+        return reply_json(send_command("reload_model", version))
+
+    return http
+
+# -------------------------------------------------------------------
+# FRONT ENDS
+# -------------------------------------------------------------------
+def run_gunicorn(app_factory, host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class StandaloneApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            # Threads keep long-lived MJPEG streams from starving API requests
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("threads", threads)
+            self.cfg.set("timeout", 0)
+
+        def load(self):
+            return app_factory()
+
+    StandaloneApplication().run()
+
+
+def run_waitress(app_factory, host, port, threads):
+    from waitress import serve
+    serve(app_factory(), host=host, port=port, threads=threads)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RepBot production server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=max(2, (os.cpu_count() or 2) // 2),
+                        help="HTTP worker processes (gunicorn only)")
+    parser.add_argument("--threads", type=int, default=8, help="threads per HTTP worker")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "waitress"], default="auto")
+    args = parser.parse_args(argv)
+
+    # Channel and queues exist before the HTTP workers fork, so every worker
+    # inherits them; the capture worker attaches by name
+    channel = FrameChannel(create=True)
+    ctx = mp.get_context("spawn")
+    commands, replies = ctx.Queue(), ctx.Queue()
+    command_lock = ctx.Lock()
+    viewer_lock = ctx.Lock()
+    worker = ctx.Process(target=capture_worker, args=(channel.name, commands, replies), daemon=True)
+    worker.start()
+    # The capture worker keeps every core; this process and the HTTP
+    # workers it forks (or waitress' threads) use the reserved ones
+    ResourceManager().reserve_http()
+
+    def app_factory():
+        return create_http_app(channel.name, commands, replies, command_lock, viewer_lock)
+
+    server = args.server
+    if server == "auto":
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:
+            server = "waitress"
+
+    print(f"RepBot production server ({server}) on http://{args.host}:{args.port}")
+    try:
+        if server == "gunicorn":
+            run_gunicorn(app_factory, args.host, args.port, args.workers, args.threads)
+        else:
+            run_waitress(app_factory, args.host, args.port, args.workers * args.threads)
+    finally:
+        commands.put((None, "shutdown", None))
+        worker.join(timeout=5)
+        channel.close()
+
+
+if __name__ == "__main__":
+    main()
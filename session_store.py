@@ -0,0 +1,490 @@
+"""
+Session Store
+Durable workout history in an embedded SQLite database (WAL mode).
+
+Writes (sessions starting/ending, reps with their metrics, per-frame joint
+angles) are queued and applied by one background thread, many per
+transaction, so the frame loop never waits on disk. Reads use their own
+per-thread connections; with WAL they do not block the writer.
+
+The same transactions keep rollups up to date: angle statistics per
+second/minute/hour and per session, rep totals per minute/hour/day and per
+session. History and chart queries read the coarsest table that still has
+enough detail, so their cost does not grow with the amount of history.
+"""
+import os
+import time
+import queue
+import sqlite3
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from downsample import lttb, downsample_series
+
+# Joint angles stored per frame (ml_pipeline.ANGLE_NAMES order)
+SAMPLE_ANGLES = ("left_arm", "right_arm", "left_leg", "right_leg", "torso")
+# Rollup bucket sizes in seconds
+ANGLE_RESOLUTIONS = (1, 60, 3600)
+REP_RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+# Rows a chart query may read before LTTB; the finest tier under it is used
+CHART_SOURCE_ROWS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    exercise TEXT,
+    started_at REAL NOT NULL,
+    ended_at REAL
+);
+CREATE TABLE IF NOT EXISTS reps (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    user_id TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    rep_number INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    duration_s REAL,
+    min_angle REAL,
+    max_angle REAL,
+    form_correct INTEGER,
+    form_score REAL,
+    start_ts REAL,
+    concentric_s REAL,
+    eccentric_s REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_time ON sessions(user_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_reps_user_exercise_time ON reps(user_id, exercise, ts);
+CREATE INDEX IF NOT EXISTS idx_reps_exercise_time ON reps(exercise, ts);
+CREATE INDEX IF NOT EXISTS idx_reps_session ON reps(session_id, exercise, rep_number);
+CREATE TABLE IF NOT EXISTS angle_samples (
+    session_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    exercise TEXT,
+    {sample_columns}
+);
+CREATE INDEX IF NOT EXISTS idx_samples_session_time ON angle_samples(session_id, ts);
+CREATE INDEX IF NOT EXISTS idx_samples_user_time ON angle_samples(user_id, ts);
+CREATE TABLE IF NOT EXISTS angle_rollups (
+    resolution INTEGER NOT NULL,
+    bucket REAL NOT NULL,
+    session_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    {rollup_columns},
+    PRIMARY KEY (resolution, session_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_angle_rollups_user ON angle_rollups(resolution, user_id, bucket);
+CREATE TABLE IF NOT EXISTS rep_rollups (
+    resolution INTEGER NOT NULL,
+    bucket REAL NOT NULL,
+    user_id TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    reps INTEGER NOT NULL,
+    correct_reps INTEGER NOT NULL,
+    duration_sum REAL NOT NULL,
+    form_score_sum REAL NOT NULL,
+    PRIMARY KEY (resolution, user_id, exercise, bucket)
+);
+CREATE TABLE IF NOT EXISTS session_rollups (
+    session_id TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    reps INTEGER NOT NULL,
+    correct_reps INTEGER NOT NULL,
+    duration_sum REAL NOT NULL,
+    form_score_sum REAL NOT NULL,
+    min_angle REAL,
+    max_angle REAL,
+    first_ts REAL NOT NULL,
+    last_ts REAL NOT NULL,
+    PRIMARY KEY (session_id, exercise)
+);
+""".format(
+    sample_columns=",\n    ".join(f"{a} REAL" for a in SAMPLE_ANGLES),
+    rollup_columns=",\n    ".join(f"{a}_{agg} REAL" for a in SAMPLE_ANGLES for agg in ("sum", "min", "max")),
+)
+
+# Column order of a rep row (see record_rep)
+REP_COLUMNS = ("session_id", "user_id", "exercise", "rep_number", "ts", "duration_s",
+               "min_angle", "max_angle", "form_correct", "form_score", "start_ts", "concentric_s",
+               "eccentric_s")
+# Columns added after the first release, created on older databases
+REP_MIGRATIONS = {"start_ts": "REAL", "concentric_s": "REAL", "eccentric_s": "REAL"}
+
+_SQL = {
+    "start": "INSERT OR IGNORE INTO sessions (id, user_id, source, exercise, started_at) VALUES (?, ?, ?, ?, ?)",
+    "end": "UPDATE sessions SET ended_at = ? WHERE id = ? AND ended_at IS NULL",
+    "rep": f"INSERT INTO reps ({', '.join(REP_COLUMNS)}) VALUES ({', '.join('?' * len(REP_COLUMNS))})",
+    "sample": (f"INSERT INTO angle_samples (session_id, user_id, ts, exercise, {', '.join(SAMPLE_ANGLES)}) "
+               f"VALUES ({', '.join('?' * (4 + len(SAMPLE_ANGLES)))})"),
+}
+
+# Incremental rollup updates: add the batch's aggregate to the stored one
+_ANGLE_AGGS = [f"{a}_{agg}" for a in SAMPLE_ANGLES for agg in ("sum", "min", "max")]
+_ROLLUP_SQL = {
+    "angle": (
+        f"INSERT INTO angle_rollups (resolution, bucket, session_id, user_id, n, {', '.join(_ANGLE_AGGS)}) "
+        f"VALUES ({', '.join('?' * (5 + len(_ANGLE_AGGS)))}) "
+        "ON CONFLICT (resolution, session_id, bucket) DO UPDATE SET n = n + excluded.n, "
+        + ", ".join(f"{c} = {c} + excluded.{c}" if c.endswith("_sum") else
+                    f"{c} = {'MIN' if c.endswith('_min') else 'MAX'}({c}, excluded.{c})" for c in _ANGLE_AGGS)),
+    "rep": (
+        "INSERT INTO rep_rollups (resolution, bucket, user_id, exercise, reps, correct_reps, duration_sum, "
+        "form_score_sum) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (resolution, user_id, exercise, bucket) DO UPDATE SET reps = reps + excluded.reps, "
+        "correct_reps = correct_reps + excluded.correct_reps, "
+        "duration_sum = duration_sum + excluded.duration_sum, "
+        "form_score_sum = form_score_sum + excluded.form_score_sum"),
+    "session": (
+        "INSERT INTO session_rollups (session_id, exercise, reps, correct_reps, duration_sum, form_score_sum, "
+        "min_angle, max_angle, first_ts, last_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (session_id, exercise) DO UPDATE SET reps = reps + excluded.reps, "
+        "correct_reps = correct_reps + excluded.correct_reps, "
+        "duration_sum = duration_sum + excluded.duration_sum, "
+        "form_score_sum = form_score_sum + excluded.form_score_sum, "
+        "min_angle = MIN(COALESCE(min_angle, excluded.min_angle), COALESCE(excluded.min_angle, min_angle)), "
+        "max_angle = MAX(COALESCE(max_angle, excluded.max_angle), COALESCE(excluded.max_angle, max_angle)), "
+        "first_ts = MIN(first_ts, excluded.first_ts), last_ts = MAX(last_ts, excluded.last_ts)"),
+}
+
+
+class SessionStore:
+    """SQLite history with a batching background writer
+
+    Session ids are generated by the caller, so starting a session is just
+    another queued write.
+    """
+
+    def __init__(self, path, batch_size=512, flush_interval=0.5, max_queue=50000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.transactions = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._local = threading.local()
+        self._stop = threading.Event()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        existing = {row["name"] for row in self._writer.execute("PRAGMA table_info(reps)")}
+        for column, kind in REP_MIGRATIONS.items():
+            if column not in existing:
+                self._writer.execute(f"ALTER TABLE reps ADD COLUMN {column} {kind}")
+        self._writer.commit()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL makes NORMAL durable against application crashes; only a power
+        # loss can drop the last transactions
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ------------------------------------------------------------------
+    # WRITES (never block)
+    # ------------------------------------------------------------------
+    def _put(self, kind, params):
+        try:
+            self._queue.put_nowait((kind, params))
+        except queue.Full:
+            self.rows_dropped += 1
+
+    def start_session(self, session_id, user_id, source, exercise=None, started_at=None):
+        self._put("start", (session_id, user_id, source, exercise,
+                            time.time() if started_at is None else started_at))
+        return session_id
+
+    def end_session(self, session_id, ended_at=None):
+        self._put("end", (time.time() if ended_at is None else ended_at, session_id))
+
+    def record_rep(self, session_id, user_id, exercise, rep_number, ts=None, duration_s=None,
+                   min_angle=None, max_angle=None, form_correct=None, form_score=None,
+                   concentric_s=None, eccentric_s=None):
+        """One completed rep (rep_segmenter record fields); ``ts`` is its end"""
+        ts = time.time() if ts is None else ts
+        self._put("rep", (session_id, user_id, exercise, rep_number, ts, duration_s, min_angle, max_angle,
+                          None if form_correct is None else int(bool(form_correct)), form_score,
+                          None if duration_s is None else ts - duration_s, concentric_s, eccentric_s))
+
+    def record_angles(self, session_id, user_id, angles, exercise=None, ts=None):
+        """One frame of SAMPLE_ANGLES (degrees)"""
+        self._put("sample", (session_id, user_id, time.time() if ts is None else ts, exercise,
+                             *(float(a) for a in angles)))
+
+    def record_event(self, session_id, user_id, event):
+        """Store a FeedbackEngine event; only reps are kept"""
+        if event["type"] == "rep":
+            self.record_rep(session_id, user_id, event["exercise"], event["reps"], event["time"],
+                            event.get("duration_s"), event.get("min_angle"), event.get("max_angle"),
+                            event.get("form_correct"), event.get("form_score"),
+                            event.get("concentric_s"), event.get("eccentric_s"))
+
+    def event_listener(self, session_id, user_id):
+        """Callable for FeedbackEngine.listeners recording that session's reps"""
+        return lambda event: self.record_event(session_id, user_id, event)
+
+    def frame_listener(self, session_id, user_id):
+        """Callable for AnalysisSession.frame_listeners recording joint angles
+        (stamped with the wall clock, like events)"""
+        return lambda timestamp, exercise, angles: self.record_angles(session_id, user_id, angles, exercise)
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is committed"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return not self._queue.unfinished_tasks
+
+    def close(self, timeout=5.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    # ------------------------------------------------------------------
+    # WRITER THREAD
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                # Everything already waiting goes into the same transaction
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                self._apply(batch)
+            if self._stop.is_set() and self._queue.empty():
+                break
+        self._writer.close()
+
+    def _apply(self, batch):
+        # Consecutive writes of one kind go through a single executemany;
+        # order across kinds is preserved (a session exists before its reps)
+        try:
+            with self._writer:
+                start = 0
+                while start < len(batch):
+                    kind = batch[start][0]
+                    end = start
+                    while end < len(batch) and batch[end][0] == kind:
+                        end += 1
+                    self._writer.executemany(_SQL[kind], [params for _, params in batch[start:end]])
+                    start = end
+                samples = [params for kind, params in batch if kind == "sample"]
+                if samples:
+                    self._writer.executemany(_ROLLUP_SQL["angle"], _angle_rollups(samples))
+                reps = [params for kind, params in batch if kind == "rep"]
+                if reps:
+                    rep_rows, session_rows = _rep_rollups(reps)
+                    self._writer.executemany(_ROLLUP_SQL["rep"], rep_rows)
+                    self._writer.executemany(_ROLLUP_SQL["session"], session_rows)
+            self.rows_written += len(batch)
+            self.transactions += 1
+        except sqlite3.Error as e:
+            print(f"⚠ Session store write failed: {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    # ------------------------------------------------------------------
+    # READS
+    # ------------------------------------------------------------------
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def query(self, sql, params=()):
+        return [dict(row) for row in self._reader().execute(sql, params)]
+
+    def sessions(self, user_id=None, exercise=None, since=None, until=None, limit=100):
+        """Sessions newest first, with rep totals; ``exercise`` keeps sessions
+        that contain reps of it"""
+        where, params = _filters(user_id=("s.user_id", user_id), since=("s.started_at", since),
+                                 until=("s.started_at", until))
+        if exercise is not None:
+            where.append("EXISTS (SELECT 1 FROM reps r2 WHERE r2.session_id = s.id AND r2.exercise = ?)")
+            params.append(exercise)
+        return self.query(
+            "SELECT s.*, (SELECT COUNT(*) FROM reps r WHERE r.session_id = s.id) AS reps "
+            f"FROM sessions s {_where(where)} ORDER BY s.started_at DESC LIMIT ?", params + [limit])
+
+    def reps(self, user_id=None, exercise=None, since=None, until=None, session_id=None, limit=1000):
+        """Rep rows oldest first"""
+        where, params = _filters(user_id=("user_id", user_id), exercise=("exercise", exercise),
+                                 since=("ts", since), until=("ts", until), session_id=("session_id", session_id))
+        return self.query(f"SELECT * FROM reps {_where(where)} ORDER BY ts LIMIT ?", params + [limit])
+
+    def session_counters(self, session_id):
+        """{exercise: highest rep number} of one session"""
+        rows = self.query("SELECT exercise, MAX(rep_number) AS reps FROM reps WHERE session_id = ? "
+                          "GROUP BY exercise", (session_id,))
+        return {row["exercise"]: row["reps"] for row in rows}
+
+    def open_session(self, user_id, source):
+        """Most recent session of ``user_id``/``source`` that was never ended"""
+        rows = self.query("SELECT * FROM sessions WHERE user_id = ? AND source = ? "
+                          "ORDER BY started_at DESC LIMIT 1", (user_id, source))
+        return rows[0] if rows and rows[0]["ended_at"] is None else None
+
+    def rep_series(self, resolution="minute", user_id=None, exercise=None, since=None, until=None):
+        """Rep totals per ``resolution`` bucket ("minute", "hour" or "day")"""
+        where, params = _filters(user_id=("user_id", user_id), exercise=("exercise", exercise),
+                                 since=("bucket", _floor(since, REP_RESOLUTIONS[resolution])),
+                                 until=("bucket", until))
+        where.insert(0, "resolution = ?")
+        params.insert(0, REP_RESOLUTIONS[resolution])
+        return self.query(
+            "SELECT bucket, exercise, SUM(reps) AS reps, SUM(correct_reps) AS correct_reps, "
+            "SUM(duration_sum) / SUM(reps) AS mean_duration_s, SUM(form_score_sum) / SUM(reps) AS mean_form_score "
+            f"FROM rep_rollups {_where(where)} GROUP BY bucket, exercise ORDER BY bucket", params)
+
+    def session_summary(self, session_id):
+        """Per-exercise totals of one session"""
+        return self.query(
+            "SELECT exercise, reps, correct_reps, duration_sum / reps AS mean_duration_s, "
+            "form_score_sum / reps AS mean_form_score, min_angle, max_angle, first_ts, last_ts "
+            "FROM session_rollups WHERE session_id = ? ORDER BY first_ts", (session_id,))
+
+    def angle_series(self, session_id=None, user_id=None, since=None, until=None, points=500,
+                     angles=SAMPLE_ANGLES):
+        """Joint-angle chart data: {angle: [[ts, degrees], ...]} LTTB-reduced to
+        ``points``, read from raw samples or the finest rollup that keeps the
+        source under CHART_SOURCE_ROWS"""
+        angles = [a for a in angles if a in SAMPLE_ANGLES]
+        owner = {"session_id": ("session_id", session_id), "user_id": ("user_id", user_id)}
+        resolution = self._chart_resolution(owner, since, until)
+        if resolution == 0:
+            where, params = _filters(since=("ts", since), until=("ts", until), **owner)
+            rows = self._reader().execute(
+                f"SELECT ts, {', '.join(angles)} FROM angle_samples {_where(where)} ORDER BY ts", params).fetchall()
+        else:
+            where, params = _filters(since=("bucket", _floor(since, resolution)), until=("bucket", until), **owner)
+            where.insert(0, "resolution = ?")
+            params.insert(0, resolution)
+            means = ", ".join(f"SUM({a}_sum) / SUM(n)" for a in angles)
+            rows = self._reader().execute(
+                f"SELECT bucket, {means} FROM angle_rollups {_where(where)} GROUP BY bucket ORDER BY bucket",
+                params).fetchall()
+
+        data = np.array(rows, dtype=np.float64).reshape(-1, len(angles) + 1)
+        series = {}
+        if not np.isnan(data[:, 1:]).any():
+            idx = lttb(data[:, 0], data[:, 1:], points)
+            for col, angle in enumerate(angles):
+                keep = idx[:, col]
+                series[angle] = np.stack([data[keep, 0], np.round(data[keep, col + 1], 1)], axis=1).tolist()
+        else:
+            for col, angle in enumerate(angles, start=1):
+                t, v = downsample_series(data[:, 0], data[:, col], points)
+                series[angle] = np.stack([t, np.round(v, 1)], axis=1).tolist()
+        return {"resolution": resolution, "source_points": len(data), "series": series}
+
+    def _chart_resolution(self, owner, since, until):
+        """0 (raw) or the finest rollup resolution within CHART_SOURCE_ROWS
+
+        Walks from hourly to per-second rollups, only reading a finer table
+        when the coarser one bounds its row count under the budget.
+        """
+        chosen, (frames, buckets) = ANGLE_RESOLUTIONS[-1], self._rollup_extent(owner, since, until,
+                                                                              ANGLE_RESOLUTIONS[-1])
+        for resolution in reversed(ANGLE_RESOLUTIONS[:-1]):
+            if buckets * chosen // resolution > CHART_SOURCE_ROWS:
+                return chosen
+            frames, buckets = self._rollup_extent(owner, since, until, resolution)
+            chosen = resolution
+        return 0 if frames <= CHART_SOURCE_ROWS else chosen
+
+    def _rollup_extent(self, owner, since, until, resolution):
+        """(frames, buckets) of angle_rollups at ``resolution`` in the range"""
+        where, params = _filters(since=("bucket", _floor(since, resolution)), until=("bucket", until), **owner)
+        where.insert(0, "resolution = ?")
+        params.insert(0, resolution)
+        return self._reader().execute(
+            f"SELECT COALESCE(SUM(n), 0), COUNT(DISTINCT bucket) FROM angle_rollups {_where(where)}",
+            params).fetchone()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "pending": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "transactions": self.transactions,
+        }
+
+
+def _filters(**columns):
+    """WHERE clauses for the given (column, value) pairs; since/until are ranges"""
+    where, params = [], []
+    for key, (column, value) in columns.items():
+        if value is None:
+            continue
+        op = ">=" if key == "since" else "<" if key == "until" else "="
+        where.append(f"{column} {op} ?")
+        params.append(value)
+    return where, params
+
+
+def _where(clauses):
+    return "WHERE " + " AND ".join(clauses) if clauses else ""
+
+
+def _floor(ts, resolution):
+    """Start of the bucket holding ``ts`` (None stays None)"""
+    return None if ts is None else (ts // resolution) * resolution
+
+
+def _angle_rollups(samples):
+    """angle_rollups upsert rows for a batch of angle_samples rows"""
+    values = np.array([p[4:] for p in samples], dtype=np.float64)
+    ts = np.array([p[2] for p in samples], dtype=np.float64)
+    rows = []
+    for resolution in ANGLE_RESOLUTIONS:
+        groups = defaultdict(list)
+        for i, (p, bucket) in enumerate(zip(samples, ((ts // resolution) * resolution).tolist())):
+            groups[(p[0], p[1], bucket)].append(i)
+        for (session_id, user_id, bucket), idx in groups.items():
+            v = values[idx]
+            # sum, min, max per angle, in _ANGLE_AGGS order
+            aggs = np.stack([v.sum(axis=0), v.min(axis=0), v.max(axis=0)], axis=1).ravel()
+            rows.append((resolution, bucket, session_id, user_id, len(idx), *aggs.tolist()))
+    return rows
+
+
+def _rep_rollups(reps):
+    """rep_rollups and session_rollups upsert rows for a batch of reps rows"""
+    buckets = defaultdict(lambda: [0, 0, 0.0, 0.0])
+    sessions = {}
+    for session_id, user_id, exercise, _, ts, duration, low, high, correct, score, *_ in reps:
+        for resolution in REP_RESOLUTIONS.values():
+            acc = buckets[(resolution, (ts // resolution) * resolution, user_id, exercise)]
+            acc[0] += 1
+            acc[1] += correct or 0
+            acc[2] += duration or 0.0
+            acc[3] += score or 0.0
+        acc = sessions.get((session_id, exercise))
+        if acc is None:
+            acc = sessions[(session_id, exercise)] = [0, 0, 0.0, 0.0, low, high, ts, ts]
+        acc[0] += 1
+        acc[1] += correct or 0
+        acc[2] += duration or 0.0
+        acc[3] += score or 0.0
+        acc[4] = low if acc[4] is None else min(acc[4], low if low is not None else acc[4])
+        acc[5] = high if acc[5] is None else max(acc[5], high if high is not None else acc[5])
+        acc[6], acc[7] = min(acc[6], ts), max(acc[7], ts)
+    return ([key + tuple(acc) for key, acc in buckets.items()],
+            [key + tuple(acc) for key, acc in sessions.items()])
@@ -0,0 +1,108 @@
+import numpy as np
+
+from exercise_detector import ExerciseDetector, NONE_LABEL
+from ml_pipeline import ANGLE_NAMES, batch_pose_features
+from window_features import SlidingWindowFeatureEngine
+
+FPS = 30.0
+# MediaPipe landmark indices
+NOSE, SHOULDERS, ELBOWS, WRISTS, HIPS, KNEES, ANKLES = 0, (11, 12), (13, 14), (15, 16), (23, 24), (25, 26), (27, 28)
+
+
+def _unit(degrees):
+    """Image-space direction ``degrees`` forward of straight up"""
+    r = np.radians(degrees)
+    return np.array([np.sin(r), -np.cos(r)])
+
+
+def side_view_pose(shin_tilt, knee_angle, inclination):
+    """33 x 4 landmarks of a person seen from the side, arms hanging straight"""
+    ankle = np.array([0.5, 0.9])
+    knee = ankle + 0.2 * _unit(shin_tilt)
+    hip = knee + 0.22 * _unit(shin_tilt + knee_angle - 180.0)
+    shoulder = hip + 0.3 * _unit(inclination)
+    elbow = shoulder + np.array([0.0, 0.15])
+    wrist = shoulder + np.array([0.0, 0.3])
+    nose = shoulder + 0.1 * _unit(inclination)
+
+    landmarks = np.zeros((33, 4), dtype=np.float32)
+    landmarks[:, 3] = 1.0
+    landmarks[NOSE, :2] = nose
+    for (left, right), point in zip((SHOULDERS, ELBOWS, WRISTS, HIPS, KNEES, ANKLES),
+                                    (shoulder, elbow, wrist, hip, knee, ankle)):
+        landmarks[left, :2] = point
+        landmarks[right, :2] = point + np.array([0.01, 0.0])
+    return landmarks
+
+
+def run(detector, poses):
+    window = SlidingWindowFeatureEngine()
+    features = batch_pose_features(np.stack(poses))
+    labels = []
+    for i, row in enumerate(features):
+        window.update(row[-len(ANGLE_NAMES):], i / FPS)
+        labels.append(detector.update(row, window))
+    return labels
+
+
+def deadlift(reps=5, period=30):
+    poses = []
+    for i in range(reps * period):
+        p = (1 - np.cos(2 * np.pi * i / period)) / 2
+        poses.append(side_view_pose(shin_tilt=15 * p, knee_angle=180 - 40 * p, inclination=50 * p))
+    return poses
+
+
+def burpee(reps=5, period=40):
+    # (knee angle, torso inclination) keyframes: stand, squat, plank, squat
+    keyframes = [(180, 0), (90, 30), (170, 80), (90, 30), (180, 0)]
+    poses = []
+    for i in range(reps * period):
+        phase = (i % period) / period * (len(keyframes) - 1)
+        k, t = int(phase), phase - int(phase)
+        knee = keyframes[k][0] + t * (keyframes[k + 1][0] - keyframes[k][0])
+        inclination = keyframes[k][1] + t * (keyframes[k + 1][1] - keyframes[k][1])
+        poses.append(side_view_pose(shin_tilt=inclination, knee_angle=knee, inclination=inclination))
+    return poses
+
+
+def test_deadlift_detected_without_classifier():
+    detector = ExerciseDetector()
+    labels = run(detector, deadlift())
+    assert labels[-1] == "DEADLIFT"
+    assert detector.stage_counts["fallback"] > 0
+
+
+def test_burpee_detected_without_classifier():
+    labels = run(ExerciseDetector(), burpee())
+    assert labels[-1] == "BURPEE"
+
+
+def test_squat_is_not_a_deadlift():
+    poses = []
+    for i in range(150):
+        p = (1 - np.cos(2 * np.pi * i / 30)) / 2
+        poses.append(side_view_pose(shin_tilt=25 * p, knee_angle=180 - 95 * p, inclination=35 * p))
+    assert run(ExerciseDetector(), poses)[-1] == "SQUAT"
+
+
+class _Classifier:
+    classes_ = np.array(["SQUAT", "DEADLIFT"])
+
+    def predict_proba(self, X):
+        return np.tile([0.9, 0.1], (len(X), 1))
+
+
+class _Registry:
+    class current:
+        exercise_classifier = _Classifier()
+
+
+def test_registry_classifier_takes_precedence_over_fallback():
+    labels = run(ExerciseDetector(model_registry=_Registry()), deadlift())
+    assert labels[-1] == "SQUAT"
+
+
+def test_still_pose_is_none():
+    labels = run(ExerciseDetector(), [side_view_pose(0, 180, 0)] * 60)
+    assert labels[-1] == NONE_LABEL
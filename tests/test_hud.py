@@ -0,0 +1,27 @@
+import numpy as np
+
+from hud import HudCompositor
+
+ROWS = [(3, "up"), (0, None), (1, "down")]
+
+
+def _render(hud, exercise, accuracy):
+    image = np.full((480, 640, 3), 128, dtype=np.uint8)
+    return hud.draw(image, exercise, "Good", (0, 128, 0), accuracy, ROWS)
+
+
+def test_changing_one_field_matches_a_fresh_render():
+    hud = HudCompositor()
+    _render(hud, "BICEP_CURL", 87.5)
+    # The exercise cell overlaps the confidence text; changing only the
+    # exercise must not erase it
+    cached = _render(hud, "SQUAT", 87.5)
+    fresh = _render(HudCompositor(), "SQUAT", 87.5)
+    assert np.array_equal(cached, fresh)
+
+
+def test_changing_confidence_keeps_the_exercise_text():
+    hud = HudCompositor()
+    _render(hud, "LATERAL_RAISE", 10.0)
+    cached = _render(hud, "LATERAL_RAISE", 99.0)
+    assert np.array_equal(cached, _render(HudCompositor(), "LATERAL_RAISE", 99.0))
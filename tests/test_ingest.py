@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import ingest
+from ingest import IngestSession
+
+
+def _jpeg(width):
+    return cv2.imencode(".jpg", np.zeros((120, width, 3), dtype=np.uint8))[1].tobytes()
+
+
+def test_frame_overtaken_while_decoding_is_not_analysed(monkeypatch):
+    slow, fast = _jpeg(200), _jpeg(100)
+    imdecode = cv2.imdecode
+
+    def decode(buf, flags):
+        if len(buf) == len(slow):
+            time.sleep(0.3)
+        return imdecode(buf, flags)
+    monkeypatch.setattr(ingest.cv2, "imdecode", decode)
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    session = IngestSession("test", ["SQUAT"], None, pool, max_pending=2)
+    seen = []
+    session.analysis.analyze = lambda landmarks, ts: seen.append(ts)
+    try:
+        assert session.submit(slow, client_ts=1.0)
+        assert session.submit(fast, client_ts=2.0)
+        deadline = time.monotonic() + 10
+        while session.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        session.close()
+        pool.shutdown()
+    assert seen == [2.0]
+    assert session.out_of_order == 1
@@ -0,0 +1,38 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_registry import ModelRegistry, LEGACY_VERSION
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def legacy_bundle(tmp_path_factory):
+    registry = ModelRegistry(str(tmp_path_factory.mktemp("models")), legacy_dir=BASE_DIR)
+    with warnings.catch_warnings():
+        # The shipped pickles come from an older scikit-learn
+        warnings.simplefilter("ignore")
+        return registry.load(LEGACY_VERSION)
+
+
+def _verdicts(bundle, rows):
+    proba = bundle.model.predict_proba(bundle.scaler.transform(rows))
+    return bundle.model.classes_[np.argmax(proba, axis=1)] == bundle.positive_class
+
+
+def test_legacy_model_marks_correct_rows_correct(legacy_bundle):
+    data = pd.read_csv(os.path.join(BASE_DIR, "exercise_data.csv"))
+    rows = data[legacy_bundle.features].to_numpy()
+    correct = (data["Label"] == "correct").to_numpy()
+    verdicts = _verdicts(legacy_bundle, rows)
+    assert verdicts[correct].mean() > 0.9
+    assert verdicts[~correct].mean() < 0.1
+
+
+def test_legacy_model_known_correct_row(legacy_bundle):
+    # Fourth row of exercise_data.csv, labelled correct
+    assert _verdicts(legacy_bundle, np.array([[4.687594037953338, 114.57094453463858]]))[0]
@@ -0,0 +1,65 @@
+import pytest
+
+import overload
+from overload import OverloadController, LEVELS
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(overload.time, "monotonic", clock)
+    return clock
+
+
+def feed(controller, clock, session, latency_ms, seconds, fps=30):
+    for _ in range(int(seconds * fps)):
+        clock.now += 1.0 / fps
+        controller.observe(session, latency_ms)
+
+
+def close_admission(controller, clock, session):
+    while controller.admitting:
+        feed(controller, clock, session, 500.0, 1.0)
+    assert controller.level == LEVELS.index("admission-closed")
+
+
+def test_escalates_to_admission_closed(clock):
+    controller = OverloadController(slo_ms=100.0)
+    feed(controller, clock, "camera", 10.0, 1.0)
+    assert controller.level == 0
+    close_admission(controller, clock, "camera")
+
+
+def test_vanished_session_does_not_hold_admission_closed(clock):
+    controller = OverloadController(slo_ms=100.0, idle_expire=5.0)
+    close_admission(controller, clock, "ingest:gone")
+    # The client disconnects without closing its session; nothing else
+    # reports a latency and nothing calls forget()
+    clock.now += 4.0
+    assert not controller.admitting
+    clock.now += 2.0
+    assert controller.admitting
+    assert controller.level == 0
+    assert controller.stats()["p95_ms"] == {}
+
+
+def test_vanished_session_leaves_live_sessions_in_charge(clock):
+    controller = OverloadController(slo_ms=100.0, idle_expire=5.0, recover_after=1.0)
+    while controller.admitting:
+        feed(controller, clock, "camera", 10.0, 0.5)
+        feed(controller, clock, "ingest:gone", 500.0, 0.5)
+    assert "camera" in controller._last_seen
+    # Only the healthy camera keeps reporting: the stale p95 expires and the
+    # ladder walks back down
+    feed(controller, clock, "camera", 10.0, 20.0)
+    assert "ingest:gone" not in controller.stats()["p95_ms"]
+    assert controller.level == 0
+    assert controller.admitting
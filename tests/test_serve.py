@@ -0,0 +1,68 @@
+import json
+import queue
+import threading
+
+import numpy as np
+import pytest
+
+from frame_channel import FrameChannel
+from serve import create_http_app
+
+
+@pytest.fixture
+def channel():
+    channel = FrameChannel(create=True)
+    yield channel
+    channel.close()
+
+
+def test_pose_stream_reads_landmarks_from_the_channel(channel):
+    landmarks = np.random.default_rng(0).random((33, 4), dtype=np.float32)
+    pose = {"angles": [170.0, 165.0, 90.0, 92.0, 175.0],
+            "stats": {"current_exercise": "SQUAT", "reps": 3}}
+    channel.publish(b"", {"pose": pose}, landmarks)
+
+    http = create_http_app(channel.name, queue.Queue(), queue.Queue(), threading.Lock(), threading.Lock())
+    response = http.test_client().get("/api/pose_stream")
+    chunks = response.response
+    message = json.loads(next(iter(chunks))[len("data: "):])
+    assert channel.viewers()["pose"] == 1
+    response.close()
+    assert channel.viewers()["pose"] == 0
+
+    assert np.allclose(np.array(message["k"]).reshape(33, 4) / [1e4, 1e4, 1e4, 100], landmarks, atol=1e-2)
+    assert message["a"] == pose["angles"]
+    assert message["s"] == pose["stats"]
+
+
+def test_late_reply_is_not_handed_to_the_next_command(channel):
+    commands, replies = queue.Queue(), queue.Queue()
+    http = create_http_app(channel.name, commands, replies, threading.Lock(), threading.Lock())
+    # A reply to a command whose caller already gave up
+    replies.put(("stale", {"status": "success", "exercise": "BICEP_CURL"}))
+
+    def worker():
+        request_id, command, payload = commands.get()
+        replies.put((request_id, {"status": "success", "exercise": payload}))
+    threading.Thread(target=worker, daemon=True).start()
+
+    response = http.test_client().post("/api/set_exercise", json={"exercise": "SQUAT"})
+    assert response.get_json()["exercise"] == "SQUAT"
+
+
+def test_landmark_batch_is_scored_in_the_http_worker(channel):
+    from landmark_batch import encode_batch
+
+    channel.publish(b"", {"model_version": None})
+    commands = queue.Queue()
+    http = create_http_app(channel.name, commands, queue.Queue(), threading.Lock(), threading.Lock())
+    rng = np.random.default_rng(0)
+    body = encode_batch(np.arange(40) / 30.0, rng.random((40, 33, 4), dtype=np.float32))
+
+    response = http.test_client().post("/api/landmarks/batch?exercise=squat", data=body)
+    assert response.status_code == 200
+    assert response.get_json()["data"]["exercise"] == ["SQUAT"] * 40
+    assert commands.empty()
+
+    response = http.test_client().post("/api/landmarks/batch?exercise=jumping", data=body)
+    assert response.status_code == 400
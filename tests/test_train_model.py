@@ -0,0 +1,41 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from model_registry import ModelRegistry, LEGACY_VERSION
+from train_model import run_exercise_training, SAMPLE_COLUMNS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _sessions(path):
+    rows = []
+    t = np.arange(120) / 30.0
+    swing = 95 + 65 * np.sin(2 * np.pi * t / 2.0)
+    for n in range(6):
+        exercise = "bicep_curl" if n % 2 else "squat"
+        arm = swing if exercise == "bicep_curl" else np.full_like(t, 170.0)
+        leg = swing if exercise == "squat" else np.full_like(t, 175.0)
+        for i in range(len(t)):
+            rows.append((f"s{n}", t[i], exercise, arm[i], arm[i], leg[i], leg[i], 5.0))
+    pd.DataFrame(rows, columns=SAMPLE_COLUMNS).to_csv(path, index=False)
+
+
+def test_exercise_classifier_is_trained_and_published(tmp_path):
+    data = tmp_path / "samples.csv"
+    _sessions(data)
+    out = tmp_path / "build"
+    meta = run_exercise_training([str(data)], output_dir=str(out), jobs=1,
+                                 grid={"n_estimators": [10], "max_depth": [None], "min_samples_leaf": [1]})
+    assert meta["classes"] == ["bicep_curl", "squat"]
+
+    registry = ModelRegistry(str(tmp_path / "models"), legacy_dir=BASE_DIR)
+    version = registry.publish(str(out), files=("exercise_classifier.pkl",), base=LEGACY_VERSION)
+    with warnings.catch_warnings():
+        # The carried-over legacy pickles come from an older scikit-learn
+        warnings.simplefilter("ignore")
+        bundle = registry.load(version)
+    assert os.path.exists(os.path.join(registry.root, version, "exercise_form_model.pkl"))
+    assert list(bundle.exercise_classifier.classes_) == ["bicep_curl", "squat"]
@@ -0,0 +1,446 @@
+"""
+RepBot Form Model Trainer
+Headless CLI that streams logged exercise data, runs a cross-validated
+hyperparameter search across a process pool and writes the model artifacts
+together with their feature schema.
+
+Usage:
+    python train_model.py --data exercise_data.csv
+    python train_model.py --data "logs/*.csv" --features "Bicep Angle" "Squat Angle" --jobs 8
+    python train_model.py --data exercise_data.csv --output-dir build --publish
+    python train_model.py --exercise-classifier --data repbot.db --publish
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import sqlite3
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedGroupKFold, StratifiedKFold, cross_validate
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [None, 8, 16],
+    "min_samples_leaf": [1, 4],
+}
+LATENCY_ROUNDS = 200
+
+# Exercise classifier: per-frame angle rows recorded by session_store.py
+SAMPLE_COLUMNS = ["session_id", "ts", "exercise",
+                  "left_arm", "right_arm", "left_leg", "right_leg", "torso"]
+WINDOW_STRIDE = 5
+
+# -------------------------------------------------------------------
+# DATA LOADING (STREAMED)
+# -------------------------------------------------------------------
+def _expand_paths(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+
+def _read_header(path):
+    if path.endswith(".npz"):
+        with np.load(path) as chunk:
+            return list(chunk.files)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _iter_chunks(path, columns, chunksize):
+    """Yield DataFrames of at most ``chunksize`` rows from a CSV or logger .npz chunk"""
+    if path.endswith(".npz"):
+        with np.load(path) as chunk:
+            yield pd.DataFrame({name: chunk[name] for name in columns})
+        return
+    yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+
+def load_dataset(paths, features, label, chunksize=50000, max_rows=None, seed=42):
+    """Stream rows into float32 feature / label arrays
+
+    Only the requested columns are parsed and each chunk is downcast before
+    being kept, so memory is bounded by the selected columns. When
+    ``max_rows`` is set, a uniform reservoir sample of that size is kept
+    instead of the whole dataset.
+    """
+    rng = np.random.default_rng(seed)
+    X_parts, y_parts = [], []
+    X_res, y_res = None, None
+    seen = 0
+
+    for path in paths:
+        for chunk in _iter_chunks(path, features + [label], chunksize):
+            chunk = chunk.dropna()
+            X = chunk[features].to_numpy(dtype=np.float32)
+            y = chunk[label].astype(str).to_numpy()
+            if max_rows is None:
+                X_parts.append(X)
+                y_parts.append(y)
+                seen += len(X)
+                continue
+
+            # Vectorised reservoir sampling (Algorithm R, one chunk at a time)
+            if X_res is None:
+                X_res = np.empty((max_rows, len(features)), dtype=np.float32)
+                y_res = np.empty(max_rows, dtype=object)
+            fill = min(max(max_rows - seen, 0), len(X))
+            X_res[seen:seen + fill] = X[:fill]
+            y_res[seen:seen + fill] = y[:fill]
+            rest = np.arange(fill, len(X))
+            if len(rest):
+                slots = rng.integers(0, seen + rest + 1)
+                keep = slots < max_rows
+                X_res[slots[keep]] = X[rest[keep]]
+                y_res[slots[keep]] = y[rest[keep]]
+            seen += len(X)
+
+    if max_rows is None:
+        if not X_parts:
+            return np.empty((0, len(features)), dtype=np.float32), np.empty(0, dtype=str), 0
+        return np.concatenate(X_parts), np.concatenate(y_parts), seen
+    kept = min(seen, max_rows)
+    return X_res[:kept], y_res[:kept].astype(str), seen
+
+
+def load_angle_samples(paths):
+    """Per-frame angle rows from SessionStore databases (.db) or CSV exports"""
+    frames = []
+    for path in paths:
+        if path.endswith(".db"):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                frames.append(pd.read_sql_query(
+                    f"SELECT {', '.join(SAMPLE_COLUMNS)} FROM angle_samples", conn))
+            finally:
+                conn.close()
+        else:
+            frames.append(pd.read_csv(path, usecols=SAMPLE_COLUMNS))
+    if not frames:
+        return pd.DataFrame(columns=SAMPLE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def window_dataset(samples, window=30, stride=WINDOW_STRIDE):
+    """Replay each session through ``SlidingWindowFeatureEngine``
+
+    One row is kept every ``stride`` frames once the window is full and all
+    of its frames carry the same exercise, so X matches what
+    ``ExerciseDetector`` feeds the classifier at runtime. Returns
+    ``(X, labels, groups)`` with the session id as group.
+    """
+    from window_features import SlidingWindowFeatureEngine
+
+    angle_columns = SAMPLE_COLUMNS[3:]
+    samples = samples.dropna(subset=angle_columns)
+    samples = samples.sort_values(["session_id", "ts"], kind="stable")
+    X_parts, y_parts, groups = [], [], []
+    for session_id, frame in samples.groupby("session_id", sort=False):
+        engine = SlidingWindowFeatureEngine(window)
+        angles = frame[angle_columns].to_numpy(dtype=np.float32)
+        times = frame["ts"].to_numpy(dtype=np.float64)
+        labels = frame["exercise"].fillna("").astype(str).to_numpy()
+        for i in range(len(frame)):
+            engine.update(angles[i], times[i])
+            if not engine.ready or i % stride:
+                continue
+            label = labels[i]
+            if label in ("", "None") or not (labels[i - window + 1:i + 1] == label).all():
+                continue
+            X_parts.append(engine.feature_vector().copy())
+            y_parts.append(label)
+            groups.append(str(session_id))
+
+    width = len(SlidingWindowFeatureEngine(window).feature_names())
+    if not X_parts:
+        return np.empty((0, width), dtype=np.float32), np.empty(0, dtype=str), np.empty(0, dtype=str)
+    return np.stack(X_parts), np.array(y_parts), np.array(groups)
+
+# -------------------------------------------------------------------
+# CANDIDATE EVALUATION (RUNS IN WORKER PROCESSES)
+# -------------------------------------------------------------------
+def _measure_latency(estimator, X):
+    """Median single-row latency (ms) and amortised per-row batch latency (us)"""
+    rows = X[np.arange(LATENCY_ROUNDS) % len(X)]
+    single = []
+    for i in range(min(LATENCY_ROUNDS, 50)):
+        start = time.perf_counter()
+        estimator.predict_proba(rows[i:i + 1])
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    estimator.predict_proba(rows)
+    batch = time.perf_counter() - start
+    return float(np.median(single) * 1000), float(batch / len(rows) * 1e6)
+
+
+def evaluate_candidate(params, X, y, cv, seed, groups=None):
+    estimator = make_pipeline(
+        MinMaxScaler(),
+        RandomForestClassifier(random_state=seed, n_jobs=1, **params),
+    )
+    if groups is None:
+        folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed)
+    else:
+        # Overlapping windows of one session must not sit on both sides of a split
+        folds = StratifiedGroupKFold(n_splits=cv, shuffle=True, random_state=seed)
+    scores = cross_validate(estimator, X, y, cv=folds, groups=groups, scoring="accuracy")
+
+    start = time.perf_counter()
+    estimator.fit(X, y)
+    fit_time = time.perf_counter() - start
+    single_ms, batch_us = _measure_latency(estimator, X)
+
+    return {
+        "params": params,
+        "cv_accuracy": float(np.mean(scores["test_score"])),
+        "cv_std": float(np.std(scores["test_score"])),
+        "fit_time_s": fit_time,
+        "latency_ms": single_ms,
+        "batch_latency_us": batch_us,
+    }
+
+# -------------------------------------------------------------------
+# TRAINING
+# -------------------------------------------------------------------
+def parameter_grid(grid):
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def run_training(paths, features=None, label="Label", positive_label="correct",
+                 output_dir=BASE_DIR, grid=None, cv=3, jobs=None, chunksize=50000,
+                 max_rows=None, seed=42):
+    """Load data, search hyperparameters and (optionally) write artifacts
+
+    Returns the metadata dict that is saved as ``model_meta.json``.
+    """
+    paths = _expand_paths(paths)
+    header = _read_header(paths[0])
+    if features is None:
+        features = [name for name in header if name != label]
+
+    print(f"Loading {len(paths)} file(s), features={features}, label={label!r}")
+    start = time.perf_counter()
+    X, labels, seen = load_dataset(paths, features, label, chunksize, max_rows, seed)
+    print(f"✓ {len(X)} rows loaded ({seen} seen) in {time.perf_counter() - start:.2f}s")
+    if len(X) == 0:
+        raise ValueError("No training rows found")
+
+    encoder = LabelEncoder()
+    y = encoder.fit_transform(labels)
+    if len(encoder.classes_) < 2:
+        raise ValueError(f"Need at least two classes, found {list(encoder.classes_)}")
+    cv = max(2, min(cv, int(np.bincount(y).min())))
+
+    results, search_time = _search(X, y, grid, cv, jobs, seed)
+    best = results[0]
+
+    scaler = MinMaxScaler().fit(X)
+    model = RandomForestClassifier(random_state=seed, n_jobs=1, **best["params"])
+    model.fit(scaler.transform(X), y)
+
+    classes = [str(c) for c in encoder.classes_]
+    meta = {
+        "features": list(features),
+        "label": label,
+        "classes": classes,
+        "positive_class": classes.index(positive_label) if positive_label in classes else len(classes) - 1,
+        "params": best["params"],
+        "cv_accuracy": best["cv_accuracy"],
+        "n_rows": int(len(X)),
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "search_time_s": search_time,
+        "candidates": results,
+    }
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        joblib.dump(model, os.path.join(output_dir, "exercise_form_model.pkl"))
+        joblib.dump(scaler, os.path.join(output_dir, "scaler.pkl"))
+        joblib.dump(encoder, os.path.join(output_dir, "label_encoder.pkl"))
+        with open(os.path.join(output_dir, "model_meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        print(f"✓ Artifacts written to {output_dir}")
+
+    return meta
+
+
+def run_exercise_training(paths, output_dir=BASE_DIR, grid=None, cv=3, jobs=None,
+                          window=30, stride=WINDOW_STRIDE, seed=42):
+    """Train the window classifier behind stage 2 of ``ExerciseDetector``
+
+    Sessions recorded in ``angle_samples`` (see session_store.py) are
+    replayed through the sliding window and labelled with the exercise they
+    were recorded under. The scaler and forest are saved as one pipeline
+    with the exercise names as classes, so the detector can call
+    ``predict_proba`` on the raw feature vector. Returns the metadata dict
+    that is saved as ``exercise_classifier.json``.
+    """
+    from model_registry import EXERCISE_CLASSIFIER_FILE, EXERCISE_CLASSIFIER_META_FILE
+
+    paths = _expand_paths(paths)
+    print(f"Loading angle samples from {len(paths)} source(s)")
+    start = time.perf_counter()
+    samples = load_angle_samples(paths)
+    X, labels, groups = window_dataset(samples, window, stride)
+    print(f"✓ {len(X)} windows from {len(samples)} frames, "
+          f"{len(set(groups))} session(s) in {time.perf_counter() - start:.2f}s")
+    if len(X) == 0:
+        raise ValueError("No labelled windows found")
+
+    classes, counts = np.unique(labels, return_counts=True)
+    if len(classes) < 2:
+        raise ValueError(f"Need at least two exercises, found {list(classes)}")
+    sessions = min(len(set(groups[labels == c])) for c in classes)
+    if sessions >= 2:
+        cv = max(2, min(cv, sessions))
+    else:
+        print("⚠ An exercise was recorded in a single session; folds may share sessions")
+        cv, groups = max(2, min(cv, int(counts.min()))), None
+
+    results, search_time = _search(X, labels, grid, cv, jobs, seed, groups)
+    best = results[0]
+
+    model = make_pipeline(
+        MinMaxScaler(),
+        RandomForestClassifier(random_state=seed, n_jobs=1, **best["params"]),
+    ).fit(X, labels)
+
+    meta = {
+        "classes": [str(c) for c in model.classes_],
+        "window": window,
+        "stride": stride,
+        "params": best["params"],
+        "cv_accuracy": best["cv_accuracy"],
+        "n_windows": int(len(X)),
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "search_time_s": search_time,
+        "candidates": results,
+    }
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        joblib.dump(model, os.path.join(output_dir, EXERCISE_CLASSIFIER_FILE))
+        with open(os.path.join(output_dir, EXERCISE_CLASSIFIER_META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+        print(f"✓ Exercise classifier written to {output_dir}")
+
+    return meta
+
+
+def _search(X, y, grid, cv, jobs, seed, groups=None):
+    """Cross-validate every grid candidate across a process pool, best first"""
+    candidates = parameter_grid(grid or DEFAULT_GRID)
+    jobs = jobs or os.cpu_count() or 1
+    print(f"Searching {len(candidates)} candidates x {cv} folds on {jobs} process(es)")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(evaluate_candidate, candidates,
+                                itertools.repeat(X), itertools.repeat(y),
+                                itertools.repeat(cv), itertools.repeat(seed),
+                                itertools.repeat(groups)))
+    search_time = time.perf_counter() - start
+
+    results.sort(key=lambda r: (-r["cv_accuracy"], r["latency_ms"]))
+    _print_report(results)
+    print(f"✓ Search finished in {search_time:.1f}s, best: {results[0]['params']}")
+    return results, search_time
+
+
+def _print_report(results):
+    print(f"{'cv acc':>8} {'std':>6} {'fit s':>7} {'1-row ms':>9} {'batch us':>9}  params")
+    for r in results:
+        print(f"{r['cv_accuracy']:8.4f} {r['cv_std']:6.3f} {r['fit_time_s']:7.2f} "
+              f"{r['latency_ms']:9.3f} {r['batch_latency_us']:9.2f}  {r['params']}")
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+def _parse_grid_value(value):
+    return None if value.lower() == "none" else int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the RepBot exercise form model")
+    parser.add_argument("--data", nargs="+",
+                        help="CSV files, logger .npz chunks or glob patterns (default: exercise_data.csv); "
+                             "with --exercise-classifier, session databases or angle-sample CSVs "
+                             "(default: repbot.db)")
+    parser.add_argument("--exercise-classifier", action="store_true",
+                        help="train the auto-detection window classifier instead of the form model")
+    parser.add_argument("--window", type=int, default=30, help="exercise classifier window (frames)")
+    parser.add_argument("--stride", type=int, default=WINDOW_STRIDE,
+                        help="keep one exercise classifier window every this many frames")
+    parser.add_argument("--features", nargs="+", help="feature columns (default: all but the label)")
+    parser.add_argument("--label", default="Label")
+    parser.add_argument("--positive-label", default="correct", help="label value meaning correct form")
+    parser.add_argument("--output-dir", default=BASE_DIR, help="where to write the model artifacts")
+    parser.add_argument("--no-save", action="store_true", help="only run the search and report")
+    parser.add_argument("--publish", action="store_true",
+                        help="also publish the artifacts as a new registry version (hot-reloaded by the backend)")
+    parser.add_argument("--models-dir", default=os.path.join(BASE_DIR, "models"))
+    parser.add_argument("--cv", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=50000)
+    parser.add_argument("--max-rows", type=int, default=None, help="reservoir-sample at most this many rows")
+    parser.add_argument("--n-estimators", nargs="+", type=int, default=DEFAULT_GRID["n_estimators"])
+    parser.add_argument("--max-depth", nargs="+", type=_parse_grid_value, default=DEFAULT_GRID["max_depth"])
+    parser.add_argument("--min-samples-leaf", nargs="+", type=int, default=DEFAULT_GRID["min_samples_leaf"])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    grid = {
+        "n_estimators": args.n_estimators,
+        "max_depth": args.max_depth,
+        "min_samples_leaf": args.min_samples_leaf,
+    }
+    try:
+        if args.exercise_classifier:
+            run_exercise_training(args.data or [os.path.join(BASE_DIR, "repbot.db")],
+                                  output_dir=None if args.no_save else args.output_dir,
+                                  grid=grid, cv=args.cv, jobs=args.jobs, window=args.window,
+                                  stride=args.stride, seed=args.seed)
+        else:
+            run_training(args.data or [os.path.join(BASE_DIR, "exercise_data.csv")],
+                         features=args.features, label=args.label,
+                         positive_label=args.positive_label,
+                         output_dir=None if args.no_save else args.output_dir,
+                         grid=grid, cv=args.cv, jobs=args.jobs, chunksize=args.chunksize,
+                         max_rows=args.max_rows, seed=args.seed)
+    except (ValueError, FileNotFoundError, KeyError) as e:
+        print(f"❌ Training failed: {e}")
+        return 1
+
+    if args.publish and not args.no_save:
+        from model_registry import (EXERCISE_CLASSIFIER_FILE, EXERCISE_CLASSIFIER_META_FILE,
+                                    MODEL_FILE, SCALER_FILE, META_FILE, ENCODER_FILE, ModelRegistry)
+        if args.exercise_classifier:
+            files = (EXERCISE_CLASSIFIER_FILE, EXERCISE_CLASSIFIER_META_FILE)
+        else:
+            files = (MODEL_FILE, SCALER_FILE, META_FILE, ENCODER_FILE)
+        # The artifacts that were not retrained come from the live version
+        registry = ModelRegistry(args.models_dir, legacy_dir=BASE_DIR)
+        version = registry.publish(args.output_dir, files=files, base=registry.active_version())
+        print(f"✓ Published model version {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Transformer Inference Worker
+Optional out-of-process transformer analysis. The frame loop copies a
+downsampled frame or a landmark window into a shared-memory slot and moves
+on; a separate process runs batched CPU inference and results are merged
+back asynchronously. Nothing on the frame path ever blocks on the worker.
+
+Model directories are loaded from local disk only (no network):
+- "frames":    a Hugging Face image-classification model directory
+- "landmarks": a TorchScript ``model.pt`` taking (batch, window, features)
+               float32 and returning logits, plus ``labels.json``
+
+Dynamic int8 quantisation (``quantize``) rewrites an eager model's Linear
+layers; it has no effect on an already scripted module. For "landmarks" the
+quantised model therefore has to be exported ahead of time as
+``model_quantized.pt`` (see export_landmark_model); without that file the
+float model runs and a warning is printed.
+"""
+import os
+import json
+import time
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+SLOT_FREE = 0
+SLOT_FILLED = 1
+LANDMARK_MODEL_FILE = "model.pt"
+QUANTIZED_LANDMARK_MODEL_FILE = "model_quantized.pt"
+LABELS_FILE = "labels.json"
+
+
+def _worker_main(model_dir, input_kind, shm_name, state_name, slot_shape, slot_dtype, n_slots,
+                 requests, results, num_threads, quantize, batch_size):
+    """Entry point of the inference process"""
+    # Offline and thread limits must be set before torch / transformers load
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    import torch
+
+    torch.set_num_threads(num_threads)
+    try:
+        predict, labels = _load_model(model_dir, input_kind, quantize)
+    except Exception as e:
+        results.put(("error", f"Model load failed: {e}"))
+        return
+    results.put(("ready", labels))
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    state_shm = shared_memory.SharedMemory(name=state_name)
+    slots = np.ndarray((n_slots,) + tuple(slot_shape), dtype=slot_dtype, buffer=shm.buf)
+    state = np.ndarray((n_slots,), dtype=np.uint8, buffer=state_shm.buf)
+
+    try:
+        while True:
+            item = requests.get()
+            if item is None:
+                break
+            batch = [item]
+            # Gather whatever else is already waiting, up to batch_size
+            while len(batch) < batch_size:
+                try:
+                    item = requests.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    requests.put(None)
+                    break
+                batch.append(item)
+
+            idx = [slot for slot, _, _ in batch]
+            inputs = slots[idx].copy()
+            state[idx] = SLOT_FREE
+            start = time.perf_counter()
+            with torch.inference_mode():
+                proba = predict(inputs)
+            latency_ms = (time.perf_counter() - start) * 1000
+            for row, (_, request_id, submitted) in zip(proba, batch):
+                best = int(np.argmax(row))
+                results.put(("result", {
+                    "request_id": request_id,
+                    "label": labels[best] if best < len(labels) else str(best),
+                    "score": float(row[best]),
+                    "batch_size": len(batch),
+                    "inference_ms": latency_ms,
+                    "submitted": submitted,
+                }))
+    finally:
+        del slots, state
+        shm.close()
+        state_shm.close()
+
+
+def _load_model(model_dir, input_kind, quantize):
+    """Returns (predict(np.ndarray) -> probabilities, labels)"""
+    import torch
+
+    if input_kind == "frames":
+        from transformers import AutoImageProcessor, AutoModelForImageClassification
+        processor = AutoImageProcessor.from_pretrained(model_dir, local_files_only=True)
+        model = AutoModelForImageClassification.from_pretrained(model_dir, local_files_only=True).eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        labels = [model.config.id2label[i] for i in range(len(model.config.id2label))]
+
+        def predict(batch):
+            inputs = processor(images=list(batch), return_tensors="pt")
+            return torch.softmax(model(**inputs).logits, dim=-1).numpy()
+        return predict, labels
+
+    model_file = LANDMARK_MODEL_FILE
+    if quantize:
+        if os.path.exists(os.path.join(model_dir, QUANTIZED_LANDMARK_MODEL_FILE)):
+            model_file = QUANTIZED_LANDMARK_MODEL_FILE
+        else:
+            print(f"⚠ No {QUANTIZED_LANDMARK_MODEL_FILE} in {model_dir}; TorchScript models cannot be "
+                  f"quantised at load time, running the float model")
+    model = torch.jit.load(os.path.join(model_dir, model_file), map_location="cpu").eval()
+    with open(os.path.join(model_dir, LABELS_FILE)) as f:
+        labels = json.load(f)
+
+    def predict(batch):
+        return torch.softmax(model(torch.from_numpy(batch)), dim=-1).numpy()
+    return predict, labels
+
+
+def export_landmark_model(model, model_dir, labels, quantize=True):
+    """Script an eager landmark model into ``model_dir`` (model.pt and
+    labels.json), plus model_quantized.pt with its Linear layers dynamically
+    quantised to int8 before scripting"""
+    import torch
+
+    os.makedirs(model_dir, exist_ok=True)
+    model = model.eval()
+    torch.jit.script(model).save(os.path.join(model_dir, LANDMARK_MODEL_FILE))
+    if quantize:
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        torch.jit.script(quantized).save(os.path.join(model_dir, QUANTIZED_LANDMARK_MODEL_FILE))
+    with open(os.path.join(model_dir, LABELS_FILE), "w") as f:
+        json.dump(list(labels), f)
+
+
+class TransformerWorker:
+    """Parent-side handle: shared-memory slots, request/result queues, process
+
+    ``submit()`` is non-blocking and drops the input when every slot is busy;
+    ``poll()`` drains finished results without waiting. ``latest`` holds the
+    most recent result for merging into session stats.
+    """
+
+    def __init__(self, model_dir, input_kind="landmarks", slot_shape=(30, 57), n_slots=8,
+                 num_threads=2, quantize=False, batch_size=4):
+        if input_kind not in ("frames", "landmarks"):
+            raise ValueError(f"Unknown input kind: {input_kind}")
+        if not os.path.isdir(model_dir):
+            raise FileNotFoundError(f"Model directory not found: {model_dir}")
+        self.input_kind = input_kind
+        self.slot_shape = tuple(slot_shape)
+        self.slot_dtype = np.uint8 if input_kind == "frames" else np.float32
+        self.n_slots = n_slots
+        self.ready = False
+        self.error = None
+        self.labels = []
+        self.latest = None
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self._next_slot = 0
+        self._request_id = 0
+
+        slot_bytes = int(np.prod(self.slot_shape)) * np.dtype(self.slot_dtype).itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=slot_bytes * n_slots)
+        self._state_shm = shared_memory.SharedMemory(create=True, size=n_slots)
+        self._slots = np.ndarray((n_slots,) + self.slot_shape, dtype=self.slot_dtype, buffer=self._shm.buf)
+        self._state = np.ndarray((n_slots,), dtype=np.uint8, buffer=self._state_shm.buf)
+        self._state[:] = SLOT_FREE
+
+        ctx = mp.get_context("spawn")
+        self._requests = ctx.Queue(maxsize=n_slots)
+        self._results = ctx.Queue()
+        self._process = ctx.Process(
+            target=_worker_main, daemon=True,
+            args=(model_dir, input_kind, self._shm.name, self._state_shm.name, self.slot_shape,
+                  self.slot_dtype, n_slots, self._requests, self._results, num_threads,
+                  quantize, batch_size))
+        self._process.start()
+
+    def submit(self, array):
+        """Copy ``array`` into a free slot and enqueue it; False if dropped"""
+        if not self.ready or self.error:
+            self.poll()
+            if not self.ready:
+                return False
+        for step in range(self.n_slots):
+            slot = (self._next_slot + step) % self.n_slots
+            if self._state[slot] == SLOT_FREE:
+                break
+        else:
+            self.dropped += 1
+            return False
+
+        self._slots[slot] = array
+        self._state[slot] = SLOT_FILLED
+        self._request_id += 1
+        try:
+            self._requests.put_nowait((slot, self._request_id, time.monotonic()))
+        except queue.Full:
+            self._state[slot] = SLOT_FREE
+            self.dropped += 1
+            return False
+        self._next_slot = (slot + 1) % self.n_slots
+        self.submitted += 1
+        return True
+
+    def poll(self):
+        """Drain finished results (non-blocking); returns the latest result"""
+        while True:
+            try:
+                kind, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "ready":
+                self.ready = True
+                self.labels = payload
+                print(f"✓ Transformer worker ready ({len(payload)} labels)")
+            elif kind == "error":
+                self.error = payload
+                print(f"⚠ Transformer worker: {payload}")
+            else:
+                payload["latency_ms"] = (time.monotonic() - payload.pop("submitted")) * 1000
+                self.latest = payload
+                self.completed += 1
+        return self.latest
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "latest": self.latest,
+        }
+
+    def close(self):
+        try:
+            self._requests.put_nowait(None)
+        except queue.Full:
+            pass
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        del self._slots, self._state
+        self._shm.close()
+        self._shm.unlink()
+        self._state_shm.close()
+        self._state_shm.unlink()
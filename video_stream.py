@@ -0,0 +1,232 @@
+"""
+Video Stream Analysis
+Recorded clips analysed while they upload. The request body is piped into
+an ffmpeg decoder as it arrives (and spooled to a temporary file); decoded
+frames go through MediaPipe and an AnalysisSession straight away, and the
+progress is yielded as Server-Sent Events, so the first results arrive after
+the first seconds of video rather than after the whole upload.
+
+Without ffmpeg, or when the container cannot be decoded from a pipe (MP4
+files whose index is written at the end), the spooled file is analysed with
+OpenCV once the upload completes; progress still streams during analysis.
+"""
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import tempfile
+import threading
+import subprocess
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from analysis_session import AnalysisSession, AUTO_MODE
+from perf_profile import DEFAULT_POSE_OPTIONS
+
+mp_pose = mp.solutions.pose
+
+FFMPEG = shutil.which(os.environ.get("REPBOT_FFMPEG", "ffmpeg"))
+# Frames are letterboxed to this size and sampled at this rate for analysis
+ANALYSIS_SIZE = (640, 360)
+ANALYSIS_FPS = 15
+# Video seconds between "progress" events
+PROGRESS_INTERVAL_S = 1.0
+UPLOAD_CHUNK = 64 * 1024
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def sse(kind, data):
+    return f"event: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class VideoStreamAnalysis:
+    """One uploaded clip: ``run()`` yields SSE messages until the summary
+
+    Events: "progress" (counters and feedback so far), "rep" (each counted
+    rep with its metrics), "done" (final summary) and "error".
+    """
+
+    def __init__(self, stream, exercises, model_registry=None, exercise=AUTO_MODE, fps=ANALYSIS_FPS,
+                 size=ANALYSIS_SIZE, pose_options=DEFAULT_POSE_OPTIONS, store=None, user_id="default"):
+        self.id = uuid.uuid4().hex
+        self.stream = stream
+        self.fps = fps
+        self.size = size
+        # Keyword arguments for the clip's Pose graph (perf_profile.pose_options)
+        self.pose_options = dict(pose_options)
+        self.analysis = AnalysisSession(exercises, model_registry)
+        self.analysis.set_exercise(exercise)
+        self._reps = queue.SimpleQueue()
+        self.analysis.events.listeners.append(self._on_event)
+        self.store = store
+        if store is not None:
+            store.start_session(self.id, user_id, "upload", exercise)
+            self.analysis.events.listeners.append(store.event_listener(self.id, user_id))
+            self.analysis.frame_listeners.append(store.frame_listener(self.id, user_id))
+
+        self.decoder = "ffmpeg" if FFMPEG else "file"
+        self.frames = 0
+        self.uploaded_bytes = 0
+        self.upload_done = False
+        self.first_result_ms = None
+        self.summary = None
+        self._started = None
+
+    def _on_event(self, event):
+        if event["type"] == "rep":
+            self._reps.put(event)
+
+    # ------------------------------------------------------------------
+    # UPLOAD
+    # ------------------------------------------------------------------
+    def _feed(self, pipe, spool):
+        """Copy the upload into the decoder pipe (while it lives) and the spool"""
+        try:
+            while self.uploaded_bytes < MAX_UPLOAD_BYTES:
+                chunk = self.stream.read(UPLOAD_CHUNK)
+                if not chunk:
+                    break
+                self.uploaded_bytes += len(chunk)
+                spool.write(chunk)
+                if pipe is not None:
+                    try:
+                        pipe.write(chunk)
+                    except (BrokenPipeError, OSError):
+                        # The decoder gave up (e.g. unstreamable MP4); keep
+                        # spooling for the file fallback
+                        pipe = None
+        except Exception as e:
+            print(f"⚠ Video upload interrupted: {e}")
+        finally:
+            spool.flush()
+            self.upload_done = True
+            if pipe is not None:
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+
+    # ------------------------------------------------------------------
+    # DECODERS (yield (video time, BGR frame))
+    # ------------------------------------------------------------------
+    def _ffmpeg_command(self):
+        w, h = self.size
+        video_filter = (f"fps={self.fps},scale={w}:{h}:force_original_aspect_ratio=decrease,"
+                        f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2")
+        return [FFMPEG, "-hide_banner", "-loglevel", "error", "-i", "pipe:0", "-an",
+                "-vf", video_filter, "-pix_fmt", "bgr24", "-f", "rawvideo", "pipe:1"]
+
+    def _pipe_frames(self, stdout):
+        w, h = self.size
+        buffer = bytearray(w * h * 3)
+        view = memoryview(buffer)
+        frame = np.frombuffer(buffer, dtype=np.uint8).reshape(h, w, 3)
+        index = 0
+        while True:
+            filled = 0
+            while filled < len(buffer):
+                n = stdout.readinto(view[filled:])
+                if not n:
+                    return
+                filled += n
+            yield index / self.fps, frame
+            index += 1
+
+    def _file_frames(self, path):
+        cap = cv2.VideoCapture(path)
+        try:
+            source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            stride = max(1, int(round(source_fps / self.fps)))
+            index = 0
+            while cap.grab():
+                if index % stride == 0:
+                    ok, frame = cap.retrieve()
+                    if not ok:
+                        break
+                    scale = self.size[0] / frame.shape[1]
+                    if scale < 1.0:
+                        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                    yield index / source_fps, frame
+                index += 1
+        finally:
+            cap.release()
+
+    # ------------------------------------------------------------------
+    # ANALYSIS
+    # ------------------------------------------------------------------
+    def _analyze(self, frames, pose):
+        next_progress = 0.0
+        for video_time, frame in frames:
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            landmarks = results.pose_landmarks.landmark if results.pose_landmarks else None
+            self.analysis.analyze(landmarks, video_time)
+            self.frames += 1
+            if self.first_result_ms is None:
+                self.first_result_ms = round((time.monotonic() - self._started) * 1000, 1)
+            while not self._reps.empty():
+                # The event's "timestamp" is the video time of the rep
+                yield sse("rep", self._reps.get())
+            if video_time >= next_progress:
+                next_progress = video_time + PROGRESS_INTERVAL_S
+                yield sse("progress", self._progress(video_time))
+
+    def _progress(self, video_time):
+        stats = self.analysis.stats()
+        return {
+            "video_time": round(video_time, 2),
+            "frames": self.frames,
+            "uploaded_bytes": self.uploaded_bytes,
+            "upload_done": self.upload_done,
+            "elapsed_s": round(time.monotonic() - self._started, 2),
+            "current_exercise": stats["current_exercise"],
+            "feedback": stats["feedback"],
+            "form_correct": stats["form_correct"],
+            "counters": {k: v for k, v in stats["counters"].items() if v},
+        }
+
+    def run(self):
+        self._started = time.monotonic()
+        spool = tempfile.NamedTemporaryFile(prefix="repbot_upload_", delete=False)
+        proc = feeder = None
+        try:
+            with mp_pose.Pose(**self.pose_options) as pose:
+                if FFMPEG:
+                    proc = subprocess.Popen(self._ffmpeg_command(), stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                    feeder = threading.Thread(target=self._feed, args=(proc.stdin, spool), daemon=True)
+                    feeder.start()
+                    yield from self._analyze(self._pipe_frames(proc.stdout), pose)
+                    feeder.join()
+                    proc.wait()
+                    if self.frames == 0:
+                        self.decoder = "file"
+                else:
+                    self._feed(None, spool)
+                if self.decoder == "file":
+                    yield from self._analyze(self._file_frames(spool.name), pose)
+
+            if self.frames == 0:
+                yield sse("error", {"message": "No decodable video frames"})
+            stats = self.analysis.stats()
+            self.summary = {
+                "session_id": self.id,
+                "decoder": self.decoder,
+                "frames": self.frames,
+                "uploaded_bytes": self.uploaded_bytes,
+                "first_result_ms": self.first_result_ms,
+                "elapsed_s": round(time.monotonic() - self._started, 2),
+                "counters": stats["counters"],
+                "reps_count": sum(stats["counters"].values()),
+            }
+            yield sse("done", self.summary)
+        finally:
+            if proc is not None and proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            spool.close()
+            os.unlink(spool.name)
+            if self.store is not None:
+                self.store.end_session(self.id)
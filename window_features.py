@@ -0,0 +1,176 @@
+"""
+Sliding-Window Feature Engine
+O(1)-per-frame temporal features (range of motion, velocity, tempo, symmetry)
+over the last N frames of joint angles
+"""
+import time
+from collections import deque
+import numpy as np
+
+from ml_pipeline import ANGLE_NAMES
+
+# Left/right angle pairs compared for rep symmetry
+SYMMETRY_PAIRS = [('left_arm', 'right_arm'), ('left_leg', 'right_leg')]
+# Per-angle features, in feature_vector() order
+ANGLE_STATS = ['current', 'mean', 'std', 'min', 'max', 'range',
+               'velocity', 'mean_abs_velocity', 'reversals_per_s']
+# Angular speed (deg/s) below which a direction change is treated as noise
+REVERSAL_DEADBAND = 15.0
+
+
+class RunningWindowStats:
+    """Sliding-window statistics of one signal, updated in O(1) per sample
+
+    Min/max use monotonic deques, mean/variance use running sums, and the
+    velocity terms keep their own running sums so nothing is rescanned.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._index = 0
+        self._values = deque()
+        self._min = deque()   # (index, value), values increasing
+        self._max = deque()   # (index, value), values decreasing
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._abs_vel = deque()
+        self._abs_vel_sum = 0.0
+        self._reversals = deque()
+        self._reversal_count = 0
+        self._times = deque()
+        self._last_value = None
+        self._last_time = None
+        self._last_direction = 0
+        self.velocity = 0.0
+
+    def update(self, value, timestamp):
+        value = float(value)
+        index = self._index
+        self._index += 1
+
+        # Velocity and direction reversals against the previous sample
+        if self._last_value is not None and timestamp > self._last_time:
+            self.velocity = (value - self._last_value) / (timestamp - self._last_time)
+        else:
+            self.velocity = 0.0
+        direction = 0
+        if abs(self.velocity) > REVERSAL_DEADBAND:
+            direction = 1 if self.velocity > 0 else -1
+        reversal = int(direction != 0 and self._last_direction != 0 and direction != self._last_direction)
+        if direction != 0:
+            self._last_direction = direction
+        self._last_value, self._last_time = value, timestamp
+
+        # Push the new sample
+        self._values.append(value)
+        self._times.append(timestamp)
+        self._sum += value
+        self._sumsq += value * value
+        self._abs_vel.append(abs(self.velocity))
+        self._abs_vel_sum += abs(self.velocity)
+        self._reversals.append(reversal)
+        self._reversal_count += reversal
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((index, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((index, value))
+
+        # Evict the sample that left the window
+        if len(self._values) > self.window:
+            old = self._values.popleft()
+            self._times.popleft()
+            self._sum -= old
+            self._sumsq -= old * old
+            self._abs_vel_sum -= self._abs_vel.popleft()
+            self._reversal_count -= self._reversals.popleft()
+            oldest = index - self.window
+            if self._min[0][0] <= oldest:
+                self._min.popleft()
+            if self._max[0][0] <= oldest:
+                self._max.popleft()
+
+    @property
+    def count(self):
+        return len(self._values)
+
+    def features(self):
+        """Values in ANGLE_STATS order"""
+        n = len(self._values)
+        if n == 0:
+            return [0.0] * len(ANGLE_STATS)
+        mean = self._sum / n
+        variance = max(self._sumsq / n - mean * mean, 0.0)
+        low, high = self._min[0][1], self._max[0][1]
+        span = self._times[-1] - self._times[0]
+        return [
+            self._values[-1], mean, variance ** 0.5, low, high, high - low,
+            self.velocity, self._abs_vel_sum / n,
+            self._reversal_count / span if span > 0 else 0.0,
+        ]
+
+
+class SlidingWindowFeatureEngine:
+    """Streaming temporal features for every pipeline angle
+
+    Call ``update(angles, timestamp)`` once per frame with the angles from
+    ``ExerciseMLPipeline._calculate_key_angles``; ``feature_vector()`` then
+    returns a fixed-length vector (see ``feature_names()``) for the model.
+    """
+
+    def __init__(self, window=30, angle_names=ANGLE_NAMES):
+        self.window = window
+        self.angle_names = list(angle_names)
+        self.stats = [RunningWindowStats(window) for _ in self.angle_names]
+        self._pairs = [(self.angle_names.index(a), self.angle_names.index(b))
+                       for a, b in SYMMETRY_PAIRS if a in self.angle_names and b in self.angle_names]
+        self._diffs = [deque() for _ in self._pairs]
+        self._diff_sums = [0.0] * len(self._pairs)
+        self._vector = np.zeros(len(self.feature_names()), dtype=np.float32)
+
+    def feature_names(self):
+        names = [f"{angle}_{stat}" for angle in self.angle_names for stat in ANGLE_STATS]
+        names += [f"{self.angle_names[a]}_{self.angle_names[b]}_asymmetry" for a, b in self._pairs]
+        return names
+
+    @property
+    def ready(self):
+        """True once a full window of frames has been seen"""
+        return self.stats[0].count >= self.window
+
+    def reset(self):
+        for s in self.stats:
+            s.reset()
+        for d in self._diffs:
+            d.clear()
+        self._diff_sums = [0.0] * len(self._pairs)
+        self._vector[:] = 0.0
+
+    def update(self, angles, timestamp=None):
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        for stat, value in zip(self.stats, angles):
+            stat.update(value, timestamp)
+        for i, (a, b) in enumerate(self._pairs):
+            diff = abs(float(angles[a]) - float(angles[b]))
+            self._diffs[i].append(diff)
+            self._diff_sums[i] += diff
+            if len(self._diffs[i]) > self.window:
+                self._diff_sums[i] -= self._diffs[i].popleft()
+
+    def feature_vector(self):
+        """Current window features; the returned array is reused between calls"""
+        width = len(ANGLE_STATS)
+        for i, stat in enumerate(self.stats):
+            self._vector[i * width:(i + 1) * width] = stat.features()
+        offset = len(self.stats) * width
+        for i, diffs in enumerate(self._diffs):
+            self._vector[offset + i] = self._diff_sums[i] / len(diffs) if diffs else 0.0
+        return self._vector
+
+    def summary(self):
+        """Feature dict for stats endpoints and debugging"""
+        return dict(zip(self.feature_names(), (round(float(v), 3) for v in self.feature_vector())))